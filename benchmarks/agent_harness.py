@@ -0,0 +1,355 @@
+"""
+End-to-end benchmark of the agent, fully offline: the agent runs against a
+local MQTT 5 broker implementing the AWS IoT Jobs topics and a simulated
+MAVSDK system, and mission bundles are served over local HTTP.
+
+    python -m benchmarks.agent_harness --jobs 10 --output results.json
+
+Measures job pickup to ARMED latency over a series of short missions,
+telemetry throughput and process memory over one long mission, and the
+telemetry encode cost. Results are printed as JSON.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger
+
+from benchmarks.mavsdk_standin import SimulatedSystem, synthetic_plan, write_bundle
+from benchmarks.mqtt_standin import JobsService, LocalBroker
+from benchmarks.telemetry_codec import measure, synthetic_flight
+from src.Classes.flight_recorder import FlightRecorder
+from src.Classes.job_scheduler import JobScheduler
+from src.Classes.metrics import Metrics
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.mission_validator import MissionValidator
+from src.Classes.mqtt_base import IoTBaseClient
+from src.Classes.mqtt_jobs import IoTJobsClient
+from src.Classes.telemetry_codec import (
+    CODEC_VERSION,
+    CONTENT_TYPE as TELEMETRY_CONTENT_TYPE,
+    TelemetryEncoder,
+)
+from src.Classes.telemetry_publisher import TelemetryPublisher
+from src.Classes.vehicle_agent import VehicleAgent
+
+THING_NAME = "bench-vehicle"
+TERMINAL = ("SUCCEEDED", "FAILED", "REJECTED")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve_directory(directory: str) -> tuple[ThreadingHTTPServer, str]:
+    """Serves a directory over HTTP on a free port, returns the server and its base URL."""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile, None without values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summary(values: list[float]) -> dict[str, float | int | None]:
+    def rounded(value: float | None) -> float | None:
+        return None if value is None else round(value, 2)
+
+    return {
+        "count": len(values),
+        "p50": rounded(percentile(values, 50)),
+        "p95": rounded(percentile(values, 95)),
+        "max": rounded(max(values, default=None)),
+    }
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def max_rss_bytes() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def job_document(url: str, directory: str) -> dict:
+    return {
+        "version": "1.0",
+        "steps": [
+            {
+                "action": {
+                    "name": "Download-File",
+                    "type": "runHandler",
+                    "input": {
+                        "handler": "download-file.sh",
+                        "args": [url, directory],
+                        "path": "default",
+                    },
+                    "runAsUser": "root",
+                }
+            }
+        ],
+    }
+
+
+class Harness:
+    def __init__(self, options: argparse.Namespace, workdir: str) -> None:
+        self.options = options
+        self.workdir: str = workdir
+        self.broker = LocalBroker(quick_ack=not options.delayed_ack)
+        self.jobs = JobsService(self.broker)
+        self.http = None
+        self.base_url: str = ""
+        self.system: SimulatedSystem | None = None
+        self.client: IoTBaseClient | None = None
+        self.agent: VehicleAgent | None = None
+        self.metrics = Metrics()
+
+    async def start(self) -> None:
+        options = self.options
+        port = self.broker.start()
+        self.http, self.base_url = serve_directory(self.workdir)
+
+        self.client = IoTBaseClient.local("127.0.0.1", port, THING_NAME)
+        await asyncio.to_thread(self.client.connect)
+        jobs_client = IoTJobsClient(self.client, THING_NAME, metrics=self.metrics)
+
+        self.system = SimulatedSystem(time_scale=options.time_scale, seed=options.seed)
+        controller = MavsdkController(
+            "127.0.0.1", 14540, "udpin", system=self.system, metrics=self.metrics
+        )
+        scheduler = JobScheduler(
+            jobs_client,
+            controller,
+            THING_NAME,
+            validator=MissionValidator(),
+            progress_interval=options.progress_interval,
+            metrics=self.metrics,
+        )
+        publisher = TelemetryPublisher(
+            controller,
+            self.client,
+            f"devices/{THING_NAME}/telemetry",
+            rate_hz=options.telemetry_rate,
+            encoder=TelemetryEncoder().encode,
+            content_type=TELEMETRY_CONTENT_TYPE,
+            metrics=self.metrics,
+        )
+        recorder = (
+            FlightRecorder(os.path.join(self.workdir, "flight_data"))
+            if options.record
+            else None
+        )
+        self.agent = VehicleAgent(
+            THING_NAME,
+            controller,
+            jobs_client,
+            scheduler,
+            publisher,
+            None,
+            recorder,
+            metrics=self.metrics,
+        )
+        await self.agent.start()
+        await controller.connect(timeout=10)
+        await controller.telemetry_engine.wait_ready()
+
+    async def stop(self) -> None:
+        if self.agent:
+            await self.agent.stop()
+        if self.system:
+            await self.system.vehicle.stop()
+        if self.client:
+            self.client.disconnect()
+        if self.http:
+            self.http.shutdown()
+        self.broker.stop()
+
+    def _bundle(self, name: str, waypoints: int) -> str:
+        write_bundle(
+            os.path.join(self.workdir, "bundles", f"{name}.zip"),
+            THING_NAME,
+            synthetic_plan(waypoints, seed=self.options.seed),
+        )
+        return f"{self.base_url}/bundles/{name}.zip"
+
+    async def fly(self, job_id: str, waypoints: int, timeout: float) -> str:
+        """Queues a mission job and waits for its execution to finish."""
+        self.jobs.add_job(
+            THING_NAME,
+            job_id,
+            job_document(
+                self._bundle(job_id, waypoints),
+                os.path.join(self.workdir, "missions"),
+            ),
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.jobs.status(THING_NAME, job_id)
+            if status in TERMINAL:
+                return status
+            await asyncio.sleep(0.05)
+        return "TIMED_OUT"
+
+    async def pickup_latency(self) -> dict:
+        """Job pickup to ARMED over a series of short missions."""
+        to_downloading, to_armed, to_landed, statuses = [], [], [], []
+        for index in range(self.options.jobs):
+            job_id = f"short-{index}"
+            statuses.append(
+                await self.fly(job_id, self.options.waypoints, self.options.timeout)
+            )
+            added = self.jobs.added[job_id]
+            for values, phase in (
+                (to_downloading, "DOWNLOADING"),
+                (to_armed, "ARMED"),
+                (to_landed, "LANDED"),
+            ):
+                arrival = self.jobs.first_update(job_id, phase=phase)
+                if arrival is not None:
+                    values.append((arrival - added) * 1000)
+
+        return {
+            "jobs": len(statuses),
+            "succeeded": statuses.count("SUCCEEDED"),
+            "waypoints": self.options.waypoints,
+            "pickup_to_downloading_ms": summary(to_downloading),
+            "pickup_to_armed_ms": summary(to_armed),
+            "pickup_to_landed_ms": summary(to_landed),
+        }
+
+    async def long_mission(self) -> dict:
+        """Telemetry throughput and memory while flying one long mission."""
+        topic = f"devices/{THING_NAME}/telemetry"
+        messages, sent_bytes = self.broker.messages[topic], self.broker.bytes[topic]
+        rss: list[int] = [rss_bytes()]
+        started = time.monotonic()
+
+        async def sample_memory() -> None:
+            while True:
+                await asyncio.sleep(1)
+                rss.append(rss_bytes())
+
+        sampler = asyncio.create_task(sample_memory())
+        try:
+            status = await self.fly(
+                "long-0", self.options.long_waypoints, self.options.timeout * 10
+            )
+        finally:
+            sampler.cancel()
+        elapsed = time.monotonic() - started
+        rss.append(rss_bytes())
+
+        messages = self.broker.messages[topic] - messages
+        sent_bytes = self.broker.bytes[topic] - sent_bytes
+        return {
+            "status": status,
+            "waypoints": self.options.long_waypoints,
+            "wall_seconds": round(elapsed, 2),
+            "simulated_flight_seconds": round(self.system.vehicle.flight_seconds, 1),
+            "telemetry_messages_per_second": round(messages / elapsed, 2),
+            "telemetry_bytes_per_second": round(sent_bytes / elapsed, 1),
+            "telemetry_bytes_per_message": round(sent_bytes / max(messages, 1), 1),
+            "rss_start_bytes": rss[0],
+            "rss_end_bytes": rss[-1],
+            "rss_peak_bytes": max(rss),
+            "rss_growth_bytes": rss[-1] - rss[0],
+        }
+
+
+def encode_cost(frames: int = 5000) -> dict:
+    samples = synthetic_flight(frames)
+    compact_bytes, compact_us = measure(TelemetryEncoder().encode, samples)
+    json_bytes, json_us = measure(
+        lambda t: t.model_dump_json(exclude_none=True), samples
+    )
+    return {
+        "frames": frames,
+        "codec_version": CODEC_VERSION,
+        "compact_bytes_per_frame": round(compact_bytes, 1),
+        "compact_encode_us": round(compact_us, 2),
+        "json_bytes_per_frame": round(json_bytes, 1),
+        "json_encode_us": round(json_us, 2),
+    }
+
+
+async def run(options: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="agent-bench-") as workdir:
+        harness = Harness(options, workdir)
+        try:
+            await harness.start()
+            latency = await harness.pickup_latency()
+            long_mission = await harness.long_mission()
+        finally:
+            await harness.stop()
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": vars(options),
+        "job_latency": latency,
+        "long_mission": long_mission,
+        "agent_metrics": harness.metrics.collect(),
+        "encode": encode_cost(),
+        "max_rss_bytes": max_rss_bytes(),
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=5, help="short missions to fly")
+    parser.add_argument("--waypoints", type=int, default=10)
+    parser.add_argument("--long-waypoints", type=int, default=200)
+    parser.add_argument("--time-scale", type=float, default=50.0)
+    parser.add_argument("--telemetry-rate", type=float, default=10.0)
+    parser.add_argument("--progress-interval", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per short job")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", action="store_true", help="run the recorder")
+    parser.add_argument(
+        "--delayed-ack",
+        action="store_true",
+        help="keep the broker's delayed ACKs, see LocalBroker",
+    )
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    options = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level=options.log_level)
+
+    results = asyncio.run(run(options))
+    text = json.dumps(results, indent=2)
+    print(text)
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(text + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
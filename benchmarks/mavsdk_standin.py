@@ -0,0 +1,485 @@
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from mavsdk.action import ActionError, ActionResult
+from mavsdk.core import ConnectionState
+from mavsdk.log_files import Entry, ProgressData
+from mavsdk.mission_raw import (
+    MissionItem,
+    MissionProgress,
+    MissionRawError,
+    MissionRawResult,
+)
+from mavsdk.telemetry import (
+    Battery,
+    EulerAngle,
+    FixType,
+    FlightMode,
+    GpsInfo,
+    Health,
+    LandedState,
+    Position,
+    VelocityNed,
+)
+
+# MAV_FRAME values whose x and y are latitude and longitude in degrees * 1e7.
+GLOBAL_INT_FRAMES = (5, 6, 11)
+METERS_PER_DEGREE = 111_320.0
+HOME = (47.397742, 8.545594, 488.0)
+
+# Default rates of the periodic streams, Hz.
+DEFAULT_RATES: dict[str, float] = {
+    "position": 10.0,
+    "battery": 1.0,
+    "health": 1.0,
+    "in_air": 1.0,
+    "landed_state": 1.0,
+    "flight_mode": 1.0,
+    "mission_progress": 1.0,
+    "attitude_euler": 10.0,
+    "velocity_ned": 10.0,
+    "gps_info": 1.0,
+}
+
+
+class SimulatedVehicle:
+    """
+    A multicopter flying uploaded missions on an accelerated clock: every
+    `tick` seconds of wall time it advances `tick * time_scale` seconds of
+    flight. Sensor noise comes from a seeded generator, so runs with the same
+    seed fly the same way.
+    """
+
+    def __init__(
+        self,
+        time_scale: float = 1.0,
+        speed_mps: float = 10.0,
+        climb_mps: float = 3.0,
+        tick: float = 0.02,
+        seed: int = 1,
+    ) -> None:
+        self.time_scale: float = time_scale
+        self.speed_mps: float = speed_mps
+        self.climb_mps: float = climb_mps
+        self.tick: float = tick
+        self.rng = random.Random(seed)
+
+        self.latitude, self.longitude, self.home_altitude = HOME
+        self.altitude: float = 0.0  # above home
+        self.velocity: tuple[float, float, float] = (0.0, 0.0, 0.0)
+        self.armed: bool = False
+        self.in_air: bool = False
+        self.landed_state: LandedState = LandedState.ON_GROUND
+        self.flight_mode: FlightMode = FlightMode.READY
+        self.remaining_percent: float = 100.0
+
+        self.items: list[MissionItem] = []
+        self.current: int = 0
+        self.return_to_launch: bool = True
+        self.mission_running: bool = False
+        self.target: tuple[float, float, float] | None = None
+        self.flight_seconds: float = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="simulated-vehicle")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _item_target(self, item: MissionItem) -> tuple[float, float, float] | None:
+        if item.frame not in GLOBAL_INT_FRAMES:
+            return None
+        if not item.x and not item.y:
+            # A takeoff at the current position
+            return self.latitude, self.longitude, item.z
+        return item.x / 1e7, item.y / 1e7, item.z
+
+    def _move(self, target: tuple[float, float, float], dt: float) -> bool:
+        """Moves towards a target, returns True once it is reached."""
+        north = (target[0] - self.latitude) * METERS_PER_DEGREE
+        east = (
+            (target[1] - self.longitude)
+            * METERS_PER_DEGREE
+            * math.cos(math.radians(self.latitude))
+        )
+        up = target[2] - self.altitude
+        horizontal = math.hypot(north, east)
+
+        step = min(horizontal, self.speed_mps * dt)
+        climb = max(-self.climb_mps * dt, min(self.climb_mps * dt, up))
+        if horizontal > 0:
+            self.latitude += north / horizontal * step / METERS_PER_DEGREE
+            self.longitude += (
+                east
+                / horizontal
+                * step
+                / (METERS_PER_DEGREE * math.cos(math.radians(self.latitude)))
+            )
+        self.altitude += climb
+        self.velocity = (
+            north / horizontal * step / dt if horizontal else 0.0,
+            east / horizontal * step / dt if horizontal else 0.0,
+            -climb / dt,
+        )
+        return horizontal - step < 1.0 and abs(up - climb) < 0.5
+
+    def _step(self, dt: float) -> None:
+        if self.in_air:
+            self.flight_seconds += dt
+            self.remaining_percent = max(0.0, self.remaining_percent - dt * 0.02)
+
+        if self.flight_mode in (FlightMode.TAKEOFF, FlightMode.MISSION):
+            if not self.mission_running:
+                return
+            if self.current >= len(self.items):
+                self.mission_running = False
+                if self.return_to_launch:
+                    self.flight_mode = FlightMode.RETURN_TO_LAUNCH
+                    self.target = (HOME[0], HOME[1], max(self.altitude, 30.0))
+                else:
+                    self.flight_mode = FlightMode.HOLD
+                return
+
+            target = self._item_target(self.items[self.current])
+            if target is None or self._move(target, dt):
+                self.current += 1
+                if self.flight_mode == FlightMode.TAKEOFF and self.altitude > 1:
+                    self.flight_mode = FlightMode.MISSION
+                    self.landed_state = LandedState.IN_AIR
+            return
+
+        if self.flight_mode == FlightMode.RETURN_TO_LAUNCH:
+            if self._move(self.target, dt):
+                self.flight_mode = FlightMode.LAND
+                self.landed_state = LandedState.LANDING
+        elif self.flight_mode == FlightMode.LAND and self.in_air:
+            if self._move((self.latitude, self.longitude, 0.0), dt):
+                self.altitude, self.velocity = 0.0, (0.0, 0.0, 0.0)
+                self.in_air, self.armed = False, False
+                self.landed_state = LandedState.ON_GROUND
+                # PX4 stays in LAND until the next command.
+        elif self.flight_mode == FlightMode.HOLD and self.target:
+            if self._move(self.target, dt):
+                self.target = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self._step(self.tick * self.time_scale)
+
+    def start_mission(self) -> None:
+        if not self.items:
+            raise MissionRawError(
+                MissionRawResult(
+                    MissionRawResult.Result.NO_MISSION_AVAILABLE, "No mission"
+                ),
+                "start_mission()",
+            )
+        if not self.armed:
+            raise MissionRawError(
+                MissionRawResult(MissionRawResult.Result.ERROR, "Not armed"),
+                "start_mission()",
+            )
+        self.mission_running = True
+        if not self.in_air:
+            self.in_air = True
+            self.landed_state = LandedState.TAKING_OFF
+            self.flight_mode = FlightMode.TAKEOFF
+        else:
+            self.flight_mode = FlightMode.MISSION
+
+    # Sensor values, as MAVSDK reports them
+
+    def position(self) -> Position:
+        noise = self.rng.uniform(-0.05, 0.05)
+        return Position(
+            self.latitude,
+            self.longitude,
+            self.home_altitude + self.altitude + noise,
+            self.altitude + noise,
+        )
+
+    def battery(self) -> Battery:
+        load = 12.0 if self.in_air else 0.5
+        return Battery(
+            0,
+            math.nan,
+            14.8 + 2.0 * self.remaining_percent / 100,
+            load + self.rng.uniform(-0.5, 0.5),
+            (100 - self.remaining_percent) * 0.05,
+            self.remaining_percent,
+            math.nan,
+            None,
+        )
+
+    def health(self) -> Health:
+        return Health(True, True, True, True, True, True, not self.armed)
+
+    def attitude_euler(self) -> EulerAngle:
+        north, east, _ = self.velocity
+        yaw = math.degrees(math.atan2(east, north)) if north or east else 0.0
+        return EulerAngle(
+            self.rng.uniform(-1, 1),
+            -min(15.0, math.hypot(north, east)),
+            yaw,
+            int(time.monotonic() * 1e6),
+        )
+
+    def velocity_ned(self) -> VelocityNed:
+        return VelocityNed(*self.velocity)
+
+    def gps_info(self) -> GpsInfo:
+        return GpsInfo(14, FixType.FIX_3D)
+
+
+class _Plugin:
+    def __init__(self, vehicle: SimulatedVehicle, rates: dict[str, float]) -> None:
+        self.vehicle: SimulatedVehicle = vehicle
+        self.rates: dict[str, float] = rates
+
+    async def _periodic(self, name: str, value: Callable[[], Any]) -> AsyncIterator:
+        while True:
+            yield value()
+            await asyncio.sleep(1 / self.rates[name])
+
+    async def _on_change(self, name: str, value: Callable[[], Any]) -> AsyncIterator:
+        """Yields on every change and at the stream's rate otherwise, like PX4 does."""
+        last, sent_at = None, 0.0
+        while True:
+            current = value()
+            now = time.monotonic()
+            if current != last or now - sent_at >= 1 / self.rates[name]:
+                last, sent_at = current, now
+                yield current
+            await asyncio.sleep(self.vehicle.tick)
+
+
+class Core(_Plugin):
+    async def set_mavlink_timeout(self, timeout_s: float) -> None:
+        pass
+
+    async def connection_state(self) -> AsyncIterator[ConnectionState]:
+        yield ConnectionState(True)
+        await asyncio.Event().wait()
+
+
+class Telemetry(_Plugin):
+    def __getattr__(self, name: str):
+        # set_rate_<stream> for every stream
+        if name.startswith("set_rate_") and name[9:] in DEFAULT_RATES:
+
+            async def set_rate(rate_hz: float) -> None:
+                self.rates[name[9:]] = rate_hz
+
+            return set_rate
+        raise AttributeError(name)
+
+    def position(self):
+        return self._periodic("position", self.vehicle.position)
+
+    def battery(self):
+        return self._periodic("battery", self.vehicle.battery)
+
+    def health(self):
+        return self._periodic("health", self.vehicle.health)
+
+    def attitude_euler(self):
+        return self._periodic("attitude_euler", self.vehicle.attitude_euler)
+
+    def velocity_ned(self):
+        return self._periodic("velocity_ned", self.vehicle.velocity_ned)
+
+    def gps_info(self):
+        return self._periodic("gps_info", self.vehicle.gps_info)
+
+    def in_air(self):
+        return self._on_change("in_air", lambda: self.vehicle.in_air)
+
+    def landed_state(self):
+        return self._on_change("landed_state", lambda: self.vehicle.landed_state)
+
+    def flight_mode(self):
+        return self._on_change("flight_mode", lambda: self.vehicle.flight_mode)
+
+
+class Mission(_Plugin):
+    async def set_return_to_launch_after_mission(self, enable: bool) -> None:
+        self.vehicle.return_to_launch = enable
+
+
+class MissionRaw(_Plugin):
+    async def upload_mission(self, mission_items: list[MissionItem]) -> None:
+        self.vehicle.items = list(mission_items)
+        self.vehicle.current = 0
+        self.vehicle.mission_running = False
+
+    async def start_mission(self) -> None:
+        self.vehicle.start_mission()
+
+    async def pause_mission(self) -> None:
+        self.vehicle.mission_running = False
+        self.vehicle.flight_mode = FlightMode.HOLD
+
+    async def clear_mission(self) -> None:
+        self.vehicle.items, self.vehicle.current = [], 0
+        self.vehicle.mission_running = False
+
+    def mission_progress(self) -> AsyncIterator[MissionProgress]:
+        vehicle = self.vehicle
+        return self._on_change(
+            "mission_progress",
+            lambda: MissionProgress(
+                min(vehicle.current, len(vehicle.items)), len(vehicle.items)
+            ),
+        )
+
+
+class Action(_Plugin):
+    async def arm(self) -> None:
+        if self.vehicle.remaining_percent < 10:
+            raise ActionError(
+                ActionResult(ActionResult.Result.COMMAND_DENIED, "Battery low"),
+                "arm()",
+            )
+        self.vehicle.armed = True
+
+    async def return_to_launch(self) -> None:
+        vehicle = self.vehicle
+        if vehicle.in_air:
+            vehicle.mission_running = False
+            vehicle.flight_mode = FlightMode.RETURN_TO_LAUNCH
+            vehicle.target = (HOME[0], HOME[1], max(vehicle.altitude, 30.0))
+
+    async def goto_location(
+        self,
+        latitude_deg: float,
+        longitude_deg: float,
+        absolute_altitude_m: float,
+        yaw_deg: float,
+    ) -> None:
+        vehicle = self.vehicle
+        vehicle.mission_running = False
+        vehicle.flight_mode = FlightMode.HOLD
+        vehicle.target = (
+            latitude_deg,
+            longitude_deg,
+            absolute_altitude_m - vehicle.home_altitude,
+        )
+
+
+class LogFiles(_Plugin):
+    """Synthetic logs of seeded random bytes, 1 MiB each."""
+
+    LOG_BYTES = 1024 * 1024
+
+    async def get_entries(self) -> list[Entry]:
+        return [
+            Entry(i, f"2026-01-0{i + 1}T00:00:00Z", self.LOG_BYTES) for i in range(3)
+        ]
+
+    async def download_log_file(self, entry: Entry, path: str):
+        rng = random.Random(entry.id)
+        chunk = 64 * 1024
+        with open(path, "wb") as file:
+            for offset in range(0, entry.size_bytes, chunk):
+                size = min(chunk, entry.size_bytes - offset)
+                file.write(rng.randbytes(size))
+                await asyncio.sleep(0)
+                yield ProgressData((offset + size) / entry.size_bytes)
+
+
+class SimulatedSystem:
+    """
+    Stands in for mavsdk.System, with the plugins and streams the agent uses,
+    backed by a SimulatedVehicle instead of mavsdk_server and a MAVLink link.
+    """
+
+    def __init__(self, **vehicle_options) -> None:
+        self.vehicle = SimulatedVehicle(**vehicle_options)
+        self.rates: dict[str, float] = dict(DEFAULT_RATES)
+        self._server_process = None
+        self.core = Core(self.vehicle, self.rates)
+        self.telemetry = Telemetry(self.vehicle, self.rates)
+        self.mission = Mission(self.vehicle, self.rates)
+        self.mission_raw = MissionRaw(self.vehicle, self.rates)
+        self.action = Action(self.vehicle, self.rates)
+        self.log_files = LogFiles(self.vehicle, self.rates)
+
+    async def connect(self, system_address: str | None = None) -> None:
+        self.vehicle.start()
+
+
+def synthetic_plan(waypoints: int, seed: int = 1, spacing_m: float = 50.0) -> dict:
+    """
+    A QGroundControl plan of a takeoff and a lawnmower survey around HOME,
+    `waypoints` waypoints long.
+    """
+    rng = random.Random(seed)
+    lat0, lon0, _ = HOME
+    lanes = max(1, int(math.sqrt(waypoints)))
+    items: list[dict] = [
+        {
+            "type": "SimpleItem",
+            "command": 22,
+            "frame": 3,
+            "params": [0, 0, 0, None, lat0, lon0, 30],
+            "autoContinue": True,
+        }
+    ]
+    for i in range(waypoints):
+        lane, step = divmod(i, lanes)
+        if lane % 2:
+            step = lanes - 1 - step
+        north = lane * spacing_m
+        east = step * spacing_m + rng.uniform(-1, 1)
+        items.append(
+            {
+                "type": "SimpleItem",
+                "command": 16,
+                "frame": 3,
+                "params": [
+                    0,
+                    0,
+                    0,
+                    None,
+                    lat0 + north / METERS_PER_DEGREE,
+                    lon0 + east / (METERS_PER_DEGREE * math.cos(math.radians(lat0))),
+                    30,
+                ],
+                "autoContinue": True,
+            }
+        )
+    return {
+        "fileType": "Plan",
+        "version": 1,
+        "groundStation": "QGroundControl",
+        "mission": {
+            "version": 2,
+            "firmwareType": 12,
+            "vehicleType": 2,
+            "cruiseSpeed": 10,
+            "hoverSpeed": 5,
+            "plannedHomePosition": list(HOME),
+            "items": items,
+        },
+        "geoFence": {"version": 2, "polygons": [], "circles": []},
+        "rallyPoints": {"version": 2, "points": []},
+    }
+
+
+def write_bundle(path: str, member: str, plan: dict) -> str:
+    """Writes a mission bundle, a zip holding the plan under the thing name."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with ZipFile(path, "w", ZIP_DEFLATED) as archive:
+        archive.writestr(member, json.dumps(plan))
+    return path
@@ -0,0 +1,489 @@
+import asyncio
+import itertools
+import json
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+from src.Classes.mqtt_base import topic_matches
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+TOPIC_ALIAS = 0x23
+SUBSCRIPTION_IDENTIFIER = 0x0B
+TOPIC_ALIAS_MAXIMUM = 0x22
+
+# Wire type of each MQTT5 property the stand-in may see.
+PROPERTY_TYPES: dict[int, str] = {
+    0x01: "byte",
+    0x02: "int4",
+    0x03: "utf8",
+    0x08: "utf8",
+    0x09: "binary",
+    0x0B: "varint",
+    0x11: "int4",
+    0x12: "utf8",
+    0x15: "utf8",
+    0x16: "binary",
+    0x17: "byte",
+    0x18: "int4",
+    0x19: "byte",
+    0x1F: "utf8",
+    0x21: "int2",
+    0x22: "int2",
+    0x23: "int2",
+    0x26: "pair",
+    0x27: "int4",
+}
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, value = value % 128, value // 128
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _utf8(value: str | bytes) -> bytes:
+    data = value.encode() if isinstance(value, str) else value
+    return struct.pack("!H", len(data)) + data
+
+
+def _read_utf8(data: bytes, offset: int) -> tuple[bytes, int]:
+    (length,) = struct.unpack_from("!H", data, offset)
+    return data[offset + 2 : offset + 2 + length], offset + 2 + length
+
+
+def _read_properties(data: bytes, offset: int) -> tuple[list[tuple[int, object]], int]:
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    properties: list[tuple[int, object]] = []
+    while offset < end:
+        identifier, offset = _read_varint(data, offset)
+        kind = PROPERTY_TYPES[identifier]
+        if kind == "byte":
+            value, offset = data[offset], offset + 1
+        elif kind == "int2":
+            (value,), offset = struct.unpack_from("!H", data, offset), offset + 2
+        elif kind == "int4":
+            (value,), offset = struct.unpack_from("!I", data, offset), offset + 4
+        elif kind == "varint":
+            value, offset = _read_varint(data, offset)
+        elif kind == "pair":
+            name, offset = _read_utf8(data, offset)
+            text, offset = _read_utf8(data, offset)
+            value = (name, text)
+        else:
+            value, offset = _read_utf8(data, offset)
+        properties.append((identifier, value))
+    return properties, end
+
+
+def _properties(properties: list[tuple[int, object]]) -> bytes:
+    body = bytearray()
+    for identifier, value in properties:
+        body += _varint(identifier)
+        kind = PROPERTY_TYPES[identifier]
+        if kind == "byte":
+            body.append(value)
+        elif kind == "int2":
+            body += struct.pack("!H", value)
+        elif kind == "int4":
+            body += struct.pack("!I", value)
+        elif kind == "varint":
+            body += _varint(value)
+        elif kind == "pair":
+            body += _utf8(value[0]) + _utf8(value[1])
+        else:
+            body += _utf8(value)
+    return _varint(len(body)) + bytes(body)
+
+
+def _packet(kind: int, flags: int, body: bytes) -> bytes:
+    return bytes([kind << 4 | flags]) + _varint(len(body)) + body
+
+
+class _Session:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer: asyncio.StreamWriter = writer
+        self.client_id: str = ""
+        self.subscriptions: dict[str, int] = {}
+        self.aliases: dict[int, str] = {}
+        self.packet_ids = itertools.cycle(range(1, 0xFFFF))
+
+
+class LocalBroker:
+    """
+    A minimal MQTT 5 broker over plain TCP for offline benchmarks: CONNECT,
+    PUBLISH at QoS 0 and 1 with inbound topic aliases, SUBSCRIBE, UNSUBSCRIBE
+    and PINGREQ, which is what the agent's awscrt client uses. It runs its own
+    event loop on a thread so it never competes with the agent's loop, and
+    counts the messages and bytes published to every topic.
+
+    The CRT client does not disable Nagle's algorithm, so a request sent right
+    after acknowledging a response waits for the broker's delayed ACK, about
+    40 ms on Linux. With `quick_ack` the broker acknowledges every segment at
+    once, leaving that artifact of the loopback link out of the measurements.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", topic_aliases: int = 16, quick_ack: bool = True
+    ) -> None:
+        self.host: str = host
+        self.port: int = 0
+        self.topic_aliases: int = topic_aliases
+        self.quick_ack: bool = quick_ack and hasattr(socket, "TCP_QUICKACK")
+        self.messages: dict[str, int] = defaultdict(int)
+        self.bytes: dict[str, int] = defaultdict(int)
+        self._handlers: list[tuple[str, Callable[[str, bytes], None]]] = []
+        self._sessions: set[_Session] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.Server | None = None
+        self._thread: threading.Thread | None = None
+
+    def add_handler(self, topic_filter: str, handler: Callable[[str, bytes], None]):
+        """Handles client publishes to a topic filter on the broker thread."""
+        self._handlers.append((topic_filter, handler))
+
+    def start(self) -> int:
+        """Starts the broker thread and returns the port it listens on."""
+        started = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve, self.host, 0)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="mqtt-standin", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+    async def _shutdown(self) -> None:
+        self._server.close()
+        for session in list(self._sessions):
+            session.writer.close()
+        await self._server.wait_closed()
+
+    def call(self, callback: Callable, *args) -> None:
+        """Runs a callback on the broker thread."""
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def publish(self, topic: str, payload: bytes, qos: int = 1) -> None:
+        """Delivers a message to the matching subscribers. Broker thread only."""
+        self._deliver(topic, payload, qos, [])
+
+    def _deliver(
+        self, topic: str, payload: bytes, qos: int, properties: list[tuple[int, object]]
+    ) -> None:
+        forwarded = [
+            (identifier, value)
+            for identifier, value in properties
+            if identifier not in (TOPIC_ALIAS, SUBSCRIPTION_IDENTIFIER)
+        ]
+        for session in list(self._sessions):
+            granted = max(
+                (
+                    granted
+                    for topic_filter, granted in session.subscriptions.items()
+                    if topic_matches(topic_filter, topic)
+                ),
+                default=None,
+            )
+            if granted is None:
+                continue
+            out_qos = min(qos, granted)
+            body = _utf8(topic)
+            if out_qos:
+                body += struct.pack("!H", next(session.packet_ids))
+            body += _properties(forwarded) + payload
+            session.writer.write(_packet(PUBLISH, out_qos << 1, body))
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        session = _Session(writer)
+        self._sessions.add(session)
+        sock = writer.get_extra_info("socket")
+        try:
+            while True:
+                if self.quick_ack:
+                    # Linux clears the option again after every ACK.
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+                header = await reader.readexactly(1)
+                length, shift = 0, 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                if not self._handle(session, header[0] >> 4, header[0] & 0x0F, body):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+    def _handle(self, session: _Session, kind: int, flags: int, body: bytes) -> bool:
+        write = session.writer.write
+        if kind == CONNECT:
+            _, offset = _read_utf8(body, 0)
+            offset += 4  # version, flags, keep alive
+            _, offset = _read_properties(body, offset)
+            client_id, _ = _read_utf8(body, offset)
+            session.client_id = client_id.decode()
+            properties = _properties([(TOPIC_ALIAS_MAXIMUM, self.topic_aliases)])
+            write(_packet(CONNACK, 0, b"\x00\x00" + properties))
+        elif kind == PUBLISH:
+            qos = flags >> 1 & 0x03
+            topic_bytes, offset = _read_utf8(body, 0)
+            packet_id = None
+            if qos:
+                (packet_id,), offset = (
+                    struct.unpack_from("!H", body, offset),
+                    offset + 2,
+                )
+            properties, offset = _read_properties(body, offset)
+            topic = topic_bytes.decode()
+            alias = dict(properties).get(TOPIC_ALIAS)
+            if alias is not None:
+                if topic:
+                    session.aliases[alias] = topic
+                else:
+                    topic = session.aliases[alias]
+            payload = body[offset:]
+            if packet_id is not None:
+                write(_packet(PUBACK, 0, struct.pack("!H", packet_id)))
+
+            self.messages[topic] += 1
+            self.bytes[topic] += len(payload)
+            self._deliver(topic, payload, qos, properties)
+            for topic_filter, handler in self._handlers:
+                if topic_matches(topic_filter, topic):
+                    handler(topic, payload)
+        elif kind == SUBSCRIBE:
+            (packet_id,) = struct.unpack_from("!H", body, 0)
+            _, offset = _read_properties(body, 2)
+            codes = bytearray()
+            while offset < len(body):
+                topic_filter, offset = _read_utf8(body, offset)
+                granted = min(body[offset] & 0x03, 1)
+                offset += 1
+                session.subscriptions[topic_filter.decode()] = granted
+                codes.append(granted)
+            write(_packet(SUBACK, 0, struct.pack("!H", packet_id) + b"\x00" + codes))
+        elif kind == UNSUBSCRIBE:
+            (packet_id,) = struct.unpack_from("!H", body, 0)
+            _, offset = _read_properties(body, 2)
+            codes = bytearray()
+            while offset < len(body):
+                topic_filter, offset = _read_utf8(body, offset)
+                session.subscriptions.pop(topic_filter.decode(), None)
+                codes.append(0)
+            write(_packet(UNSUBACK, 0, struct.pack("!H", packet_id) + b"\x00" + codes))
+        elif kind == PINGREQ:
+            write(_packet(PINGRESP, 0, b""))
+        elif kind == DISCONNECT:
+            return False
+        return True
+
+
+class JobsService:
+    """
+    The AWS IoT Jobs MQTT API on top of the LocalBroker: get pending
+    executions, describe and update an execution, and the notify and
+    notify-next streams. Every status update is recorded with its arrival time.
+    """
+
+    TERMINAL = ("SUCCEEDED", "FAILED", "REJECTED", "CANCELED", "REMOVED", "TIMED_OUT")
+
+    def __init__(self, broker: LocalBroker) -> None:
+        self.broker: LocalBroker = broker
+        self.jobs: dict[str, dict[str, dict]] = defaultdict(dict)
+        # (arrival time, thing, job id, status, status details)
+        self.updates: list[tuple[float, str, str, str, dict]] = []
+        self.added: dict[str, float] = {}
+        self._next: dict[str, str | None] = {}
+        broker.add_handler("$aws/things/+/jobs/get", self._get_pending)
+        broker.add_handler("$aws/things/+/jobs/+/get", self._describe)
+        broker.add_handler("$aws/things/+/jobs/+/update", self._update)
+
+    def add_job(self, thing: str, job_id: str, document: dict) -> None:
+        """Queues a job execution for a thing. Thread-safe."""
+        self.broker.call(self._add_job, thing, job_id, document)
+
+    def _add_job(self, thing: str, job_id: str, document: dict) -> None:
+        now = time.time()
+        self.jobs[thing][job_id] = {
+            "jobId": job_id,
+            "thingName": thing,
+            "jobDocument": document,
+            "status": "QUEUED",
+            "queuedAt": int(now),
+            "lastUpdatedAt": int(now),
+            "versionNumber": 1,
+            "executionNumber": 1,
+        }
+        self.added[job_id] = time.monotonic()
+        self._notify(thing)
+
+    def _summary(self, execution: dict) -> dict:
+        return {
+            key: execution[key]
+            for key in (
+                "jobId",
+                "queuedAt",
+                "lastUpdatedAt",
+                "versionNumber",
+                "executionNumber",
+            )
+        }
+
+    def _pending(self, thing: str, status: str) -> list[dict]:
+        return [e for e in self.jobs[thing].values() if e["status"] == status]
+
+    def _notify(self, thing: str) -> None:
+        prefix = f"$aws/things/{thing}/jobs"
+        self.broker.publish(
+            f"{prefix}/notify",
+            json.dumps(
+                {
+                    "timestamp": int(time.time()),
+                    "jobs": {
+                        status: [self._summary(e) for e in self._pending(thing, status)]
+                        for status in ("QUEUED", "IN_PROGRESS")
+                        if self._pending(thing, status)
+                    },
+                }
+            ).encode(),
+        )
+
+        pending = self._pending(thing, "IN_PROGRESS") + self._pending(thing, "QUEUED")
+        next_execution = pending[0] if pending else None
+        next_id = next_execution["jobId"] if next_execution else None
+        if self._next.get(thing) == next_id:
+            return
+        self._next[thing] = next_id
+        message: dict = {"timestamp": int(time.time())}
+        if next_execution:
+            message["execution"] = next_execution
+        self.broker.publish(f"{prefix}/notify-next", json.dumps(message).encode())
+
+    def _respond(self, topic: str, outcome: str, message: dict, token) -> None:
+        message = {**message, "timestamp": int(time.time()), "clientToken": token}
+        self.broker.publish(f"{topic}/{outcome}", json.dumps(message).encode())
+
+    def _get_pending(self, topic: str, payload: bytes) -> None:
+        thing = topic.split("/")[2]
+        request = json.loads(payload or b"{}")
+        self._respond(
+            topic,
+            "accepted",
+            {
+                "inProgressJobs": [
+                    self._summary(e) for e in self._pending(thing, "IN_PROGRESS")
+                ],
+                "queuedJobs": [
+                    self._summary(e) for e in self._pending(thing, "QUEUED")
+                ],
+            },
+            request.get("clientToken"),
+        )
+
+    def _describe(self, topic: str, payload: bytes) -> None:
+        _, _, thing, _, job_id, _ = topic.split("/")
+        request = json.loads(payload or b"{}")
+        execution = self.jobs[thing].get(job_id)
+        if execution is None:
+            self._respond(
+                topic,
+                "rejected",
+                {"code": "ResourceNotFound", "message": f"No job {job_id}"},
+                request.get("clientToken"),
+            )
+            return
+        self._respond(
+            topic, "accepted", {"execution": execution}, request.get("clientToken")
+        )
+
+    def _update(self, topic: str, payload: bytes) -> None:
+        _, _, thing, _, job_id, _ = topic.split("/")
+        request = json.loads(payload)
+        execution = self.jobs[thing].get(job_id)
+        if execution is None or execution["status"] in self.TERMINAL:
+            self._respond(
+                topic,
+                "rejected",
+                {"code": "InvalidStateTransition", "message": f"Job {job_id}"},
+                request.get("clientToken"),
+            )
+            return
+
+        details = request.get("statusDetails") or {}
+        self.updates.append(
+            (time.monotonic(), thing, job_id, request["status"], details)
+        )
+        execution["status"] = request["status"]
+        execution["statusDetails"] = details
+        execution["versionNumber"] += 1
+        execution["lastUpdatedAt"] = int(time.time())
+        self._respond(
+            topic,
+            "accepted",
+            {
+                "executionState": {
+                    "status": execution["status"],
+                    "statusDetails": details,
+                    "versionNumber": execution["versionNumber"],
+                }
+            },
+            request.get("clientToken"),
+        )
+        self._notify(thing)
+
+    def first_update(self, job_id: str, **details: str) -> float | None:
+        """Arrival time of the first update of a job whose details include the given ones."""
+        for arrival, _, update_job, _, update_details in self.updates:
+            if update_job == job_id and all(
+                update_details.get(key) == value for key, value in details.items()
+            ):
+                return arrival
+        return None
+
+    def status(self, thing: str, job_id: str) -> str | None:
+        execution = self.jobs[thing].get(job_id)
+        return execution["status"] if execution else None
@@ -0,0 +1,166 @@
+import base64
+import json
+import math
+import random
+import struct
+import time
+from typing import Callable
+
+import cbor2
+
+from src.Classes.telemetry_batcher import TelemetryBatcher, decode_batch
+from src.Classes.telemetry_codec import (
+    CODES,
+    FIELDS,
+    TelemetryDecoder,
+    TelemetryEncoder,
+)
+from src.Models.telemetry_data import Battery, Health, Position, TelemetryData
+
+
+def synthetic_flight(frames: int, seed: int = 1) -> list[TelemetryData]:
+    """
+    Generates a survey-like flight: slowly drifting position and battery,
+    constant health flags.
+    """
+    rng = random.Random(seed)
+    samples: list[TelemetryData] = []
+    lat, lon, alt = 47.397742, 8.545594, 488.0
+
+    for i in range(frames):
+        lat += 2e-6 * math.cos(i / 200)
+        lon += 2e-6 * math.sin(i / 200)
+        samples.append(
+            TelemetryData(
+                position=Position(
+                    latitude_deg=lat,
+                    longitude_deg=lon,
+                    absolute_altitude_m=alt + 30 + rng.uniform(-0.05, 0.05),
+                    relative_altitude_m=30 + rng.uniform(-0.05, 0.05),
+                ),
+                battery=Battery(
+                    temperature_degc=math.nan,
+                    voltage_v=16.2 - i * 1e-5,
+                    current_battery_a=12.0 + rng.uniform(-0.5, 0.5),
+                    capacity_consumed_ah=i * 1e-4,
+                    remaining_percent=100 - i * 5e-4,
+                ),
+                health=Health(
+                    is_gyrometer_calibration_ok=True,
+                    is_accelerometer_calibration_ok=True,
+                    is_magnetometer_calibration_ok=True,
+                    is_local_position_ok=True,
+                    is_global_position_ok=True,
+                    is_home_position_ok=True,
+                    is_armable=True,
+                ),
+                in_air=True,
+            )
+        )
+
+    return samples
+
+
+def range_limits(value: float = 1.0) -> TelemetryData:
+    """
+    A sample with every numeric field one step below the top of its range, or
+    at the given fraction of it, and the enums at their last name.
+    """
+    groups: dict[str, dict] = {}
+    top_level: dict = {}
+    for model, field, fmt, scale in FIELDS:
+        bits = struct.calcsize("<" + fmt) * 8
+        # The signed minimum and the unsigned maximum are the NaN sentinels.
+        high = 2 ** (bits - 1) - 1 if fmt.islower() else 2**bits - 2
+        if field in CODES:
+            decoded = CODES[field][-1]
+        elif field == "is_available":
+            decoded = True
+        else:
+            decoded = round((high - 1) * value) / scale
+        (groups.setdefault(model, {}) if model else top_level)[field] = decoded
+
+    return TelemetryData(
+        health=Health(**dict.fromkeys(Health.model_fields, True)),
+        in_air=True,
+        **groups,
+        **top_level,
+    )
+
+
+def check_ranges() -> None:
+    """Values near the top of each field's range round-trip through frames and batches."""
+    samples = [range_limits(fraction) for fraction in (1.0, 0.999, 0.5)]
+    # A 16S pack at full charge, a long-range distance sensor
+    samples.append(
+        samples[-1].model_copy(
+            update={
+                "battery": samples[-1].battery.model_copy(update={"voltage_v": 67.2}),
+                "distance_sensor": samples[-1].distance_sensor.model_copy(
+                    update={"current_distance_m": 120.0}
+                ),
+            }
+        )
+    )
+
+    encoder, decoder = TelemetryEncoder(), TelemetryDecoder()
+    batcher = TelemetryBatcher(max_frames=len(samples))
+    for sample in samples:
+        batcher.append(sample)
+    batched = [decoded for _, decoded in decode_batch(batcher.flush())]
+    for sample, from_batch in zip(samples, batched):
+        for decoded in (decoder.decode(encoder.encode(sample)), from_batch):
+            for model, field, _, scale in FIELDS:
+                expected = getattr(getattr(sample, model) if model else sample, field)
+                actual = getattr(getattr(decoded, model) if model else decoded, field)
+                if isinstance(expected, float):
+                    assert abs(actual - expected) <= 0.5 / scale, (field, actual)
+                else:
+                    assert actual == expected, (field, actual)
+
+
+def measure(
+    encode: Callable[[TelemetryData], str | bytes], samples: list[TelemetryData]
+) -> tuple[float, float]:
+    """Returns (bytes/frame, encode µs/frame)."""
+    total_bytes = 0
+    start = time.perf_counter()
+    for sample in samples:
+        total_bytes += len(encode(sample))
+    elapsed = time.perf_counter() - start
+
+    return total_bytes / len(samples), elapsed / len(samples) * 1e6
+
+
+def main(frames: int = 5000) -> None:
+    samples = synthetic_flight(frames)
+
+    # Sanity check: the compact codec round-trips.
+    encoder, decoder = TelemetryEncoder(), TelemetryDecoder()
+    for sample in samples[:100]:
+        decoded = decoder.decode(encoder.encode(sample))
+        assert abs(decoded.position.latitude_deg - sample.position.latitude_deg) < 1e-6
+    check_ranges()
+
+    encoders: dict[str, Callable[[TelemetryData], str | bytes]] = {
+        "json": lambda t: t.model_dump_json(exclude_none=True),
+        "cbor+base64": lambda t: base64.b64encode(
+            cbor2.dumps(t.model_dump(exclude_none=True))
+        ),
+        "cbor": lambda t: cbor2.dumps(t.model_dump(exclude_none=True)),
+        "compact (keyframes only)": TelemetryEncoder(keyframe_interval=1).encode,
+        "compact (delta, keyframe/50)": TelemetryEncoder(keyframe_interval=50).encode,
+    }
+
+    results = {}
+    print(f"{'codec':<30}{'bytes/frame':>14}{'µs/frame':>12}")
+    for name, encode in encoders.items():
+        size, micros = measure(encode, samples)
+        results[name] = {"bytes_per_frame": size, "encode_us_per_frame": micros}
+        print(f"{name:<30}{size:>14.1f}{micros:>12.2f}")
+
+    print(json.dumps({"frames": frames, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Per-sample cost of the telemetry hot path at 50 Hz, before and after
+TelemetryRecord: fusing the MAVSDK values into pydantic models for every
+frame, against updating the record in place and encoding it directly.
+
+    python -m benchmarks.telemetry_record --frames 20000
+
+Reports CPU µs and garbage collections per frame, the CPU share of one core
+at 50 Hz, and the memory allocated transiently per frame (tracemalloc).
+"""
+
+import argparse
+import gc
+import json
+import math
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from mavsdk.telemetry import (
+    Battery,
+    EulerAngle,
+    FixType,
+    FlightMode,
+    GpsInfo,
+    Health,
+    Position,
+    VelocityNed,
+)
+
+from src.Classes.telemetry_codec import TelemetryEncoder
+from src.Classes.telemetry_engine import fuse
+from src.Classes.telemetry_record import TelemetryRecord
+
+RATE_HZ = 50
+HEALTH = Health(True, True, True, True, True, True, True)
+
+
+def synthetic_samples(frames: int) -> list[list[tuple[str, Any]]]:
+    """
+    The MAVSDK samples arriving between two frames of a 50 Hz flight: position,
+    attitude and velocity every frame, battery and GPS once a second, health
+    and the on-change streams when they change.
+    """
+    lat, lon = 47.397742, 8.545594
+    samples: list[list[tuple[str, Any]]] = []
+    for i in range(frames):
+        lat += 2e-6 * math.cos(i / 200)
+        lon += 2e-6 * math.sin(i / 200)
+        tick: list[tuple[str, Any]] = [
+            ("position", Position(lat, lon, 518.0 + i % 7 * 0.01, 30.0)),
+            ("attitude", EulerAngle(1.5, -2.0, i / 10 % 360, i * 20_000)),
+            ("velocity_ned", VelocityNed(4.0, 3.0, -0.1)),
+        ]
+        if i % RATE_HZ == 0:
+            tick += [
+                (
+                    "battery",
+                    Battery(
+                        0, math.nan, 16.2 - i * 1e-5, 12.0, i * 1e-4, 90, math.nan, None
+                    ),
+                ),
+                ("gps_info", GpsInfo(14, FixType.FIX_3D)),
+            ]
+        if i == 0:
+            tick += [
+                ("health", HEALTH),
+                ("in_air", True),
+                ("flight_mode", FlightMode.MISSION),
+            ]
+        samples.append(tick)
+    return samples
+
+
+def fused() -> Callable[[list[tuple[str, Any]]], bytes]:
+    """Before: the latest values in a snapshot, fused into TelemetryData per frame."""
+    encoder, snapshot = TelemetryEncoder(), {}
+
+    def step(tick: list[tuple[str, Any]]) -> bytes:
+        for name, value in tick:
+            snapshot[name] = value
+        return encoder.encode(fuse(snapshot))
+
+    return step
+
+
+def recorded() -> Callable[[list[tuple[str, Any]]], bytes]:
+    """After: the latest values in a TelemetryRecord, encoded directly."""
+    encoder, record = TelemetryEncoder(), TelemetryRecord()
+
+    def step(tick: list[tuple[str, Any]]) -> bytes:
+        for name, value in tick:
+            record.update(name, value)
+        return encoder.encode(record)
+
+    return step
+
+
+def transient_bytes(step: Callable, samples: list[list[tuple[str, Any]]]) -> float:
+    """Mean peak of the memory allocated within a frame, bytes."""
+    total = 0
+    tracemalloc.start()
+    for tick in samples:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        step(tick)
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / len(samples)
+
+
+def measure(
+    factory: Callable[[], Callable], samples: list, allocation_frames: int
+) -> dict:
+    step = factory()
+    # The first frame warms up pydantic and the encoder's struct cache.
+    step(samples[0])
+    gc.collect()
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    started = time.process_time()
+    for tick in samples[1:]:
+        step(tick)
+    cpu = time.process_time() - started
+    collections = sum(stats["collections"] for stats in gc.get_stats()) - collections
+
+    frames = len(samples) - 1
+    per_frame_us = cpu / frames * 1e6
+    return {
+        "cpu_us_per_frame": round(per_frame_us, 2),
+        "cpu_percent_at_50hz": round(per_frame_us * RATE_HZ / 1e4, 3),
+        "gc_collections_per_1000_frames": round(collections / frames * 1000, 2),
+        "transient_bytes_per_frame": round(
+            transient_bytes(factory(), samples[:allocation_frames]), 1
+        ),
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--allocation-frames", type=int, default=2_000)
+    options = parser.parse_args(argv)
+
+    samples = synthetic_samples(options.frames + 1)
+    results = {
+        "fuse + encode (before)": measure(fused, samples, options.allocation_frames),
+        "record + encode (after)": measure(
+            recorded, samples, options.allocation_frames
+        ),
+    }
+
+    print(
+        f"{'path':<26}{'µs/frame':>10}{'CPU % @50Hz':>13}"
+        f"{'GC/1k frames':>14}{'bytes/frame':>13}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<26}{result['cpu_us_per_frame']:>10.2f}"
+            f"{result['cpu_percent_at_50hz']:>13.3f}"
+            f"{result['gc_collections_per_1000_frames']:>14.2f}"
+            f"{result['transient_bytes_per_frame']:>13.1f}"
+        )
+    output = {"rate_hz": RATE_HZ, "frames": options.frames, "results": results}
+    print(json.dumps(output))
+    return output
+
+
+if __name__ == "__main__":
+    main()
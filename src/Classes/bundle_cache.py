@@ -0,0 +1,132 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+ARCHIVE_NAME = "mission.bundle.zip"
+SHA256_PATTERN = re.compile(r"[0-9a-fA-F]{64}")
+
+
+class BundleCache:
+    """
+    Content-addressed on-disk cache of mission bundles. Entries are built in a
+    staging directory and renamed into place, so a half-written entry is never
+    visible. The least recently used entries are evicted once the cache grows
+    past `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.root: Path = Path(root)
+        self.max_bytes: int = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pinned: dict[str, int] = {}
+
+        # Staging directories left behind by an interrupted publish.
+        for staging in self.root.glob(".staging-*"):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def key_for(
+        sha256: str | None = None, url: str | None = None, etag: str | None = None
+    ) -> str | None:
+        """
+        Builds a cache key from the bundle digest, or from the URL and its ETag.
+        The query string is ignored since presigned URLs change on every job.
+        Returns:
+            str | None: The key, or None if the bundle cannot be identified.
+        """
+        if sha256 and SHA256_PATTERN.fullmatch(sha256):
+            return sha256.lower()
+        if url and etag:
+            parts = urlsplit(url)
+            identity = f"{parts.netloc}{parts.path}|{etag}"
+            return "etag-" + hashlib.sha256(identity.encode()).hexdigest()
+        return None
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def lookup(self, key: str) -> str | None:
+        """
+        Returns the cached archive of a bundle and pins the entry.
+        Returns:
+            str | None: The path of the archive, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entry(key)
+            if not (entry / ARCHIVE_NAME).exists():
+                return None
+
+            os.utime(entry)
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+        logger.info(f"Mission bundle cache hit for {key}")
+        return str(entry / ARCHIVE_NAME)
+
+    def publish(self, key: str, archive_path: str) -> str:
+        """
+        Adds a downloaded bundle to the cache and pins the entry.
+        Args:
+            key (str): The cache key of the bundle.
+            archive_path (str): The downloaded archive, moved into the cache.
+        Returns:
+            str: The path of the cached archive.
+        """
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.root))
+        try:
+            shutil.move(archive_path, staging / ARCHIVE_NAME)
+            with self._lock:
+                entry = self._entry(key)
+                if not entry.exists():
+                    os.rename(staging, entry)
+                self._pinned[key] = self._pinned.get(key, 0) + 1
+                self._evict()
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        logger.info(f"Cached mission bundle {key}")
+        return str(entry / ARCHIVE_NAME)
+
+    def release(self, key: str) -> None:
+        """Unpins an entry returned by lookup or publish so it can be evicted."""
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+
+    @staticmethod
+    def _size(entry: Path) -> int:
+        return sum(path.stat().st_size for path in entry.rglob("*") if path.is_file())
+
+    def _evict(self) -> None:
+        entries = [
+            (entry.stat().st_mtime, entry, self._size(entry))
+            for entry in self.root.iterdir()
+            if entry.is_dir() and not entry.name.startswith(".")
+        ]
+        total: int = sum(size for _, _, size in entries)
+
+        for _, entry, size in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.name in self._pinned:
+                continue
+
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted mission bundle {entry.name} from cache")
+
+        if total > self.max_bytes:
+            logger.warning(
+                f"Bundle cache over its limit by {total - self.max_bytes} bytes"
+            )
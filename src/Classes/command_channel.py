@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import json
+import time
+
+import cbor2
+from awscrt import mqtt5
+from loguru import logger
+from pydantic import ValidationError
+
+from src.Classes.job_scheduler import JobScheduler
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.mqtt_base import IoTBaseClient
+from src.Enums.command_status import CommandStatus
+from src.Enums.command_type import CommandType
+from src.Models.command import Command, CommandAck
+
+# Lower runs first; a command preempts a running one of a higher value.
+PRIORITIES: dict[CommandType, int] = {
+    CommandType.CANCEL: 0,
+    CommandType.RTL: 0,
+    CommandType.PAUSE: 1,
+    CommandType.RESUME: 2,
+    CommandType.GOTO: 2,
+}
+
+
+class CommandChannel:
+    """
+    Receives in-flight commands from the cloud and dispatches them to the
+    vehicle in priority order. Messages are decoded on the CRT thread and handed
+    to the event loop, so a cancel never waits behind other work; a command that
+    is still executing is preempted when a more urgent one arrives. Every
+    command is acknowledged with its queueing, execution and end-to-end latency.
+    """
+
+    def __init__(
+        self,
+        controller: MavsdkController,
+        client: IoTBaseClient,
+        scheduler: JobScheduler,
+        thing_name: str,
+    ) -> None:
+        self.controller: MavsdkController = controller
+        self.client: IoTBaseClient = client
+        self.scheduler: JobScheduler = scheduler
+        self.cancel_topic: str = f"groups/{thing_name}/cancel"
+        self.command_topic: str = f"devices/{thing_name}/commands"
+        self.ack_topic: str = f"devices/{thing_name}/commands/ack"
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._current: tuple[int, asyncio.Task] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._task = asyncio.create_task(self._dispatch(), name="commands")
+        for topic in (self.cancel_topic, self.command_topic):
+            await asyncio.to_thread(self.client.subscribe, topic, self._on_message)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @staticmethod
+    def decode(payload: bytes, content_type: str | None = None) -> Command:
+        """
+        Decodes a compact command, CBOR if the content type says so and JSON otherwise.
+        Raises:
+            ValueError: If the payload is not a valid command.
+        """
+        try:
+            if content_type == "application/cbor":
+                data = cbor2.loads(payload)
+            else:
+                data = json.loads(payload)
+            return Command.model_validate(data)
+        except (cbor2.CBORDecodeError, ValidationError) as e:
+            raise ValueError(str(e)) from e
+
+    def _on_message(self, topic: str, payload: bytes, content_type=None, **_) -> None:
+        received: float = time.monotonic()
+        try:
+            command: Command = self.decode(payload, content_type)
+        except ValueError as e:
+            if topic != self.cancel_topic:
+                logger.warning(f"Ignoring invalid command on {topic}: {e}")
+                return
+            command = Command.model_validate({"type": CommandType.CANCEL})
+
+        if topic == self.cancel_topic:
+            command.type = CommandType.CANCEL
+        if self.loop is None:
+            logger.warning(f"Command channel not started, dropping command on {topic}")
+            return
+        self.loop.call_soon_threadsafe(self._enqueue, command, received)
+
+    def _enqueue(self, command: Command, received: float) -> None:
+        priority: int = PRIORITIES[command.type]
+        self._queue.put_nowait((priority, next(self._sequence), command, received))
+
+        if self._current and priority < self._current[0]:
+            logger.warning(f"Command {command.type.value} preempts the running command")
+            self._current[1].cancel()
+
+    async def _dispatch(self) -> None:
+        while True:
+            priority, _, command, received = await self._queue.get()
+            started: float = time.monotonic()
+            task = asyncio.create_task(self._execute(command))
+            self._current = (priority, task)
+
+            detail: str | None = None
+            try:
+                succeeded, detail = await task
+                status = CommandStatus.SUCCEEDED if succeeded else CommandStatus.FAILED
+            except asyncio.CancelledError:
+                current = asyncio.current_task()
+                if current and current.cancelling():
+                    task.cancel()
+                    raise
+                status = CommandStatus.PREEMPTED
+            except ValueError as e:
+                status, detail = CommandStatus.REJECTED, str(e)
+            except Exception as e:
+                status, detail = CommandStatus.FAILED, str(e)
+            finally:
+                self._current = None
+
+            self._ack(command, status, detail, received, started)
+
+    async def _execute(self, command: Command) -> tuple[bool, str | None]:
+        match command.type:
+            case CommandType.CANCEL | CommandType.RTL:
+                if command.type == CommandType.CANCEL:
+                    succeeded = await self.controller.cancel_mission()
+                else:
+                    succeeded = await self.controller.return_to_launch()
+                # The vehicle is commanded first, the job is failed afterwards.
+                if self.scheduler.abort_current(f"{command.type.value} command"):
+                    return bool(succeeded), "mission aborted"
+                return bool(succeeded), None
+            case CommandType.PAUSE:
+                return bool(await self.controller.pause_mission()), None
+            case CommandType.RESUME:
+                return bool(await self.controller.resume_mission()), None
+            case CommandType.GOTO:
+                if len(command.params) < 3:
+                    raise ValueError("goto needs latitude, longitude and altitude")
+                return (
+                    bool(await self.controller.goto_location(*command.params[:4])),
+                    None,
+                )
+
+    def _ack(
+        self,
+        command: Command,
+        status: CommandStatus,
+        detail: str | None,
+        received: float,
+        started: float,
+    ) -> None:
+        now: float = time.monotonic()
+        ack = CommandAck(
+            id=command.id,
+            type=command.type,
+            status=status,
+            detail=detail,
+            queued_ms=(started - received) * 1000,
+            execution_ms=(now - started) * 1000,
+            latency_ms=(
+                time.time() * 1000 - command.sent_at_ms if command.sent_at_ms else None
+            ),
+        )
+        logger.info(
+            f"Command {command.type.value} {command.id} {status.value} in {ack.queued_ms + ack.execution_ms:.0f} ms"
+        )
+        try:
+            self.client.publish(
+                self.ack_topic,
+                ack.model_dump_json(exclude_none=True),
+                qos=mqtt5.QoS.AT_LEAST_ONCE,
+                content_type="application/json",
+            )
+        except Exception as e:
+            logger.warning(f"Failed to acknowledge command {command.id}: {e}")
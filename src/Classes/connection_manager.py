@@ -0,0 +1,128 @@
+import asyncio
+
+from loguru import logger
+from mavsdk import System as MavSystem
+
+from src.Enums.link_state import LinkState
+
+
+class ConnectionManager:
+    """
+    Owns the link to the vehicle for the lifetime of the agent. mavsdk_server is
+    started once and kept running; MAVSDK itself re-establishes the MAVLink
+    link when heartbeats resume, so only a failed server is restarted, with
+    exponential backoff. The link state is exposed as events to await instead
+    of being polled by every caller.
+    """
+
+    def __init__(
+        self,
+        system: MavSystem,
+        system_address: str,
+        heartbeat_timeout: float = 3.0,
+        min_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+    ) -> None:
+        self.system: MavSystem = system
+        self.system_address: str = system_address
+        self.heartbeat_timeout: float = heartbeat_timeout
+        self.min_backoff: float = min_backoff
+        self.max_backoff: float = max_backoff
+
+        self.state: LinkState = LinkState.DISCONNECTED
+        self._connected = asyncio.Event()
+        self._disconnected = asyncio.Event()
+        self._disconnected.set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self.state == LinkState.CONNECTED
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts connecting in the background, once."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="mavsdk-connection")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._set_state(LinkState.DISCONNECTED)
+
+    async def wait_connected(self, timeout: float | None = None) -> bool:
+        """
+        Waits until the vehicle link is up.
+        Args:
+            timeout (float | None): Maximum seconds to wait, None to wait forever.
+        Returns:
+            bool: True if the link is up, False if the timeout expired.
+        """
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_disconnected(self) -> None:
+        """Waits until the vehicle link is lost."""
+        await self._disconnected.wait()
+
+    def _set_state(self, state: LinkState) -> None:
+        if state == self.state:
+            return
+
+        logger.info(f"Vehicle link {self.state.value} -> {state.value}")
+        self.state = state
+        if state == LinkState.CONNECTED:
+            self._disconnected.clear()
+            self._connected.set()
+        else:
+            self._connected.clear()
+            self._disconnected.set()
+
+    def _server_exited(self) -> bool:
+        process = getattr(self.system, "_server_process", None)
+        return process is not None and process.poll() is not None
+
+    async def _start_server(self) -> None:
+        # System.connect restarts a server it spawned, so it is only called
+        # again when that server has died.
+        logger.info(f"Connecting to {self.system_address}")
+        await self.system.connect(system_address=self.system_address)
+        await self.system.core.set_mavlink_timeout(self.heartbeat_timeout)
+
+    async def _run(self) -> None:
+        backoff: float = self.min_backoff
+        started: bool = False
+        while True:
+            self._set_state(LinkState.CONNECTING)
+            try:
+                if not started or self._server_exited():
+                    await self._start_server()
+                    started = True
+
+                async for state in self.system.core.connection_state():
+                    if state.is_connected:
+                        backoff = self.min_backoff
+                        self._set_state(LinkState.CONNECTED)
+                    else:
+                        logger.warning("Vehicle heartbeat lost, waiting for the link")
+                        self._set_state(LinkState.CONNECTING)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Vehicle connection failed: {e}")
+
+            self._set_state(LinkState.DISCONNECTED)
+            if self._server_exited():
+                logger.warning("mavsdk_server exited, restarting it")
+
+            logger.info(f"Reconnecting to the vehicle in {backoff:.1f} s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
@@ -0,0 +1,355 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+from src.Enums.spool_eviction_policy import SpoolEvictionPolicy
+from src.Enums.spool_record_type import SpoolRecordType
+
+SEGMENT_MAGIC = b"OASP"
+SEGMENT_VERSION = 1
+
+# magic, version, read offset, write offset
+SEGMENT_HEADER = struct.Struct("<4sHxxII")
+# key + data length, crc32 of key + data, spool time (unix seconds), key length
+RECORD_HEADER = struct.Struct("<IIdH")
+
+
+class SpoolSegment:
+    """
+    A preallocated, memory-mapped, append-only segment file. The read and write
+    offsets are persisted in the segment header so a restart resumes where the
+    previous run stopped.
+    """
+
+    def __init__(self, path: Path, size: int | None = None) -> None:
+        self.path: Path = path
+        create: bool = size is not None
+
+        with open(path, "w+b" if create else "r+b") as file:
+            if create:
+                file.truncate(size)
+            self.size: int = os.fstat(file.fileno()).st_size
+            self.mm: mmap.mmap = mmap.mmap(file.fileno(), self.size)
+
+        if create:
+            self.read_offset: int = SEGMENT_HEADER.size
+            self.write_offset: int = SEGMENT_HEADER.size
+            self.sync()
+        else:
+            self._recover()
+
+    def _recover(self) -> None:
+        magic, version, read_offset, write_offset = SEGMENT_HEADER.unpack_from(self.mm)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise ValueError(f"{self.path} is not a spool segment")
+
+        self.read_offset = max(read_offset, SEGMENT_HEADER.size)
+        self.write_offset = min(write_offset, self.size)
+
+        # Drop a torn or corrupt tail left behind by a power loss.
+        offset: int = self.read_offset
+        while offset < self.write_offset:
+            record = self.read(offset)
+            if record is None:
+                logger.warning(f"Truncating corrupt spool segment {self.path}")
+                self.write_offset = offset
+                break
+            offset = record[2]
+
+        self.sync()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.read_offset >= self.write_offset
+
+    def append(self, record: bytes) -> bool:
+        if self.write_offset + len(record) > self.size:
+            return False
+
+        self.mm[self.write_offset : self.write_offset + len(record)] = record
+        self.write_offset += len(record)
+        self.sync()
+        return True
+
+    def read(self, offset: int) -> tuple[str, bytes, int] | None:
+        """Returns the key, data and next offset of the record at offset, or None if it is invalid."""
+        if offset + RECORD_HEADER.size > self.write_offset:
+            return None
+
+        length, crc, _, key_length = RECORD_HEADER.unpack_from(self.mm, offset)
+        start: int = offset + RECORD_HEADER.size
+        end: int = start + length
+        if end > self.write_offset or key_length > length:
+            return None
+
+        payload: bytes = self.mm[start:end]
+        if zlib.crc32(payload) != crc:
+            return None
+
+        return payload[:key_length].decode(), payload[key_length:], end
+
+    def advance(self, offset: int) -> None:
+        self.read_offset = offset
+        self._write_header()
+
+    def reset(self) -> None:
+        self.read_offset = SEGMENT_HEADER.size
+        self.write_offset = SEGMENT_HEADER.size
+        self.sync()
+
+    def _write_header(self) -> None:
+        SEGMENT_HEADER.pack_into(
+            self.mm,
+            0,
+            SEGMENT_MAGIC,
+            SEGMENT_VERSION,
+            self.read_offset,
+            self.write_offset,
+        )
+
+    def sync(self) -> None:
+        self._write_header()
+        self.mm.flush()
+
+    def close(self) -> None:
+        if not self.mm.closed:
+            self.sync()
+            self.mm.close()
+
+    def delete(self) -> None:
+        if not self.mm.closed:
+            self.mm.close()
+        self.path.unlink(missing_ok=True)
+
+
+class DiskSpool:
+    """
+    Persistent store-and-forward spool for outbound messages while offline.
+
+    Every record type is stored in its own series of segment files. Records are
+    drained oldest-first, with job updates before telemetry, through the
+    handler registered for their type. The total size on disk is capped; when
+    the cap is reached, the eviction policy either deletes the oldest
+    telemetry segments (then job update segments) or rejects new records.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        segment_bytes: int = 1024 * 1024,
+        eviction: SpoolEvictionPolicy = SpoolEvictionPolicy.DROP_OLDEST,
+    ) -> None:
+        if segment_bytes > max_bytes:
+            raise ValueError("segment_bytes cannot exceed max_bytes")
+
+        self.directory: Path = Path(directory)
+        self.max_bytes: int = max_bytes
+        self.segment_bytes: int = segment_bytes
+        self.eviction: SpoolEvictionPolicy = eviction
+
+        self._handlers: dict[SpoolRecordType, Callable[[str, bytes], bool]] = {}
+        self._segments: dict[SpoolRecordType, list[SpoolSegment]] = {}
+        self._next_segment_id: int = 0
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._drain_requested = threading.Event()
+
+        self._load()
+
+    def _load(self) -> None:
+        for record_type in SpoolRecordType:
+            directory = self.directory / record_type.value
+            directory.mkdir(parents=True, exist_ok=True)
+
+            segments: list[SpoolSegment] = []
+            for path in sorted(directory.glob("*.seg")):
+                self._next_segment_id = max(self._next_segment_id, int(path.stem) + 1)
+                try:
+                    segments.append(SpoolSegment(path))
+                except (ValueError, OSError, struct.error) as e:
+                    logger.warning(f"Discarding spool segment {path}: {e}")
+                    path.unlink(missing_ok=True)
+            self._segments[record_type] = segments
+
+        pending = sum(
+            1
+            for segments in self._segments.values()
+            for s in segments
+            if not s.exhausted
+        )
+        if pending:
+            logger.info(f"Spool has {pending} segments pending from a previous run")
+
+    def total_bytes(self) -> int:
+        return sum(s.size for segments in self._segments.values() for s in segments)
+
+    def pending(self, record_type: SpoolRecordType | None = None) -> bool:
+        """Whether there are undrained records, optionally of a single type."""
+        with self._lock:
+            types = [record_type] if record_type else list(SpoolRecordType)
+            return any(not s.exhausted for t in types for s in self._segments[t])
+
+    def register(
+        self, record_type: SpoolRecordType, handler: Callable[[str, bytes], bool]
+    ) -> None:
+        """
+        Registers the handler that replays records of a type. The handler
+        returns False if it cannot send right now, which stops draining that type.
+        """
+        self._handlers[record_type] = handler
+
+    def append(self, record_type: SpoolRecordType, key: str, data: bytes) -> bool:
+        """
+        Appends a record to the spool.
+        Args:
+            record_type (SpoolRecordType): The type of the record.
+            key (str): The record key, e.g. a topic or a job ID.
+            data (bytes): The record data.
+        Returns:
+            bool: True if the record was stored, False if it was rejected.
+        """
+        key_bytes: bytes = key.encode()
+        payload: bytes = key_bytes + data
+        record: bytes = (
+            RECORD_HEADER.pack(
+                len(payload), zlib.crc32(payload), time.time(), len(key_bytes)
+            )
+            + payload
+        )
+
+        with self._lock:
+            segments = self._segments[record_type]
+            if segments and segments[-1].append(record):
+                return True
+
+            size: int = max(self.segment_bytes, SEGMENT_HEADER.size + len(record))
+            if not self._make_room(record_type, size):
+                logger.warning(f"Spool full, dropping {record_type.value} record {key}")
+                return False
+
+            path = (
+                self.directory / record_type.value / f"{self._next_segment_id:012d}.seg"
+            )
+            self._next_segment_id += 1
+            segment = SpoolSegment(path, size)
+            segments.append(segment)
+            return segment.append(record)
+
+    def _make_room(self, record_type: SpoolRecordType, size: int) -> bool:
+        if size > self.max_bytes:
+            return False
+
+        while self.total_bytes() + size > self.max_bytes:
+            if self.eviction == SpoolEvictionPolicy.DROP_NEWEST:
+                return False
+
+            victim: SpoolSegment | None = None
+            for candidate_type in reversed(SpoolRecordType):
+                segments = self._segments[candidate_type]
+                # The newest segment of another type is still being written to.
+                evictable = segments if candidate_type == record_type else segments[:-1]
+                if evictable:
+                    victim = evictable[0]
+                    segments.remove(victim)
+                    break
+
+            if victim is None:
+                return False
+
+            logger.warning(f"Spool full, evicting {victim.path}")
+            victim.delete()
+
+        return True
+
+    def _next_record(
+        self, record_type: SpoolRecordType
+    ) -> tuple[SpoolSegment, str, bytes, int] | None:
+        segments = self._segments[record_type]
+        while segments:
+            segment = segments[0]
+            if not segment.exhausted:
+                record = segment.read(segment.read_offset)
+                if record is not None:
+                    return segment, *record
+                logger.warning(f"Skipping corrupt records in {segment.path}")
+                segment.advance(segment.write_offset)
+
+            if len(segments) == 1:
+                segment.reset()
+                return None
+
+            segments.pop(0)
+            segment.delete()
+
+        return None
+
+    def drain(self) -> int:
+        """
+        Replays spooled records through the registered handlers, job updates
+        first, each type oldest-first.
+        Returns:
+            int: The number of records drained.
+        """
+        drained: int = 0
+        with self._drain_lock:
+            for record_type in SpoolRecordType:
+                handler = self._handlers.get(record_type)
+                if handler is None:
+                    continue
+
+                while True:
+                    with self._lock:
+                        entry = self._next_record(record_type)
+                    if entry is None:
+                        break
+
+                    segment, key, data, next_offset = entry
+                    try:
+                        sent: bool = handler(key, data)
+                    except Exception as e:
+                        logger.warning(f"Failed to replay spooled record {key}: {e}")
+                        sent = False
+
+                    if not sent:
+                        break
+
+                    with self._lock:
+                        # The segment may have been evicted while the handler ran.
+                        if segment in self._segments[record_type]:
+                            segment.advance(next_offset)
+                    drained += 1
+
+                with self._lock:
+                    for segment in self._segments[record_type]:
+                        segment.sync()
+
+        if drained:
+            logger.info(f"Drained {drained} spooled records")
+        return drained
+
+    def schedule_drain(self) -> None:
+        """Drains the spool on a background thread, e.g. after a reconnect."""
+        self._drain_requested.set()
+        if self._drain_lock.locked():
+            return
+
+        def _worker() -> None:
+            while self._drain_requested.is_set():
+                self._drain_requested.clear()
+                self.drain()
+
+        threading.Thread(target=_worker, name="spool-drain", daemon=True).start()
+
+    def close(self) -> None:
+        with self._lock:
+            for segments in self._segments.values():
+                for segment in segments:
+                    segment.close()
@@ -0,0 +1,314 @@
+import asyncio
+import collections
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Iterator
+
+from loguru import logger
+
+from src.Classes.telemetry_batcher import TelemetryBatcher, decode_batch
+from src.Classes.telemetry_record import TelemetryRecord
+from src.Models.telemetry_data import TelemetryData
+from src.utils.upload_handler import upload_file
+
+FORMAT_VERSION = 1
+# magic, format version, creation time (unix seconds)
+FILE_HEADER = struct.Struct("<4sHd")
+FILE_MAGIC = b"OAFD"
+# payload size, first and last sample time (unix seconds)
+CHUNK_HEADER = struct.Struct("<Idd")
+# chunk offset in the data file, first and last sample time
+INDEX_ENTRY = struct.Struct("<Qdd")
+
+
+def read_index(path: str) -> list[tuple[int, float, float]]:
+    """
+    Reads the time index of a recording.
+    Args:
+        path (str): The data file, its index is path + ".idx".
+    Returns:
+        list: (offset, first time, last time) of each complete chunk.
+    """
+    try:
+        with open(path + ".idx", "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+
+def read_recording(path: str) -> Iterator[tuple[float, TelemetryData]]:
+    """
+    Decodes a recording or an export, scanning the chunks without the index.
+    Args:
+        path (str): The data file.
+    Returns:
+        Iterator: (timestamp, TelemetryData) pairs, oldest first.
+    """
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        magic, version, _ = FILE_HEADER.unpack_from(data)
+        if magic != FILE_MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a flight data recording")
+
+        offset: int = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= len(data):
+            size, _, _ = CHUNK_HEADER.unpack_from(data, offset)
+            start: int = offset + CHUNK_HEADER.size
+            if start + size > len(data):
+                # A chunk cut short by a crash or power loss
+                break
+            yield from decode_batch(data[start : start + size])
+            offset = start + size
+
+
+class FlightRecorder:
+    """
+    Records every telemetry sample the engine receives, at full rate, on the
+    companion computer. Samples are handed to a writer thread through a deque,
+    so the event loop only appends to it. The writer updates its own
+    TelemetryRecord with them, quantizing a frame per sample, and appends
+    compressed, columnar chunks (the batch format of TelemetryBatcher) to a
+    data file, with a time index of the chunks next to it. Files are rotated by
+    size and the oldest are deleted past the disk cap.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        chunk_frames: int = 1000,
+        chunk_seconds: float = 5.0,
+        max_file_bytes: int = 64 * 1024 * 1024,
+        max_bytes: int = 1024 * 1024 * 1024,
+        max_pending: int = 100_000,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.directory: str = directory
+        self.chunk_frames: int = chunk_frames
+        self.chunk_seconds: float = chunk_seconds
+        self.max_file_bytes: int = max_file_bytes
+        self.max_bytes: int = max_bytes
+        self.poll_interval: float = poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+        # Appends and pops on a deque are atomic, so the event loop and the
+        # writer thread share it without a lock; past max_pending the oldest
+        # samples are dropped.
+        self._pending: collections.deque = collections.deque(maxlen=max_pending)
+        self._record = TelemetryRecord()
+        self._batcher = TelemetryBatcher(
+            max_frames=chunk_frames, max_latency_ms=int(chunk_seconds * 1000)
+        )
+        self._file: BinaryIO | None = None
+        self._path: str | None = None
+        self._index: BinaryIO | None = None
+        self._last_timestamp: float = 0.0
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self.frames: int = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def record(self, name: str, value: Any) -> None:
+        """Queues a sample for the writer thread. Called on the event loop."""
+        self._pending.append((time.time(), name, value))
+
+    def start(self) -> None:
+        """Starts the writer thread, once."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._enforce_cap()
+        self._thread = threading.Thread(
+            target=self._run, name="flight-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Writes out every queued sample and closes the current file."""
+        if self._thread:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            while not self._stopping.is_set():
+                if not self._drain():
+                    time.sleep(self.poll_interval)
+            self._drain()
+            self._write_chunk()
+        except Exception as e:
+            logger.error(f"Flight recorder stopped: {e}")
+        finally:
+            self._close()
+
+    def _drain(self) -> bool:
+        drained: bool = False
+        while self._pending:
+            timestamp, name, value = self._pending.popleft()
+            self._record.update(name, value)
+            drained = True
+            if self._record.ready:
+                self._batcher.append(self._record, timestamp)
+                self._last_timestamp = timestamp
+                self.frames += 1
+            if self._batcher.ready(timestamp):
+                self._write_chunk()
+
+        if self._batcher.ready():
+            self._write_chunk()
+        return drained
+
+    def _open(self) -> tuple[BinaryIO, BinaryIO]:
+        created: float = time.time()
+        self._path = os.path.join(self.directory, f"fdr-{int(created * 1000)}.bin")
+        self._file = open(self._path, "ab")
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, created))
+        self._index = open(self._path + ".idx", "ab")
+        logger.info(f"Recording flight data to {self._path}")
+        return self._file, self._index
+
+    def _close(self) -> None:
+        if self._file:
+            self._file.close()
+        if self._index:
+            self._index.close()
+        self._file = self._index = None
+        self._path = None
+
+    def _write_chunk(self) -> None:
+        first: float | None = self._batcher.buffer.oldest_timestamp()
+        if first is None:
+            return
+        payload: bytes | None = self._batcher.flush()
+        if payload is None:
+            return
+
+        file, index = self._file, self._index
+        if file is None or index is None:
+            file, index = self._open()
+        offset: int = file.tell()
+        file.write(
+            CHUNK_HEADER.pack(len(payload), first, self._last_timestamp) + payload
+        )
+        file.flush()
+        # The index is written after the chunk, so it never points past the data.
+        index.write(INDEX_ENTRY.pack(offset, first, self._last_timestamp))
+        index.flush()
+
+        if file.tell() >= self.max_file_bytes:
+            self._close()
+            self._enforce_cap()
+
+    def files(self) -> list[str]:
+        """Recorded data files, oldest first."""
+        return sorted(glob.glob(os.path.join(self.directory, "fdr-*.bin")))
+
+    def _enforce_cap(self) -> None:
+        files = self.files()
+        sizes: dict[str, int] = {
+            path: sum(
+                os.path.getsize(name)
+                for name in (path, path + ".idx")
+                if os.path.exists(name)
+            )
+            for path in files
+        }
+        total: int = sum(sizes.values())
+        for path in files:
+            if total <= self.max_bytes or path == self._path:
+                break
+            total -= sizes[path]
+            for name in (path, path + ".idx"):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            logger.info(f"Deleted flight data file {path} to stay under the disk cap")
+
+    def export(self, start: float, end: float, destination: str) -> int:
+        """
+        Copies the chunks overlapping a time range into a single recording.
+        Chunks are copied whole, so the export may begin and end up to a chunk
+        outside the range.
+        Args:
+            start (float): Start of the range, unix seconds.
+            end (float): End of the range, unix seconds.
+            destination (str): Path of the exported recording.
+        Returns:
+            int: The number of chunks exported.
+        """
+        chunks: int = 0
+        with open(destination, "wb") as out:
+            out.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, time.time()))
+            for path in self.files():
+                entries = [
+                    (offset, first, last)
+                    for offset, first, last in read_index(path)
+                    if first <= end and last >= start
+                ]
+                if not entries:
+                    continue
+                try:
+                    with (
+                        open(path, "rb") as file,
+                        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+                    ):
+                        for offset, _, _ in entries:
+                            size, _, _ = CHUNK_HEADER.unpack_from(data, offset)
+                            out.write(data[offset : offset + CHUNK_HEADER.size + size])
+                            chunks += 1
+                except FileNotFoundError:
+                    continue
+        return chunks
+
+    async def upload_job(
+        self, args: list[str], report: Callable[[dict[str, str]], None] | None = None
+    ) -> dict[str, str]:
+        """
+        The Upload-Flight-Data job action: exports a time range and uploads it.
+        Args:
+            args (list[str]): The upload URL, then the start and end of the range
+                as unix seconds or ISO 8601 times.
+            report (Callable | None): Progress callback, unused since the export is a single upload.
+        Returns:
+            dict: Status details for the job execution.
+        Raises:
+            ValueError: If the arguments are invalid.
+        """
+        if len(args) < 3:
+            raise ValueError("Upload-Flight-Data needs a URL, a start and an end")
+        url, start, end = args[0], _parse_time(args[1]), _parse_time(args[2])
+        if end < start:
+            raise ValueError("The end of the range is before its start")
+
+        path: str = os.path.join(
+            self.directory, f"export-{int(time.time() * 1000)}.bin"
+        )
+        try:
+            chunks: int = await asyncio.to_thread(self.export, start, end, path)
+            size: int = await asyncio.to_thread(
+                upload_file, url, path, "application/octet-stream"
+            )
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+        return {"chunks": str(chunks), "uploaded_bytes": str(size)}
+
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
@@ -0,0 +1,99 @@
+import threading
+
+from awsiot.iotjobs import JobExecutionData, JobExecutionSummary
+
+from src.Enums.job_status import JobStatus
+
+
+class JobCache:
+    """
+    Thread-safe local view of the thing's pending job executions, fed by the
+    Jobs streaming subscriptions on the CRT thread and read from the event loop.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.synced: bool = False
+        self.queued: list[JobExecutionSummary] = []
+        self.in_progress: list[JobExecutionSummary] = []
+        self.executions: dict[str, JobExecutionData] = {}
+
+    def update_pending(
+        self,
+        queued: list[JobExecutionSummary] | None,
+        in_progress: list[JobExecutionSummary] | None,
+    ) -> None:
+        """Replace the pending lists, forgetting executions that are no longer pending."""
+        with self._lock:
+            self.queued = list(queued or [])
+            self.in_progress = list(in_progress or [])
+            pending = {job.job_id for job in self.queued + self.in_progress}
+            self.executions = {
+                job_id: execution
+                for job_id, execution in self.executions.items()
+                if job_id in pending
+            }
+            self.synced = True
+
+    def put_execution(self, execution: JobExecutionData) -> None:
+        """Store a delivered execution, including its job document."""
+        with self._lock:
+            self.executions[execution.job_id] = execution
+
+            summary = JobExecutionSummary(
+                job_id=execution.job_id,
+                execution_number=execution.execution_number,
+                queued_at=execution.queued_at,
+                started_at=execution.started_at,
+                last_updated_at=execution.last_updated_at,
+                version_number=execution.version_number,
+            )
+            target = (
+                self.in_progress
+                if execution.status == JobStatus.IN_PROGRESS.value
+                else self.queued
+            )
+            for jobs in (self.queued, self.in_progress):
+                jobs[:] = [job for job in jobs if job.job_id != execution.job_id]
+            if execution.status in (
+                JobStatus.QUEUED.value,
+                JobStatus.IN_PROGRESS.value,
+            ):
+                target.append(summary)
+                target.sort(
+                    key=lambda job: job.queued_at.timestamp() if job.queued_at else 0
+                )
+
+    def set_status(self, job_id: str, status: JobStatus) -> None:
+        """Reflect a status update sent by this agent."""
+        with self._lock:
+            queued = [job for job in self.queued if job.job_id == job_id]
+            self.queued = [job for job in self.queued if job.job_id != job_id]
+
+            if status == JobStatus.IN_PROGRESS:
+                if queued:
+                    self.in_progress.extend(queued)
+                execution = self.executions.get(job_id)
+                if execution:
+                    execution.status = status.value
+            elif status != JobStatus.QUEUED:
+                self.in_progress = [
+                    job for job in self.in_progress if job.job_id != job_id
+                ]
+                self.executions.pop(job_id, None)
+
+    def queued_jobs(self) -> list[JobExecutionSummary]:
+        with self._lock:
+            return list(self.queued)
+
+    def next_queued(self) -> JobExecutionSummary | None:
+        with self._lock:
+            return self.queued[0] if self.queued else None
+
+    def next_in_progress(self) -> JobExecutionSummary | None:
+        with self._lock:
+            return self.in_progress[0] if self.in_progress else None
+
+    def execution(self, job_id: str) -> JobExecutionData | None:
+        with self._lock:
+            return self.executions.get(job_id)
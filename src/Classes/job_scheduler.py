@@ -0,0 +1,597 @@
+import asyncio
+import shutil
+import threading
+import time
+from typing import Any, Awaitable, Callable, Coroutine
+
+from awsiot.iotjobs import JobExecutionData
+from loguru import logger
+from mavsdk.mission_raw import MissionItem
+from mavsdk.telemetry import FlightMode
+
+from src.Classes.bundle_cache import BundleCache
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.mission_monitor import MissionMonitor, MissionMonitorError
+from src.Classes.mission_validator import MissionValidator
+from src.Classes.mqtt_jobs import IoTJobsClient
+from src.Enums.job_phase import JobPhase
+from src.Enums.job_status import JobStatus
+from src.Enums.telemetry_stream import TelemetryStream
+from src.Models.job_document import Job
+from src.Models.mission_report import MissionReport
+from src.utils.download_handler import fetch_etag, handle_download
+from src.utils.zip_manager import read_mission
+
+TRANSITIONS: dict[JobPhase, set[JobPhase]] = {
+    JobPhase.QUEUED: {JobPhase.DOWNLOADING, JobPhase.FAILED},
+    JobPhase.DOWNLOADING: {JobPhase.PREPARED, JobPhase.FAILED},
+    JobPhase.PREPARED: {JobPhase.UPLOADING, JobPhase.FAILED},
+    JobPhase.UPLOADING: {JobPhase.ARMED, JobPhase.FAILED},
+    JobPhase.ARMED: {JobPhase.IN_FLIGHT, JobPhase.FAILED},
+    JobPhase.IN_FLIGHT: {JobPhase.LANDED, JobPhase.FAILED},
+    JobPhase.LANDED: {JobPhase.SUCCEEDED, JobPhase.FAILED},
+    JobPhase.SUCCEEDED: set(),
+    JobPhase.FAILED: set(),
+}
+
+CONNECT_TIMEOUT = 30.0
+
+# Phases after which the vehicle may have left the ground.
+FLIGHT_PHASES: set[str] = {
+    JobPhase.ARMED.value,
+    JobPhase.IN_FLIGHT.value,
+    JobPhase.LANDED.value,
+}
+
+# Flight modes of a mission that is running.
+MISSION_MODES: set[FlightMode] = {FlightMode.TAKEOFF, FlightMode.MISSION}
+
+# Jobs with this action fly a mission; other actions run beside the missions.
+MISSION_ACTION = "Download-File"
+
+ActionHandler = Callable[
+    [list[str], Callable[[dict[str, str]], None]],
+    Awaitable[dict[str, str] | None],
+]
+
+JOB_STATUSES: dict[JobPhase, JobStatus] = {
+    JobPhase.SUCCEEDED: JobStatus.SUCCEEDED,
+    JobPhase.FAILED: JobStatus.FAILED,
+}
+
+
+class ScheduledJob:
+    def __init__(self, execution: JobExecutionData, document: Job) -> None:
+        self.job_id: str = execution.job_id
+        self.execution: JobExecutionData = execution
+        self.document: Job = document
+        self.phase: JobPhase = JobPhase.QUEUED
+        self.mission_items: list[MissionItem] | None = None
+        self.prepare_task: asyncio.Task | None = None
+        self.cache_key: str | None = None
+        self.job_dir: str | None = None
+        self.reported_progress: int = 0
+        self.reported_at: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.phase in (JobPhase.SUCCEEDED, JobPhase.FAILED)
+
+
+class InvalidTransitionError(Exception):
+    pass
+
+
+class JobScheduler:
+    """
+    Runs job executions one mission at a time. Up to `max_queued` further jobs
+    are accepted while a mission flies, and each is prepared (downloaded and
+    parsed) as soon as it is accepted so the next sortie can start right
+    after the current one lands.
+    """
+
+    def __init__(
+        self,
+        jobs_client: IoTJobsClient,
+        controller: MavsdkController,
+        thing_name: str,
+        max_queued: int = 1,
+        download_bytes_per_second: int | None = None,
+        bundle_cache: BundleCache | None = None,
+        validator: MissionValidator | None = None,
+        progress_interval: float = 5.0,
+        stall_timeout: float = 120.0,
+        metrics: Metrics = metrics,
+    ) -> None:
+        self.jobs_client: IoTJobsClient = jobs_client
+        self.controller: MavsdkController = controller
+        self.thing_name: str = thing_name
+        self.max_queued: int = max_queued
+        self.download_bytes_per_second: int | None = download_bytes_per_second
+        self.bundle_cache: BundleCache | None = bundle_cache
+        self.validator: MissionValidator | None = validator
+        self.progress_interval: float = progress_interval
+        self.stall_timeout: float = stall_timeout
+        self.metrics: Metrics = metrics
+
+        self.jobs: dict[str, ScheduledJob] = {}
+        self.current: ScheduledJob | None = None
+        self._queue: asyncio.Queue[ScheduledJob] = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._prepare_lock = asyncio.Lock()
+        self._fly_task: asyncio.Task | None = None
+        self._abort_reason: str | None = None
+        # Job ids rejected by this agent, so a stale queued entry is not rejected twice
+        self.rejected: set[str] = set()
+        # Status updates in flight, kept referenced until they complete
+        self._updates: set[asyncio.Task] = set()
+        self.actions: dict[str, ActionHandler] = {}
+
+    def register_action(self, name: str, handler: ActionHandler) -> None:
+        """
+        Registers a job action that runs right away instead of waiting for the
+        mission queue, e.g. a data upload.
+        Args:
+            name (str): The action name in the job document.
+            handler (ActionHandler): Called with the action's arguments and a
+                callback reporting progress details, returns status details for
+                the job and raises if the action failed.
+        """
+        self.actions[name] = handler
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, execution: JobExecutionData) -> bool:
+        """
+        Accepts a job execution, must be called on the event loop.
+        Args:
+            execution (JobExecutionData): The job execution, including its document.
+        Returns:
+            bool: True if the job was accepted, False if it was rejected.
+        """
+        with self._lock:
+            if execution.job_id in self.jobs:
+                return True
+            if execution.job_id in self.rejected:
+                return False
+
+            document: Job | None = self.jobs_client.get_job_documents(execution)
+            if document is None or not document.steps:
+                logger.warning(
+                    f"Invalid job document in job {execution.job_id}, rejecting..."
+                )
+                self._reject(execution.job_id)
+                return False
+
+            action: str = document.steps[0].action.name
+            if action in self.actions:
+                job = ScheduledJob(execution, document)
+                self.jobs[job.job_id] = job
+                asyncio.create_task(self._run_action(job, action))
+                return True
+
+            if action != MISSION_ACTION:
+                logger.warning(
+                    f"Unknown action {action} in job {execution.job_id}, rejecting..."
+                )
+                self._reject(execution.job_id)
+                return False
+
+            if self._queue.qsize() >= self.max_queued:
+                logger.warning(
+                    f"Job queue full, rejecting next job with ID {execution.job_id}"
+                )
+                self._reject(execution.job_id)
+                return False
+
+            job = ScheduledJob(execution, document)
+            self.jobs[job.job_id] = job
+
+        job.prepare_task = asyncio.create_task(self._prepare(job))
+        self._queue.put_nowait(job)
+        logger.info(f"Accepted job {job.job_id}, {self.queued} queued")
+        return True
+
+    async def _run_action(self, job: ScheduledJob, action: str) -> None:
+        logger.info(f"Running {action} for job {job.job_id}")
+        try:
+            await self.jobs_client.update_job(
+                job.job_id, JobStatus.IN_PROGRESS, {"action": action}
+            )
+            details = await self.actions[action](
+                job.document.steps[0].action.input.args,
+                lambda progress: self._action_progress(job, action, progress),
+            )
+            await self.jobs_client.update_job(
+                job.job_id, JobStatus.SUCCEEDED, {"action": action, **(details or {})}
+            )
+            logger.info(f"Job {job.job_id} {action} succeeded")
+        except Exception as e:
+            logger.warning(f"Job {job.job_id} {action} failed: {e}")
+            try:
+                await self.jobs_client.update_job(
+                    job.job_id,
+                    JobStatus.FAILED,
+                    {"action": action, "reason": str(e)[:256]},
+                )
+            except Exception as e:
+                logger.warning(f"Failed to report failure of job {job.job_id}: {e}")
+        finally:
+            self.jobs.pop(job.job_id, None)
+
+    def _reject(self, job_id: str) -> None:
+        self.rejected.add(job_id)
+        self._send_update(job_id, JobStatus.REJECTED)
+
+    def _send_update(
+        self, job_id: str, status: JobStatus, details: dict[str, str] | None = None
+    ) -> None:
+        """Reports a job status without waiting for it, logging a failed update."""
+        task = asyncio.create_task(self.jobs_client.update_job(job_id, status, details))
+        self._updates.add(task)
+        task.add_done_callback(lambda task: self._update_done(task, job_id, status))
+
+    def _update_done(self, task: asyncio.Task, job_id: str, status: JobStatus) -> None:
+        self._updates.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(
+                f"Failed to report status {status.value} of job {job_id}: {task.exception()}"
+            )
+
+    async def transition(
+        self,
+        job: ScheduledJob,
+        phase: JobPhase,
+        details: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Moves a job to a new phase and reports it to the job execution.
+        Args:
+            job (ScheduledJob): The job.
+            phase (JobPhase): The new phase.
+            details (dict | None): Extra status details to report with the phase.
+        Raises:
+            InvalidTransitionError: If the phase cannot follow the current one.
+        """
+        with self._lock:
+            if phase not in TRANSITIONS[job.phase]:
+                raise InvalidTransitionError(
+                    f"Job {job.job_id} cannot go from {job.phase.value} to {phase.value}"
+                )
+            job.phase = phase
+
+        logger.info(f"Job {job.job_id} is {phase.value}")
+        try:
+            await self.jobs_client.update_job(
+                job.job_id,
+                JOB_STATUSES.get(phase, JobStatus.IN_PROGRESS),
+                {"phase": phase.value, **(details or {})},
+            )
+        except Exception as e:
+            logger.warning(f"Failed to report phase of job {job.job_id}: {e}")
+
+    async def _fail(self, job: ScheduledJob, reason: str) -> None:
+        logger.warning(f"Job {job.job_id} failed: {reason}")
+        if not job.finished:
+            await self.transition(job, JobPhase.FAILED, {"reason": reason[:256]})
+
+    def _download_progress(self, job: ScheduledJob, done: int, total: int | None):
+        """Reports download progress, at most every 10% or 5 seconds."""
+        percent: int = done * 100 // total if total else 0
+        now: float = time.monotonic()
+        if (
+            percent - job.reported_progress < 10
+            and now - job.reported_at < 5
+            and percent < 100
+        ):
+            return
+
+        job.reported_progress, job.reported_at = percent, now
+        details: dict[str, str] = {
+            "phase": JobPhase.DOWNLOADING.value,
+            "downloaded_bytes": str(done),
+        }
+        if total:
+            details["progress_percent"] = str(percent)
+
+        self._send_update(job.job_id, JobStatus.IN_PROGRESS, details)
+
+    def _flight_progress(self, job: ScheduledJob, details: dict[str, str]) -> None:
+        """Reports the mission progress, already throttled by the monitor."""
+        self._send_update(job.job_id, JobStatus.IN_PROGRESS, details)
+
+    def _action_progress(
+        self, job: ScheduledJob, action: str, details: dict[str, str]
+    ) -> None:
+        """Reports the progress of a job action, at most every 5 seconds."""
+        now: float = time.monotonic()
+        if now - job.reported_at < 5:
+            return
+
+        job.reported_at = now
+        self._send_update(
+            job.job_id, JobStatus.IN_PROGRESS, {"action": action, **details}
+        )
+
+    async def _cache_key(self, url: str, sha256: str | None) -> str | None:
+        if sha256:
+            return BundleCache.key_for(sha256=sha256)
+        etag: str | None = await asyncio.to_thread(fetch_etag, url)
+        return BundleCache.key_for(url=url, etag=etag)
+
+    async def _prepare(self, job: ScheduledJob) -> bool:
+        async with self._prepare_lock:
+            await self.transition(job, JobPhase.DOWNLOADING)
+            args: list[str] = job.document.steps[0].action.input.args
+            sha256: str | None = job.document.steps[0].action.input.sha256
+            # Each job gets its own directory so a prefetched bundle never
+            # overwrites the mission that is currently flying.
+            job.job_dir = f"{args[1].rstrip('/')}/{job.job_id}/"
+
+            cache: BundleCache | None = self.bundle_cache
+            key: str | None = None
+            archive: str | None = None
+            if cache:
+                key = await self._cache_key(args[0], sha256)
+            if cache and key:
+                archive = await asyncio.to_thread(cache.lookup, key)
+
+            if archive:
+                job.cache_key = key
+            else:
+                status: int
+                loop = asyncio.get_running_loop()
+
+                def progress(done: int, total: int | None) -> None:
+                    loop.call_soon_threadsafe(self._download_progress, job, done, total)
+
+                status, downloaded = await handle_download(
+                    args[0],
+                    job.job_dir,
+                    sha256=sha256,
+                    max_bytes_per_second=self.download_bytes_per_second,
+                    progress=progress,
+                    metrics=self.metrics,
+                )
+                if status != 0:
+                    await self._fail(job, "download failed")
+                    return False
+
+                archive = downloaded
+                if cache and key:
+                    archive = await asyncio.to_thread(cache.publish, key, downloaded)
+                    job.cache_key = key
+
+        job.mission_items = await asyncio.to_thread(
+            read_mission, archive, self.thing_name, self.metrics
+        )
+        if not job.mission_items:
+            await self._fail(job, "mission could not be read")
+            return False
+
+        # The battery is only checked right before takeoff, since a prefetched
+        # job is prepared while another mission drains the battery.
+        report: MissionReport | None = await self._validate(job, check_energy=False)
+        if report is None:
+            return False
+
+        await self.transition(
+            job,
+            JobPhase.PREPARED,
+            {
+                "path_length_m": f"{report.path_length_m:.0f}",
+                "estimated_flight_time_s": f"{report.estimated_flight_time_s:.0f}",
+            },
+        )
+        return True
+
+    async def _validate(
+        self, job: ScheduledJob, check_energy: bool = True
+    ) -> MissionReport | None:
+        """Validates the mission of a job against the latest telemetry, failing the job if it is infeasible."""
+        items: list[MissionItem] = job.mission_items or []
+        if not self.validator:
+            return MissionReport(waypoints=len(items))
+
+        report: MissionReport
+        job.mission_items, report = await asyncio.to_thread(
+            self.validator.validate,
+            items,
+            self.controller.telemetry_engine.latest(),
+            check_energy,
+        )
+        for warning in report.warnings:
+            logger.warning(f"Job {job.job_id}: {warning}")
+        if not report.feasible:
+            await self._fail(job, "; ".join(report.errors))
+            return None
+        return report
+
+    async def _fly(self, job: ScheduledJob) -> None:
+        if not await self.controller.connect(timeout=CONNECT_TIMEOUT):
+            return await self._fail(job, "drone not connected")
+
+        if await self._validate(job) is None:
+            return
+
+        await self.transition(job, JobPhase.UPLOADING)
+        if not await self.controller.upload_mission_items(
+            job.mission_items, return_to_launch=True
+        ):
+            return await self._fail(job, "mission upload failed")
+
+        if not await self.controller.arm():
+            return await self._fail(job, "arming failed")
+        await self.transition(job, JobPhase.ARMED)
+
+        if not await self.controller.start_mission():
+            return await self._fail(job, "mission start failed")
+        await self.transition(job, JobPhase.IN_FLIGHT)
+        await self._follow(job)
+
+    async def _follow(self, job: ScheduledJob) -> None:
+        """Follows the mission in flight until the vehicle lands."""
+        monitor = MissionMonitor(
+            self.controller.system,
+            self.controller.telemetry_engine,
+            report=lambda details: self._flight_progress(job, details),
+            report_interval=self.progress_interval,
+            stall_timeout=self.stall_timeout,
+        )
+        try:
+            await monitor.run()
+        except MissionMonitorError as e:
+            return await self._fail(job, str(e))
+        except Exception as e:
+            logger.error(f"Error while following the mission: {e}")
+            return await self._fail(job, "lost track of the mission")
+        await self.transition(job, JobPhase.LANDED)
+        await self.transition(job, JobPhase.SUCCEEDED)
+
+    def abort_current(self, reason: str) -> bool:
+        """
+        Stops following the mission in flight and fails its job. The vehicle
+        itself must be commanded separately.
+        Returns:
+            bool: True if a mission was in flight.
+        """
+        if self._fly_task is None or self._fly_task.done():
+            return False
+
+        self._abort_reason = reason
+        self._fly_task.cancel()
+        return True
+
+    async def resume(self, execution: JobExecutionData) -> None:
+        """
+        Settles a job that was in progress when the agent restarted, before any
+        other mission runs. The pipeline is never restarted on a vehicle that
+        is flying: if it is in the air or its mission is running, the mission
+        is followed to its end. On the ground, a job interrupted before arming
+        is prepared and flown again, and one interrupted later is failed.
+        Args:
+            execution (JobExecutionData): The in-progress job execution.
+        """
+        document: Job | None = self.jobs_client.get_job_documents(execution)
+        if (
+            not document
+            or not document.steps
+            or document.steps[0].action.name != MISSION_ACTION
+        ):
+            # Actions run beside the missions; invalid documents are rejected.
+            self.submit(execution)
+            return
+
+        job = ScheduledJob(execution, document)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        previous: str = (execution.status_details or {}).get(
+            "phase", JobPhase.QUEUED.value
+        )
+
+        state = await self._flight_state()
+        if state is None:
+            await self._fail(job, "vehicle state unknown after an agent restart")
+            self.jobs.pop(job.job_id, None)
+            return
+
+        in_air, flight_mode, progress = state
+        mission_running: bool = flight_mode in MISSION_MODES or (
+            progress is not None and 0 < progress[0] < progress[1]
+        )
+        if in_air or mission_running:
+            logger.warning(
+                f"Vehicle is flying job {job.job_id} after an agent restart, following the mission"
+            )
+            job.phase = JobPhase.IN_FLIGHT
+            await self._report(
+                job, {"phase": JobPhase.IN_FLIGHT.value, "resumed": "true"}
+            )
+            await self._execute(job, self._follow)
+        elif previous == JobPhase.LANDED.value:
+            job.phase = JobPhase.LANDED
+            await self._execute(
+                job, lambda job: self.transition(job, JobPhase.SUCCEEDED)
+            )
+        elif previous in FLIGHT_PHASES:
+            await self._fail(
+                job,
+                f"interrupted by an agent restart while {previous}, vehicle is on the ground",
+            )
+            self.jobs.pop(job.job_id, None)
+        else:
+            logger.info(f"Re-running job {job.job_id}, interrupted while {previous}")
+            await self._report(job, {"phase": JobPhase.QUEUED.value, "resumed": "true"})
+            job.prepare_task = asyncio.create_task(self._prepare(job))
+            await self._execute(job, self._fly)
+
+    async def _flight_state(
+        self,
+    ) -> tuple[bool, FlightMode | None, tuple[int, int] | None] | None:
+        """Whether the vehicle is in the air, its flight mode and mission progress, None if unknown."""
+        if not await self.controller.connect(timeout=CONNECT_TIMEOUT):
+            return None
+
+        engine = self.controller.telemetry_engine
+        try:
+            in_air: bool = await engine.wait_for(
+                TelemetryStream.IN_AIR, CONNECT_TIMEOUT
+            )
+            flight_mode: FlightMode = await engine.wait_for(
+                TelemetryStream.FLIGHT_MODE, CONNECT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return None
+        return in_air, flight_mode, await self.controller.get_mission_progress()
+
+    async def _report(self, job: ScheduledJob, details: dict[str, str]) -> None:
+        try:
+            await self.jobs_client.update_job(
+                job.job_id, JobStatus.IN_PROGRESS, details
+            )
+        except Exception as e:
+            logger.warning(f"Failed to report status of job {job.job_id}: {e}")
+
+    async def _execute(
+        self,
+        job: ScheduledJob,
+        flight: Callable[[ScheduledJob], Coroutine[Any, Any, None]],
+    ) -> None:
+        """Waits for a job to be prepared, then flies it as the current job."""
+        self.current = job
+        try:
+            if job.prepare_task is None or await job.prepare_task:
+                self._fly_task = asyncio.create_task(flight(job))
+                await self._fly_task
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if task and task.cancelling():
+                if self._fly_task:
+                    self._fly_task.cancel()
+                raise
+            await self._fail(job, self._abort_reason or "aborted")
+        except Exception as e:
+            await self._fail(job, str(e))
+        finally:
+            self._fly_task = None
+            self._abort_reason = None
+            if job.cache_key and self.bundle_cache:
+                self.bundle_cache.release(job.cache_key)
+            if job.job_dir:
+                # A cached bundle was moved into the cache, so nothing the
+                # cache owns is left in the job directory.
+                await asyncio.to_thread(shutil.rmtree, job.job_dir, True)
+            self.current = None
+            self.jobs.pop(job.job_id, None)
+
+    async def run(self) -> None:
+        """Executes accepted jobs in order until cancelled."""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job, self._fly)
+            finally:
+                self._queue.task_done()
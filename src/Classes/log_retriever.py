@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import os
+from typing import Callable
+
+from loguru import logger
+from mavsdk.log_files import Entry as LogEntry
+
+from src.Classes.mavsdk_controller import MavsdkController
+from src.utils.upload_handler import multipart_upload
+
+
+class LogRetrievalError(Exception):
+    pass
+
+
+class LogRetriever:
+    """
+    The Upload-Log job action: pulls a PX4 ULog file from the flight controller
+    through MAVSDK's log_files plugin and uploads it as a multipart upload,
+    several parts in parallel. Downloaded logs and finished parts survive a
+    failure or an agent restart, so a retried job picks up where it stopped.
+    """
+
+    def __init__(
+        self, controller: MavsdkController, directory: str, workers: int = 4
+    ) -> None:
+        self.controller: MavsdkController = controller
+        self.directory: str = directory
+        self.workers: int = workers
+        os.makedirs(directory, exist_ok=True)
+        # The log download shares the MAVLink link, one at a time is enough.
+        self._download_lock = asyncio.Lock()
+
+    @staticmethod
+    def _select(entries: list[LogEntry], selector: str) -> LogEntry:
+        if not entries:
+            raise LogRetrievalError("The flight controller has no logs")
+        if selector == "latest":
+            return max(entries, key=lambda entry: entry.id)
+        for entry in entries:
+            if str(entry.id) == selector:
+                return entry
+        raise LogRetrievalError(f"No log with id {selector}")
+
+    async def _download(
+        self, entry: LogEntry, report: Callable[[dict[str, str]], None] | None
+    ) -> str:
+        path: str = os.path.join(self.directory, f"log-{entry.id}.ulg")
+        if os.path.exists(path) and os.path.getsize(path) == entry.size_bytes:
+            logger.info(f"Log {entry.id} already downloaded")
+            return path
+
+        def progress(fraction: float) -> None:
+            if report:
+                report(
+                    {
+                        "stage": "downloading",
+                        "progress_percent": str(int(fraction * 100)),
+                    }
+                )
+
+        async with self._download_lock:
+            if not await self.controller.download_log_file(
+                entry, path + ".part", progress
+            ):
+                raise LogRetrievalError(f"Download of log {entry.id} failed")
+        os.replace(path + ".part", path)
+        return path
+
+    async def upload_job(
+        self, args: list[str], report: Callable[[dict[str, str]], None] | None = None
+    ) -> dict[str, str]:
+        """
+        Retrieves a log and uploads it.
+        Args:
+            args (list[str]): The log id or "latest", the part size in MiB, the
+                presigned URL completing the multipart upload, then the
+                presigned URLs of parts 1, 2, ...
+            report (Callable | None): Called with progress details.
+        Returns:
+            dict: Status details for the job execution.
+        Raises:
+            ValueError: If the arguments are invalid.
+            LogRetrievalError: If the log could not be retrieved.
+            UploadError: If the upload failed.
+        """
+        if len(args) < 4:
+            raise ValueError(
+                "Upload-Log needs a log id, a part size, a completion URL and part URLs"
+            )
+        selector, part_size, complete_url, part_urls = (
+            args[0],
+            int(float(args[1]) * 1024 * 1024),
+            args[2],
+            args[3:],
+        )
+        if part_size <= 0:
+            raise ValueError("The part size must be positive")
+
+        telemetry = self.controller.telemetry_engine.latest()
+        if telemetry and telemetry.in_air:
+            raise LogRetrievalError("Logs are not retrieved in flight")
+
+        entries: list[LogEntry] | None = await self.controller.get_log_entries()
+        if entries is None:
+            raise LogRetrievalError("Could not list the logs")
+        entry: LogEntry = self._select(entries, selector)
+        path: str = await self._download(entry, report)
+
+        loop = asyncio.get_running_loop()
+
+        def progress(done: int, total: int) -> None:
+            if report:
+                loop.call_soon_threadsafe(
+                    report,
+                    {
+                        "stage": "uploading",
+                        "progress_percent": str(done * 100 // max(total, 1)),
+                    },
+                )
+
+        # The state is tied to this multipart upload, a new job starts afresh.
+        upload_id: str = hashlib.sha256(complete_url.encode()).hexdigest()[:16]
+        size: int = await asyncio.to_thread(
+            multipart_upload,
+            path,
+            part_urls,
+            complete_url,
+            part_size,
+            f"{path}.{upload_id}.upload",
+            workers=self.workers,
+            progress=progress,
+        )
+        os.remove(path)
+        return {"log_id": str(entry.id), "log_bytes": str(size)}
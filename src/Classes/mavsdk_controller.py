@@ -7,43 +7,61 @@ import cbor2
 from mavsdk import System as MavSystem
 from loguru import logger
 from mavsdk.action import ActionError
+from mavsdk.log_files import Entry as LogEntry, LogFilesError
 from mavsdk.mission import MissionError
-from mavsdk.mission_raw import MissionRawError
-from src.Models.telemetry_data import (
-    Battery as BatteryModel,
-    Position as PositionModel,
-    Health as HealthModel,
-)
-from rich.traceback import install
+from mavsdk.mission_raw import MissionItem, MissionRawError
 
+from src.Classes.connection_manager import ConnectionManager
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.telemetry_engine import TelemetryEngine
 from src.Enums.connection_types import ConnectionType
+from src.Enums.telemetry_stream import TelemetryStream
 from src.Models.telemetry_data import TelemetryData
 
-install()
-
 
 def ensure_connected(func):
+    """Waits briefly for a dropped link to come back, and returns None if it doesn't."""
+
     @wraps(func)
     async def wrapper(self, *args, **kwargs):
-        if not self.connected:
-            logger.error("System not connected")
-            exit(1)
+        if not await self.connection.wait_connected(self.link_grace_period):
+            logger.error(f"System not connected, skipping {func.__name__}")
+            return None
         return await func(self, *args, **kwargs)
 
     return wrapper
 
 
 class MavsdkController:
-    def __init__(self, address: str, port: int, protocol: str) -> None:
-        self.connected = False
+    def __init__(
+        self,
+        address: str,
+        port: int,
+        protocol: str,
+        server_address: str | None = None,
+        server_port: int = 50051,
+        link_grace_period: float = 5.0,
+        telemetry_streams: dict[TelemetryStream, float | None] | None = None,
+        system: MavSystem | None = None,
+        metrics: Metrics = metrics,
+    ) -> None:
         self.address: str = address
         self.port: int = port
         self.protocol: str = protocol
-        self.system: MavSystem = MavSystem()
+        self.link_grace_period: float = link_grace_period
+        self.metrics: Metrics = metrics
+        # A system can be passed in to drive a simulated vehicle instead.
+        self.system: MavSystem = system or MavSystem(server_address, server_port)
+        self.telemetry_engine: TelemetryEngine = TelemetryEngine(
+            self.system, streams=telemetry_streams
+        )
+        self.connection: ConnectionManager = ConnectionManager(
+            self.system, self.connection_string
+        )
 
-    async def connect(self) -> None:
-        """Connect to drone hardware."""
-        connection_string: str = (
+    @property
+    def connection_string(self) -> str:
+        return (
             self.protocol
             + (":///" if self.protocol == ConnectionType.SERIAL else "://")
             + self.address
@@ -51,104 +69,189 @@ class MavsdkController:
             + str(self.port)
         )
 
-        try:
-            logger.info(f"Connecting to {connection_string}")
-            await self.system.connect(system_address=connection_string)
+    @property
+    def connected(self) -> bool:
+        return self.connection.connected
 
-            async for state in self.system.core.connection_state():
-                if state.is_connected:
-                    break
+    async def connect(self, timeout: float | None = None) -> bool:
+        """
+        Starts the connection manager and the telemetry engine, once, and waits for the link.
+        Args:
+            timeout (float | None): Maximum seconds to wait, None to wait forever.
+        Returns:
+            bool: True if the drone is connected.
+        """
+        self.connection.start()
+        self.telemetry_engine.start()
+        return await self.connection.wait_connected(timeout)
 
-            self.connected = True
-            logger.info(f"Connected to {connection_string}")
-        except Exception as e:
-            logger.error(f"Failed to connect to mavsdk on {connection_string}: {e}")
+    async def disconnect(self) -> None:
+        await self.telemetry_engine.stop()
+        await self.connection.stop()
 
     @ensure_connected
-    async def arm(self) -> None:
+    async def arm(self) -> bool:
         """Arm the drone."""
         try:
             await self.system.action.arm()
             logger.info(f"Successfully armed the drone")
+            return True
         except ActionError as e:
             logger.error(f"Failed to arm the drone: {e}")
+            return False
 
     @ensure_connected
-    async def upload_mission(
-        self, path_to_mission: str, return_to_launch: bool = True
-    ) -> None:
-        """Upload a mission."""
+    async def upload_mission_items(
+        self, mission_items: list[MissionItem], return_to_launch: bool = True
+    ) -> bool:
+        """Upload already parsed mission items."""
         try:
-            logger.info(f"Uploading mission {path_to_mission}")
-            await self.system.mission.set_return_to_launch_after_mission(
-                return_to_launch
-            )
-
-            out = await self.system.mission_raw.import_qgroundcontrol_mission(
-                path_to_mission
-            )
-
-            logger.info(f"{len(out.mission_items)} mission items and")
-
-            await self.system.mission_raw.upload_mission(out.mission_items)
+            logger.info(f"Uploading {len(mission_items)} mission items")
+            with self.metrics.timer("mavlink.upload_mission"):
+                await self.system.mission.set_return_to_launch_after_mission(
+                    return_to_launch
+                )
+                await self.system.mission_raw.upload_mission(mission_items)
             logger.info(f"Successfully uploaded mission")
+            return True
         except Exception as e:
             logger.error(f"Failed to upload mission: {e}")
+            return False
 
     @ensure_connected
-    async def start_mission(self) -> None:
+    async def start_mission(self) -> bool:
         try:
             await self.system.mission_raw.start_mission()
+            return True
         except Exception as e:
             logger.error(f"Failed to start mission: {e}")
+            return False
 
     @ensure_connected
-    async def cancel_mission(self) -> None:
+    async def cancel_mission(self) -> bool:
         try:
             logger.info("Canceling mission, returning to home.  .")
             await self.system.mission_raw.clear_mission()
             await self.system.action.return_to_launch()
+            return True
         except Exception as e:
             logger.error(f"Failed to cancel mission: {e}")
+            return False
 
     @ensure_connected
-    async def subscribe_mission_finished(self, callback: Callable) -> None:
+    async def return_to_launch(self) -> bool:
         try:
-            logger.info(f"Subscribing to mission completed!")
-            async for progress in self.system.mission_raw.mission_progress():
-                if progress.current == progress.total:
-                    logger.info("Finishing mission. Landing drone...")
-                    break
+            logger.info("Returning to launch")
+            await self.system.action.return_to_launch()
+            return True
+        except ActionError as e:
+            logger.error(f"Failed to return to launch: {e}")
+            return False
+
+    @ensure_connected
+    async def pause_mission(self) -> bool:
+        try:
+            logger.info("Pausing mission")
+            await self.system.mission_raw.pause_mission()
+            return True
+        except MissionRawError as e:
+            logger.error(f"Failed to pause mission: {e}")
+            return False
+
+    @ensure_connected
+    async def resume_mission(self) -> bool:
+        try:
+            logger.info("Resuming mission")
+            await self.system.mission_raw.start_mission()
+            return True
+        except MissionRawError as e:
+            logger.error(f"Failed to resume mission: {e}")
+            return False
 
-            async for in_air in self.system.telemetry.in_air():
-                if not in_air:
-                    break
+    @ensure_connected
+    async def goto_location(
+        self,
+        latitude_deg: float,
+        longitude_deg: float,
+        absolute_altitude_m: float,
+        yaw_deg: float = float("nan"),
+    ) -> bool:
+        try:
+            logger.info(
+                f"Flying to {latitude_deg}, {longitude_deg} at {absolute_altitude_m} m"
+            )
+            await self.system.action.goto_location(
+                latitude_deg, longitude_deg, absolute_altitude_m, yaw_deg
+            )
+            return True
+        except ActionError as e:
+            logger.error(f"Failed to fly to location: {e}")
+            return False
 
-            callback()
+    @ensure_connected
+    async def get_mission_progress(
+        self, timeout: float = 5.0
+    ) -> tuple[int, int] | None:
+        """
+        Reads the progress of the mission on the vehicle.
+        Returns:
+            tuple | None: The current and total item counts, None if unknown.
+        """
+
+        async def _first() -> tuple[int, int] | None:
+            async for progress in self.system.mission_raw.mission_progress():
+                return progress.current, progress.total
+            return None
+
+        try:
+            return await asyncio.wait_for(_first(), timeout)
         except Exception as e:
-            logger.error(f"Error while waiting for mission process: {e}")
+            logger.warning(f"Failed to read mission progress: {e}")
+            return None
+
+    @ensure_connected
+    async def get_log_entries(self) -> list[LogEntry] | None:
+        """Lists the ULog files stored on the flight controller, oldest first."""
+        try:
+            return await self.system.log_files.get_entries()
+        except LogFilesError as e:
+            logger.error(f"Failed to list log files: {e}")
+            return None
+
+    @ensure_connected
+    async def download_log_file(
+        self,
+        entry: LogEntry,
+        path: str,
+        progress: Callable[[float], None] | None = None,
+    ) -> bool:
+        """
+        Downloads a ULog file from the flight controller.
+        Args:
+            entry (LogEntry): The log file, from get_log_entries.
+            path (str): Where to save it.
+            progress (Callable | None): Called with the downloaded fraction.
+        Returns:
+            bool: True if the log was downloaded.
+        """
+        try:
+            logger.info(f"Downloading log {entry.id} of {entry.size_bytes} bytes")
+            async for data in self.system.log_files.download_log_file(entry, path):
+                if progress:
+                    progress(data.progress)
+            return True
+        except LogFilesError as e:
+            logger.error(f"Failed to download log {entry.id}: {e}")
+            return False
 
     @ensure_connected
     async def get_telemetry(self) -> TelemetryData:
         """
-        Fetches the drone's telemetry data to TelemetryData object.
+        Fetches the drone's latest telemetry snapshot to TelemetryData object.
         Returns:
             TelemetryData: A TelemetryData object containing the telemetry data.
         """
-        position_raw, battery_raw, health_raw, in_air = await asyncio.gather(
-            self.system.telemetry.position().__anext__(),
-            self.system.telemetry.battery().__anext__(),
-            self.system.telemetry.health().__anext__(),
-            self.system.telemetry.in_air().__anext__(),
-        )
-
-        position = PositionModel(**position_raw.__dict__)
-        battery = BatteryModel(**battery_raw.__dict__)
-        health = HealthModel(**health_raw.__dict__)
-
-        return TelemetryData(
-            position=position, battery=battery, health=health, in_air=in_air
-        )
+        return await self.telemetry_engine.wait_ready()
 
     @ensure_connected
     async def get_telemetry_json(self) -> str:
@@ -159,7 +262,7 @@ class MavsdkController:
         """
 
         telemetry: TelemetryData = await self.get_telemetry()
-        return telemetry.model_dump_json()
+        return telemetry.model_dump_json(exclude_none=True)
 
     @ensure_connected
     async def get_telemetry_cbor(self) -> str:
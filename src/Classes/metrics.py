@@ -0,0 +1,223 @@
+import asyncio
+import bisect
+import threading
+import time
+
+import cbor2
+from awscrt import mqtt5
+from loguru import logger
+
+from src.Classes.mqtt_base import IoTBaseClient
+
+METRICS_VERSION = 1
+CONTENT_TYPE = "application/cbor"
+
+# Upper bounds of the histogram buckets, roughly 1-2-5 steps from 1 ms to
+# 5 minutes; a last bucket takes everything above.
+BUCKETS: tuple[float, ...] = (
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1_000,
+    2_000,
+    5_000,
+    10_000,
+    30_000,
+    60_000,
+    300_000,
+)
+
+
+class Histogram:
+    """Count, sum, min, max and bucket counts of the values observed."""
+
+    __slots__ = ("count", "total", "low", "high", "buckets")
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total: float = 0.0
+        self.low: float = float("inf")
+        self.high: float = float("-inf")
+        self.buckets: list[int] = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.low:
+            self.low = value
+        if value > self.high:
+            self.high = value
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+
+    def encode(self) -> list:
+        """[count, sum, min, max, {bucket index: count}], only non-empty buckets."""
+        return [
+            self.count,
+            round(self.total, 3),
+            round(self.low, 3),
+            round(self.high, 3),
+            {index: n for index, n in enumerate(self.buckets) if n},
+        ]
+
+
+class Gauge:
+    """Last, min and max of a sampled value."""
+
+    __slots__ = ("last", "low", "high")
+
+    def __init__(self, value: float) -> None:
+        self.last: float = value
+        self.low: float = value
+        self.high: float = value
+
+    def set(self, value: float) -> None:
+        self.last = value
+        if value < self.low:
+            self.low = value
+        if value > self.high:
+            self.high = value
+
+    def encode(self) -> list:
+        return [self.last, self.low, self.high]
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "started")
+
+    def __init__(self, registry: "Metrics", name: str) -> None:
+        self.registry: Metrics = registry
+        self.name: str = name
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.registry.observe(self.name, (time.perf_counter() - self.started) * 1000)
+        if exc_type is not None:
+            self.registry.increment(self.name + ".errors")
+
+
+class Metrics:
+    """
+    Counters, gauges and latency histograms aggregated in memory over a
+    reporting interval. Recording a value is a dictionary lookup and a few
+    additions under a lock, so it is cheap enough for the hot paths and safe
+    from worker threads.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._gauges: dict[str, Gauge] = {}
+        self._histograms: dict[str, Histogram] = {}
+        self._started: float = time.time()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            gauge = self._gauges.get(name)
+            if gauge is None:
+                self._gauges[name] = Gauge(value)
+            else:
+                gauge.set(value)
+
+    def observe(self, name: str, value: float) -> None:
+        """Adds a value, a latency in milliseconds, to a histogram."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str) -> _Timer:
+        """
+        A context manager observing the milliseconds spent in it, and counting
+        `name`.errors when it exits with an exception.
+        """
+        return _Timer(self, name)
+
+    def collect(self) -> dict:
+        """
+        Returns the metrics of the interval and starts a new one.
+        Returns:
+            dict: The metrics message: version, interval start and length in
+                seconds, counters, gauges and histograms by name.
+        """
+        now: float = time.time()
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            gauges, self._gauges = self._gauges, {}
+            histograms, self._histograms = self._histograms, {}
+            started, self._started = self._started, now
+
+        return {
+            "v": METRICS_VERSION,
+            "t": round(started, 3),
+            "d": round(now - started, 3),
+            "c": counters,
+            "g": {name: gauge.encode() for name, gauge in gauges.items()},
+            "h": {name: histogram.encode() for name, histogram in histograms.items()},
+            "b": list(BUCKETS),
+        }
+
+
+# The default registry, for components built without the registry of their
+# vehicle; each vehicle of the agent records into its own.
+metrics = Metrics()
+
+
+class MetricsReporter:
+    """
+    Publishes the aggregated metrics as one CBOR message per interval. Messages
+    are sent at QoS 1, so intervals spent offline are spooled like telemetry.
+    """
+
+    def __init__(
+        self,
+        client: IoTBaseClient,
+        topic: str,
+        interval: float = 60.0,
+        registry: Metrics = metrics,
+    ) -> None:
+        self.client: IoTBaseClient = client
+        self.topic: str = topic
+        self.interval: float = interval
+        self.registry: Metrics = registry
+
+    def report(self) -> bytes:
+        """Publishes the metrics of the current interval, returns the message."""
+        payload: bytes = cbor2.dumps(self.registry.collect())
+        self.client.publish(
+            self.topic,
+            payload,
+            qos=mqtt5.QoS.AT_LEAST_ONCE,
+            content_type=CONTENT_TYPE,
+        )
+        return payload
+
+    def _try_report(self) -> None:
+        try:
+            self.report()
+        except Exception as e:
+            logger.warning(f"Failed to report metrics: {e}")
+
+    async def run(self) -> None:
+        """Reports every interval until cancelled."""
+        logger.info(f"Reporting metrics to {self.topic} every {self.interval} s")
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self._try_report()
+        finally:
+            # The last, partial interval is reported on shutdown.
+            self._try_report()
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from typing import Any, Callable
+
+from loguru import logger
+from mavsdk import System as MavSystem
+from mavsdk.telemetry import FlightMode, LandedState
+
+from src.Classes.telemetry_engine import TelemetryEngine
+from src.Enums.job_phase import JobPhase
+from src.Enums.telemetry_stream import TelemetryStream
+
+# Modes the vehicle goes through while flying an uploaded mission, including
+# a pause (HOLD) and the return leg; anything else means someone took over.
+EXPECTED_MODES: set[FlightMode] = {
+    FlightMode.UNKNOWN,
+    FlightMode.READY,
+    FlightMode.TAKEOFF,
+    FlightMode.HOLD,
+    FlightMode.MISSION,
+    FlightMode.RETURN_TO_LAUNCH,
+    FlightMode.LAND,
+}
+
+
+# Streams followed through the telemetry engine rather than subscribed here.
+ENGINE_STREAMS: tuple[TelemetryStream, ...] = (
+    TelemetryStream.FLIGHT_MODE,
+    TelemetryStream.IN_AIR,
+    TelemetryStream.LANDED_STATE,
+)
+
+
+class MissionMonitorError(Exception):
+    pass
+
+
+class MissionMonitor:
+    """
+    Follows a mission in flight. Mission progress is subscribed here; flight
+    mode, in-air and landed state come from the telemetry engine, which keeps
+    the only subscription to them. They are evaluated together: progress is
+    reported at most every `report_interval` seconds, and a stalled mission or
+    an unexpected mode change is reported as soon as it is seen.
+    """
+
+    def __init__(
+        self,
+        system: MavSystem,
+        engine: TelemetryEngine,
+        report: Callable[[dict[str, str]], None] | None = None,
+        report_interval: float = 5.0,
+        stall_timeout: float = 120.0,
+        settle_time: float = 5.0,
+    ) -> None:
+        self.system: MavSystem = system
+        self.engine: TelemetryEngine = engine
+        self.report: Callable[[dict[str, str]], None] | None = report
+        self.report_interval: float = report_interval
+        self.stall_timeout: float = stall_timeout
+        self.settle_time: float = settle_time
+
+        self.current: int = 0
+        self.total: int = 0
+        self.flight_mode: FlightMode = FlightMode.UNKNOWN
+        self.in_air: bool | None = None
+        self.landed_state: LandedState = LandedState.UNKNOWN
+        self.airborne: bool = False
+        self.anomaly: str | None = None
+
+        self._changed = asyncio.Event()
+        self._progress_at: float = 0.0
+        self._landed_at: float | None = None
+        self._reported: tuple | None = None
+        self._reported_at: float = 0.0
+
+    @property
+    def completed(self) -> bool:
+        return self.total > 0 and self.current >= self.total
+
+    @property
+    def landed(self) -> bool:
+        if self.landed_state != LandedState.UNKNOWN:
+            return self.landed_state == LandedState.ON_GROUND
+        return self.in_air is False
+
+    async def _consume_progress(self) -> None:
+        async for value in self.system.mission_raw.mission_progress():
+            if (value.current, value.total) != (self.current, self.total):
+                self._progress_at = time.monotonic()
+                self.anomaly = None
+            self.current, self.total = value.current, value.total
+            self._changed.set()
+        raise MissionMonitorError("mission progress stream ended")
+
+    def _on_sample(self, name: str, value: Any) -> None:
+        """Telemetry engine listener."""
+        match name:
+            case "flight_mode":
+                if value != self.flight_mode and value not in EXPECTED_MODES:
+                    self.anomaly = f"unexpected flight mode {value.name}"
+                    logger.warning(
+                        f"Vehicle switched to {value.name} during the mission"
+                    )
+                self.flight_mode = value
+            case "in_air":
+                self.in_air = value
+                self.airborne = self.airborne or value
+            case "landed_state":
+                self.landed_state = value
+            case _:
+                return
+        self._changed.set()
+
+    def _check_stall(self, now: float) -> None:
+        if (
+            self.anomaly is None
+            and self.flight_mode == FlightMode.MISSION
+            and not self.landed
+            and now - self._progress_at > self.stall_timeout
+        ):
+            self.anomaly = f"no progress past waypoint {self.current} for {now - self._progress_at:.0f} s"
+            logger.warning(f"Mission stalled, {self.anomaly}")
+
+    def _report(self, now: float) -> None:
+        state = (self.current, self.total, self.flight_mode, self.anomaly)
+        if state == self._reported:
+            return
+        # Anomalies are reported right away, progress is throttled.
+        new_anomaly: bool = self.anomaly is not None and (
+            self._reported is None or self.anomaly != self._reported[3]
+        )
+        if not new_anomaly and now - self._reported_at < self.report_interval:
+            return
+
+        self._reported, self._reported_at = state, now
+        details: dict[str, str] = {
+            "phase": JobPhase.IN_FLIGHT.value,
+            "waypoint": str(self.current),
+            "waypoints": str(self.total),
+            "flight_mode": self.flight_mode.name,
+        }
+        if self.total:
+            details["progress_percent"] = str(self.current * 100 // self.total)
+        if self.anomaly:
+            details["anomaly"] = self.anomaly[:256]
+        if self.report:
+            self.report(details)
+
+    async def run(self) -> None:
+        """
+        Returns once the mission is completed and the vehicle has landed.
+        Raises:
+            MissionMonitorError: If the vehicle landed before completing the
+                mission, or a stream failed.
+        """
+        self._progress_at = time.monotonic()
+        self.engine.subscribe(*ENGINE_STREAMS)
+        for stream in ENGINE_STREAMS:
+            if stream.value in self.engine.snapshot:
+                self._on_sample(stream.value, self.engine.snapshot[stream.value])
+        self.engine.add_listener(self._on_sample)
+        tasks: list[asyncio.Task] = [
+            asyncio.create_task(self._consume_progress(), name="monitor-progress")
+        ]
+        poll: float = min(self.report_interval, 1.0)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), poll)
+                except asyncio.TimeoutError:
+                    pass
+                self._changed.clear()
+
+                for task in tasks:
+                    if task.done():
+                        raise task.exception() or MissionMonitorError("monitor stopped")
+
+                now: float = time.monotonic()
+                self._check_stall(now)
+                # Progress left over from the previous mission is ignored
+                # until the vehicle has taken off.
+                if self.airborne and self.completed and self.landed:
+                    logger.info(f"Mission completed, {self.total} waypoints flown")
+                    return
+                # The last progress update may arrive after touchdown.
+                if self.airborne and self.landed:
+                    self._landed_at = self._landed_at or now
+                else:
+                    self._landed_at = None
+                if self._landed_at and now - self._landed_at > self.settle_time:
+                    raise MissionMonitorError(
+                        f"landed at waypoint {self.current} of {self.total} in {self.flight_mode.name}"
+                    )
+                self._report(now)
+        finally:
+            self.engine.remove_listener(self._on_sample)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
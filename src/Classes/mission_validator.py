@@ -0,0 +1,262 @@
+import math
+
+import numpy as np
+from loguru import logger
+from mavsdk.mission_raw import MissionItem
+
+from src.Models.mission_report import MissionReport
+from src.Models.telemetry_data import TelemetryData
+
+EARTH_RADIUS_M = 6371008.8
+
+MAV_CMD_NAV_WAYPOINT = 16
+MAV_CMD_NAV_LOITER_TIME = 19
+MAV_CMD_NAV_LAND = 21
+MAV_CMD_NAV_TAKEOFF = 22
+MAV_CMD_NAV_LAST = 95
+MAV_CMD_DO_JUMP = 177
+
+# Commands that take off or land where the vehicle is when their latitude
+# and longitude are left out, which the plan parser turns into 0, 0.
+CURRENT_POSITION_COMMANDS = (MAV_CMD_NAV_LAND, MAV_CMD_NAV_TAKEOFF)
+
+MAV_FRAME_GLOBAL_INT = 5
+MAV_FRAME_GLOBAL_RELATIVE_ALT_INT = 6
+MAV_FRAME_GLOBAL_TERRAIN_ALT_INT = 11
+GLOBAL_INT_FRAMES = (
+    MAV_FRAME_GLOBAL_INT,
+    MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
+    MAV_FRAME_GLOBAL_TERRAIN_ALT_INT,
+)
+
+
+def haversine(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray
+) -> np.ndarray:
+    """Great-circle distances in meters between coordinates given in radians."""
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class MissionValidator:
+    """
+    Checks parsed mission items before they are uploaded: geofence and altitude
+    limits, degenerate and duplicate waypoints, and whether the remaining
+    battery covers the estimated flight. All geometry is computed on NumPy
+    arrays in a single pass over the mission.
+    """
+
+    def __init__(
+        self,
+        max_altitude_m: float = 120.0,
+        max_distance_m: float | None = None,
+        cruise_speed_mps: float = 10.0,
+        vertical_speed_mps: float = 2.5,
+        cruise_power_w: float = 300.0,
+        battery_capacity_wh: float | None = None,
+        reserve_percent: float = 20.0,
+        duplicate_tolerance_m: float = 0.5,
+    ) -> None:
+        self.max_altitude_m: float = max_altitude_m
+        self.max_distance_m: float | None = max_distance_m
+        self.cruise_speed_mps: float = cruise_speed_mps
+        self.vertical_speed_mps: float = vertical_speed_mps
+        self.cruise_power_w: float = cruise_power_w
+        self.battery_capacity_wh: float | None = battery_capacity_wh
+        self.reserve_percent: float = reserve_percent
+        self.duplicate_tolerance_m: float = duplicate_tolerance_m
+
+    @staticmethod
+    def _is_positional(item: MissionItem) -> bool:
+        return item.command <= MAV_CMD_NAV_LAST and item.frame in GLOBAL_INT_FRAMES
+
+    @staticmethod
+    def _coordinates(nav: list[MissionItem]) -> np.ndarray:
+        """
+        Latitude and longitude in degrees, altitude and frame of each waypoint.
+        A takeoff or landing without a position gets the previous waypoint's,
+        or NaN if no waypoint precedes it.
+        """
+        coordinates = np.array(
+            [(item.x, item.y, item.z, item.frame, item.command) for item in nav],
+            dtype=float,
+        )
+        unset = (
+            np.isin(coordinates[:, 4], CURRENT_POSITION_COMMANDS)
+            & (coordinates[:, 0] == 0)
+            & (coordinates[:, 1] == 0)
+        )
+        coordinates[:, :2] /= 1e7
+        coordinates[unset, :2] = np.nan
+
+        # Index of the last waypoint with a position, up to each one
+        previous = np.where(unset, 0, np.arange(len(nav)))
+        np.maximum.accumulate(previous, out=previous)
+        coordinates[:, :2] = coordinates[previous, :2]
+        return coordinates[:, :4]
+
+    def _remove_duplicates(
+        self, items: list[MissionItem], report: MissionReport
+    ) -> list[MissionItem]:
+        nav = [item for item in items if self._is_positional(item)]
+        if len(nav) < 2:
+            return items
+
+        coordinates = self._coordinates(nav)
+        lat = np.radians(coordinates[:, 0])
+        lon = np.radians(coordinates[:, 1])
+        horizontal = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        vertical = np.abs(np.diff(coordinates[:, 2]))
+        commands = np.array([item.command for item in nav])
+
+        duplicate = (
+            (horizontal < self.duplicate_tolerance_m)
+            & (vertical < self.duplicate_tolerance_m)
+            & (commands[1:] == MAV_CMD_NAV_WAYPOINT)
+            & (commands[:-1] == MAV_CMD_NAV_WAYPOINT)
+        )
+        if not duplicate.any():
+            return items
+
+        if any(item.command == MAV_CMD_DO_JUMP for item in items):
+            # Removing items would shift the targets of the jumps.
+            report.warnings.append(
+                f"{int(duplicate.sum())} duplicate waypoints kept because the mission contains jumps"
+            )
+            return items
+
+        removed: set[int] = {id(nav[i + 1]) for i in np.flatnonzero(duplicate)}
+        kept: list[MissionItem] = [item for item in items if id(item) not in removed]
+        for seq, item in enumerate(kept):
+            item.seq = seq
+            item.current = 1 if seq == 0 else 0
+
+        report.removed_waypoints = len(removed)
+        return kept
+
+    def validate(
+        self,
+        items: list[MissionItem],
+        telemetry: TelemetryData | None = None,
+        check_energy: bool = True,
+    ) -> tuple[list[MissionItem], MissionReport]:
+        """
+        Validates a mission and precomputes its geometry.
+        Args:
+            items (list[MissionItem]): The parsed mission items.
+            telemetry (TelemetryData | None): The current telemetry, used as the
+                launch point and for the battery check.
+            check_energy (bool): Whether to check the estimate against the battery level.
+        Returns:
+            tuple: The mission items with duplicate waypoints removed, and the report.
+        """
+        report = MissionReport(waypoints=len(items))
+        nav = [item for item in items if self._is_positional(item)]
+        if not nav:
+            report.errors.append("Mission has no waypoints")
+            return items, report
+
+        coordinates = self._coordinates(nav)
+        invalid = (
+            ~np.isfinite(coordinates[:, 2])
+            | (np.abs(coordinates[:, 0]) > 90)
+            | (np.abs(coordinates[:, 1]) > 180)
+            | ((coordinates[:, 0] == 0) & (coordinates[:, 1] == 0))
+        )
+        if invalid.any():
+            seqs = [nav[i].seq for i in np.flatnonzero(invalid)[:5]]
+            report.errors.append(f"Degenerate waypoints at {seqs}")
+            return items, report
+
+        items = self._remove_duplicates(items, report)
+        if report.removed_waypoints:
+            nav = [item for item in items if self._is_positional(item)]
+            coordinates = self._coordinates(nav)
+        latitude, longitude, altitude, frame = coordinates.T
+
+        positioned = np.flatnonzero(~np.isnan(latitude))
+        if telemetry:
+            home_lat = telemetry.position.latitude_deg
+            home_lon = telemetry.position.longitude_deg
+            home_alt = telemetry.position.absolute_altitude_m
+        elif positioned.size:
+            first = positioned[0]
+            home_lat, home_lon, home_alt = latitude[first], longitude[first], math.nan
+            report.warnings.append("No telemetry, using the first waypoint as home")
+        else:
+            report.errors.append("Mission has no waypoint with a position")
+            return items, report
+
+        # A takeoff without a position before any waypoint happens at home.
+        latitude = np.where(np.isnan(latitude), home_lat, latitude)
+        longitude = np.where(np.isnan(longitude), home_lon, longitude)
+
+        # Altitudes above home; AMSL waypoints need the home altitude.
+        relative = np.where(
+            frame == MAV_FRAME_GLOBAL_INT, altitude - home_alt, altitude
+        )
+        if np.isnan(relative).any():
+            report.warnings.append("AMSL waypoints not checked without a home altitude")
+        report.max_altitude_m = float(np.nanmax(relative, initial=0.0))
+        if report.max_altitude_m > self.max_altitude_m:
+            report.errors.append(
+                f"Mission reaches {report.max_altitude_m:.1f} m, above the {self.max_altitude_m:.1f} m limit"
+            )
+
+        lat = np.radians(np.concatenate(([home_lat], latitude)))
+        lon = np.radians(np.concatenate(([home_lon], longitude)))
+        legs = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        report.path_length_m = float(legs.sum())
+        report.max_distance_m = float(haversine(lat[0], lon[0], lat[1:], lon[1:]).max())
+        if self.max_distance_m and report.max_distance_m > self.max_distance_m:
+            report.errors.append(
+                f"Mission goes {report.max_distance_m:.0f} m from home, outside the {self.max_distance_m:.0f} m geofence"
+            )
+
+        climb = np.abs(np.diff(np.nan_to_num(relative), prepend=0.0)).sum()
+        hold = sum(
+            item.param1
+            for item in nav
+            if item.command in (MAV_CMD_NAV_WAYPOINT, MAV_CMD_NAV_LOITER_TIME)
+            and math.isfinite(item.param1)
+        )
+        report.estimated_flight_time_s = float(
+            report.path_length_m / self.cruise_speed_mps
+            + climb / self.vertical_speed_mps
+            + hold
+        )
+        report.estimated_energy_wh = (
+            report.estimated_flight_time_s / 3600 * self.cruise_power_w
+        )
+
+        if check_energy:
+            self._check_energy(report, telemetry)
+        logger.info(
+            f"Mission of {len(nav)} waypoints: {report.path_length_m:.0f} m, "
+            f"~{report.estimated_flight_time_s:.0f} s, ~{report.estimated_energy_wh:.1f} Wh"
+        )
+        return items, report
+
+    def _check_energy(
+        self, report: MissionReport, telemetry: TelemetryData | None
+    ) -> None:
+        if not self.battery_capacity_wh:
+            return
+
+        remaining = telemetry.battery.remaining_percent if telemetry else math.nan
+        if not math.isfinite(remaining):
+            report.warnings.append("Battery level unknown, energy not checked")
+            return
+
+        report.available_energy_wh = (
+            self.battery_capacity_wh * max(remaining - self.reserve_percent, 0.0) / 100
+        )
+        if report.estimated_energy_wh > report.available_energy_wh:
+            report.errors.append(
+                f"Mission needs ~{report.estimated_energy_wh:.1f} Wh but only "
+                f"{report.available_energy_wh:.1f} Wh are available above the "
+                f"{self.reserve_percent:.0f}% reserve"
+            )
@@ -1,57 +1,290 @@
-import json
+import threading
+from typing import Callable
+
 from loguru import logger
 
 import dotenv
-from awscrt import mqtt
-from awsiot import mqtt_connection_builder
+from awscrt import mqtt5
+from awsiot import mqtt5_client_builder
+
+from src.Classes.disk_spool import DiskSpool
+from src.Classes.telemetry_batcher import TelemetryBatcher
+from src.Enums.spool_record_type import SpoolRecordType
+
+CONTENT_TYPE_PROPERTY = "content-type"
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Whether a topic matches an MQTT topic filter with + and # wildcards."""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
 
 
 class IoTBaseClient:
+    """
+    The agent's single MQTT5 connection to AWS IoT. Jobs clients run their
+    request/response operations over it and everything else publishes and
+    subscribes through it. Outbound topics get topic aliases, so frequent
+    publishes to the same topic don't resend the topic name, and payloads carry
+    their content type both natively and as a user property.
+    """
+
     def __init__(
         self,
         cert_filepath: str,
         pri_key_filepath: str,
         ca_filepath: str,
         config_path: str = ".config.env",
+        spool: DiskSpool | None = None,
+        topic_aliases: int = 8,
     ):
         self.config: dict[str, str | None] = dotenv.dotenv_values(config_path)
         if not self.config.get("IOT_ENDPOINT") or not self.config.get("IOT_THING_NAME"):
             raise ValueError("Missing IOT_ENDPOINT or IOT_THING_NAME in config")
 
-        self.mqtt_connection = mqtt_connection_builder.mtls_from_path(
+        self.mqtt5_client = mqtt5_client_builder.mtls_from_path(
+            endpoint=self.config["IOT_ENDPOINT"],
             cert_filepath=cert_filepath,
             pri_key_filepath=pri_key_filepath,
             ca_filepath=ca_filepath,
-            endpoint=self.config["IOT_ENDPOINT"],
             client_id=self.config["IOT_THING_NAME"],
-            clean_session=False,
+            session_behavior=mqtt5.ClientSessionBehaviorType.REJOIN_POST_SUCCESS,
             keep_alive_secs=30,
+            topic_aliasing_options=mqtt5.TopicAliasingOptions(
+                outbound_behavior=mqtt5.OutboundTopicAliasBehaviorType.LRU,
+                outbound_cache_max_size=topic_aliases,
+            ),
+            on_lifecycle_connection_success=self._on_connection_success,
+            on_lifecycle_disconnection=self._on_disconnection,
+            on_lifecycle_stopped=self._on_stopped,
+            on_publish_received=self._on_publish_received,
         )
+        self._init_state(spool)
 
-    def connect(self):
-        future = self.mqtt_connection.connect()
-        future.result()
-        logger.info("Basic MQTT client connected")
+    @classmethod
+    def local(
+        cls,
+        host: str,
+        port: int,
+        client_id: str,
+        spool: DiskSpool | None = None,
+        topic_aliases: int = 8,
+    ) -> "IoTBaseClient":
+        """
+        Creates a client of a local broker over plain TCP, such as Mosquitto or
+        the benchmark stand-in, instead of AWS IoT.
+        Args:
+            host (str): The broker host.
+            port (int): The broker port.
+            client_id (str): The MQTT client id, the thing name on AWS IoT.
+            spool (DiskSpool | None): Spool for messages published while offline.
+            topic_aliases (int): Size of the outbound topic alias cache.
+        """
+        client = cls.__new__(cls)
+        client.config = {"IOT_THING_NAME": client_id}
+        client.mqtt5_client = mqtt5.Client(
+            mqtt5.ClientOptions(
+                host_name=host,
+                port=port,
+                connect_options=mqtt5.ConnectPacket(
+                    client_id=client_id, keep_alive_interval_sec=30
+                ),
+                session_behavior=mqtt5.ClientSessionBehaviorType.REJOIN_POST_SUCCESS,
+                topic_aliasing_options=mqtt5.TopicAliasingOptions(
+                    outbound_behavior=mqtt5.OutboundTopicAliasBehaviorType.LRU,
+                    outbound_cache_max_size=topic_aliases,
+                ),
+                on_lifecycle_event_connection_success_fn=client._on_connection_success,
+                on_lifecycle_event_disconnection_fn=client._on_disconnection,
+                on_lifecycle_event_stopped_fn=client._on_stopped,
+                on_publish_callback_fn=client._on_publish_received,
+            )
+        )
+        client._init_state(spool)
+        return client
+
+    def _init_state(self, spool: DiskSpool | None) -> None:
+        self.connected: bool = False
+        self._connected_event = threading.Event()
+        self._subscriptions: dict[str, Callable] = {}
+        self.spool: DiskSpool | None = spool
+        if self.spool:
+            self.spool.register(SpoolRecordType.TELEMETRY, self._replay)
+
+    def _on_connection_success(self, event):
+        self.connected = True
+        self._connected_event.set()
+        if self.spool:
+            self.spool.schedule_drain()
+
+    def _on_disconnection(self, event):
+        self.connected = False
+        self._connected_event.clear()
+        logger.warning(f"MQTT connection interrupted: {event.exception}")
+
+    def _on_stopped(self, event):
+        self.connected = False
+        self._connected_event.clear()
+
+    def _on_publish_received(self, data: mqtt5.PublishReceivedData):
+        packet = data.publish_packet
+        user_properties = {p.name: p.value for p in packet.user_properties or []}
+        for topic_filter, callback in list(self._subscriptions.items()):
+            if topic_matches(topic_filter, packet.topic):
+                callback(
+                    topic=packet.topic,
+                    payload=packet.payload,
+                    content_type=packet.content_type
+                    or user_properties.get(CONTENT_TYPE_PROPERTY),
+                    user_properties=user_properties,
+                )
+
+    def _replay(self, key: str, message: bytes) -> bool:
+        if not self.connected:
+            return False
+
+        # Keys are "content type|topic"; older records only hold the topic.
+        content_type, separator, topic = key.partition("|")
+        if not separator:
+            content_type, topic = "", key
+        self._publish(topic, message, mqtt5.QoS.AT_LEAST_ONCE, content_type or None)
+        return True
+
+    def start(self):
+        """Starts connecting in the background; the CRT keeps reconnecting from then on."""
+        self.mqtt5_client.start()
+
+    def wait_connected(self, timeout: float = 30) -> bool:
+        """Waits up to timeout seconds for the first connection, returns whether it is up."""
+        if self._connected_event.wait(timeout):
+            logger.info("MQTT client connected")
+            return True
+        logger.warning("MQTT client not connected yet, continuing offline")
+        return False
 
-    def subscribe(self, topic: str, callback):
-        future, _ = self.mqtt_connection.subscribe(
-            topic=topic, qos=mqtt.QoS.AT_LEAST_ONCE, callback=callback
+    def connect(self, timeout: float = 30):
+        """Starts the client and waits up to timeout seconds for the first connection."""
+        self.start()
+        self.wait_connected(timeout)
+
+    def subscribe(self, topic: str, callback: Callable):
+        """
+        Subscribe to a topic filter. The callback is invoked on the CRT thread with
+        the keyword arguments topic, payload, content_type and user_properties.
+        """
+        self._subscriptions[topic] = callback
+        future = self.mqtt5_client.subscribe(
+            mqtt5.SubscribePacket(
+                subscriptions=[
+                    mqtt5.Subscription(topic_filter=topic, qos=mqtt5.QoS.AT_LEAST_ONCE)
+                ]
+            )
         )
         future.result()
         logger.info(f"Subscribed to {topic}")
 
     def unsubscribe(self, topic: str):
-        future, _ = self.mqtt_connection.unsubscribe(topic=topic)
+        future = self.mqtt5_client.unsubscribe(
+            mqtt5.UnsubscribePacket(topic_filters=[topic])
+        )
         future.result()
+        self._subscriptions.pop(topic, None)
         logger.info(f"Unsubscribed from {topic}")
 
-    def publish(self, topic: str, message: str):
-        self.mqtt_connection.publish(
-            topic=topic, payload=message, qos=mqtt.QoS.AT_LEAST_ONCE
+    def _publish(
+        self,
+        topic: str,
+        message: str | bytes,
+        qos: mqtt5.QoS,
+        content_type: str | None,
+        user_properties: dict[str, str] | None = None,
+    ):
+        properties = dict(user_properties or {})
+        if content_type:
+            properties[CONTENT_TYPE_PROPERTY] = content_type
+
+        self.mqtt5_client.publish(
+            mqtt5.PublishPacket(
+                topic=topic,
+                payload=message,
+                qos=qos,
+                content_type=content_type,
+                user_properties=[
+                    mqtt5.UserProperty(name=name, value=value)
+                    for name, value in properties.items()
+                ]
+                or None,
+            )
         )
-        logger.debug(f"Published to {topic}: {message}")
+
+    def publish(
+        self,
+        topic: str,
+        message: str | bytes,
+        qos: mqtt5.QoS = mqtt5.QoS.AT_LEAST_ONCE,
+        content_type: str | None = None,
+        user_properties: dict[str, str] | None = None,
+    ):
+        """Publish a message. QoS 1 messages are spooled to disk while offline."""
+        if self._spool_if_offline(topic, message, qos, content_type):
+            return
+
+        self._publish(topic, message, qos, content_type, user_properties)
+        # QoS 0 is high-rate telemetry, not worth a log record per message.
+        if qos != mqtt5.QoS.AT_MOST_ONCE:
+            logger.opt(lazy=True).trace(
+                "Published {} bytes to {}", lambda: len(message), lambda: topic
+            )
+
+    def _spool_if_offline(
+        self,
+        topic: str,
+        message: str | bytes,
+        qos: mqtt5.QoS,
+        content_type: str | None = None,
+    ) -> bool:
+        if self.connected or not self.spool or qos == mqtt5.QoS.AT_MOST_ONCE:
+            return False
+
+        if isinstance(message, str):
+            message = message.encode()
+        self.spool.append(
+            SpoolRecordType.TELEMETRY, f"{content_type or ''}|{topic}", message
+        )
+        logger.debug(f"Offline, spooled message to {topic}")
+        return True
+
+    def publish_batch(
+        self,
+        topic: str,
+        batcher: TelemetryBatcher,
+        qos: mqtt5.QoS = mqtt5.QoS.AT_LEAST_ONCE,
+        content_type: str | None = None,
+    ) -> bool:
+        """Flush the batcher into a single message. Returns False if it was empty."""
+        payload: bytes | None = batcher.flush()
+        if payload is None:
+            return False
+
+        if self._spool_if_offline(topic, payload, qos, content_type):
+            return True
+
+        self._publish(topic, payload, qos, content_type)
+        logger.debug(f"Published batch of {len(payload)} bytes to {topic}")
+        return True
+
+    def outbound_queue_depth(self) -> int:
+        """Number of operations submitted to the client that are not yet complete."""
+        return self.mqtt5_client.get_stats().incomplete_operation_count
 
     def disconnect(self):
-        future = self.mqtt_connection.disconnect()
-        future.result()
-        logger.info("Disconnected basic client")
+        self.mqtt5_client.stop()
+        logger.info("Disconnected MQTT client")
@@ -1,83 +1,211 @@
+import asyncio
+import json
+from concurrent.futures import Future
+from typing import Callable
+
 from loguru import logger
 
-import dotenv
 from awscrt import mqtt_request_response
-from awsiot import iotjobs, mqtt5_client_builder
+from awsiot import (
+    iotjobs,
+    ServiceStreamOptions,
+    V2ServiceException,
+)
 from awsiot.iotjobs import (
     GetPendingJobExecutionsResponse,
     DescribeJobExecutionResponse,
     JobExecutionSummary,
     JobExecutionData,
+    JobExecutionsChangedEvent,
+    NextJobExecutionChangedEvent,
 )
 from pydantic import ValidationError
 
+from src.Classes.disk_spool import DiskSpool
+from src.Classes.job_cache import JobCache
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.mqtt_base import IoTBaseClient
 from src.Enums.job_status import JobStatus
+from src.Enums.spool_record_type import SpoolRecordType
 from src.Models.job_document import Job
 
 
 class IoTJobsClient:
+    """
+    Jobs client of a single thing, running over the shared MQTT5 connection of
+    an IoTBaseClient. Clients of further things, created with for_thing, share
+    its request/response client; size it with `max_things`.
+    """
+
     def __init__(
         self,
-        cert_filepath: str,
-        pri_key_filepath: str,
+        base: IoTBaseClient,
         thing_name: str,
-        config_path: str = ".config.env",
+        max_things: int = 1,
+        shared: "IoTJobsClient | None" = None,
+        metrics: Metrics = metrics,
     ):
-        self.config: dict[str, str | None] = dotenv.dotenv_values(config_path)
-        if not self.config.get("IOT_ENDPOINT") or not self.config.get("IOT_THING_NAME"):
-            raise ValueError("Missing IOT_ENDPOINT or IOT_THING_NAME in config")
-
+        self.base: IoTBaseClient = base
         self.thing_name = thing_name
+        self.metrics: Metrics = metrics
+        self.cache: JobCache = JobCache()
+        self.streams: list = []
+        self._on_next_job: Callable[[JobExecutionData], None] | None = None
+        self._on_jobs_changed: Callable[[], None] | None = None
 
-        self.mqtt5_client = mqtt5_client_builder.mtls_from_path(
-            endpoint=self.config["IOT_ENDPOINT"],
-            cert_filepath=cert_filepath,
-            pri_key_filepath=pri_key_filepath,
-            clean_session=True,
-            keep_alive_secs=30,
-        )
+        self.spool: DiskSpool | None = base.spool
+        if shared:
+            self.jobs_client: iotjobs.IotJobsClientV2 = shared.jobs_client
+            self._things: dict[str, IoTJobsClient] = shared._things
+            self._things[thing_name] = self
+            return
 
+        self._things = {thing_name: self}
+        if self.spool:
+            self.spool.register(SpoolRecordType.JOB_UPDATE, self._replay)
+
+        # Every thing opens two job execution streams.
         rr_options = mqtt_request_response.ClientOptions(
-            max_request_response_subscriptions=2,
-            max_streaming_subscriptions=2,
+            max_request_response_subscriptions=2 * max_things,
+            max_streaming_subscriptions=2 * max_things,
             operation_timeout_in_seconds=30,
         )
 
-        self.jobs_client = iotjobs.IotJobsClientV2(self.mqtt5_client, rr_options)
+        self.jobs_client = iotjobs.IotJobsClientV2(base.mqtt5_client, rr_options)
+
+    def for_thing(self, thing_name: str, metrics: Metrics = metrics) -> "IoTJobsClient":
+        """
+        Creates a client for another thing that shares this client's request/response client.
+        Args:
+            thing_name (str): The name of the other thing.
+            metrics (Metrics): The registry of the other thing's figures.
+        Returns:
+            IoTJobsClient: The client of the other thing.
+        """
+        return IoTJobsClient(self.base, thing_name, shared=self, metrics=metrics)
+
+    @property
+    def connected(self) -> bool:
+        return self.base.connected
+
+    def _replay(self, key: str, data: bytes) -> bool:
+        if not self.connected:
+            return False
+
+        # Keys are "thing/job"; records spooled by older versions only hold the job.
+        thing_name, _, job_id = key.rpartition("/")
+        client = self._things.get(thing_name or self.thing_name)
+        if client is None:
+            logger.warning(f"Dropping spooled update for unknown thing {thing_name}")
+            return True
+
+        update = json.loads(data)
+        try:
+            # Replays run on the spool thread, so blocking here is fine.
+            client._request_update(
+                job_id, JobStatus(update["status"]), update.get("status_details")
+            ).result()
+        except V2ServiceException as e:
+            if e.modeled_error is None:
+                return False
+            # The service rejected the update, retrying it cannot succeed.
+            logger.warning(
+                f"Dropping spooled update for job {job_id}: {e.modeled_error}"
+            )
+        return True
+
+    def open_streams(
+        self,
+        on_next_job: Callable[[JobExecutionData], None],
+        on_jobs_changed: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Subscribe to the Jobs notification streams that keep the cache current.
+        Args:
+            on_next_job (Callable): Invoked on the CRT thread with the next pending
+                execution, job document included, whenever it changes.
+            on_jobs_changed (Callable | None): Invoked on the CRT thread after the
+                cached pending lists changed.
+        """
+        self._on_next_job = on_next_job
+        self._on_jobs_changed = on_jobs_changed
+
+        next_job_stream = self.jobs_client.create_next_job_execution_changed_stream(
+            iotjobs.NextJobExecutionChangedSubscriptionRequest(
+                thing_name=self.thing_name
+            ),
+            ServiceStreamOptions(incoming_event_listener=self._next_job_changed),
+        )
+        executions_stream = self.jobs_client.create_job_executions_changed_stream(
+            iotjobs.JobExecutionsChangedSubscriptionRequest(thing_name=self.thing_name),
+            ServiceStreamOptions(incoming_event_listener=self._job_executions_changed),
+        )
 
-    def connect(self):
-        self.mqtt5_client.start()
-        logger.info("Jobs client connected to MQTT broker")
+        self.streams = [next_job_stream, executions_stream]
+        for stream in self.streams:
+            stream.open()
+        logger.info(f"Opened job execution streams of {self.thing_name}")
 
-    def get_pending_jobs(self) -> GetPendingJobExecutionsResponse:
+    def _next_job_changed(self, event: NextJobExecutionChangedEvent) -> None:
+        if event.execution is None:
+            logger.debug("No pending job executions")
+            return
+
+        self.cache.put_execution(event.execution)
+        logger.info(f"Next job execution changed: {event.execution.job_id}")
+        if self._on_next_job:
+            self._on_next_job(event.execution)
+
+    def _job_executions_changed(self, event: JobExecutionsChangedEvent) -> None:
+        jobs = event.jobs or {}
+        self.cache.update_pending(
+            jobs.get(JobStatus.QUEUED.value), jobs.get(JobStatus.IN_PROGRESS.value)
+        )
+        logger.debug(f"Job executions changed: {list(jobs)}")
+        if self._on_jobs_changed:
+            self._on_jobs_changed()
+
+    async def refresh_cache(self) -> None:
+        """Seed the cache, including the documents of in-progress executions."""
+        jobs = await self.get_pending_jobs()
+        self.cache.update_pending(jobs.queued_jobs, jobs.in_progress_jobs)
+
+        await asyncio.gather(
+            *(self.get_job_execution(job.job_id) for job in jobs.in_progress_jobs or [])
+        )
+
+    async def get_pending_jobs(self) -> GetPendingJobExecutionsResponse:
         """Get list of pending job executions."""
         req = iotjobs.GetPendingJobExecutionsRequest(thing_name=self.thing_name)
-        result: GetPendingJobExecutionsResponse = (
-            self.jobs_client.get_pending_job_executions(req).result()
-        )
+        with self.metrics.timer("jobs.get_pending"):
+            result: GetPendingJobExecutionsResponse = await asyncio.wrap_future(
+                self.jobs_client.get_pending_job_executions(req)
+            )
         return result
 
-    def get_next_in_progress_job(self) -> JobExecutionSummary | None:
+    async def get_next_in_progress_job(self) -> JobExecutionSummary | None:
         """Used when job execution was interrupted."""
-        jobs = self.get_pending_jobs()
-        if len(jobs.in_progress_jobs) != 0:
-            return jobs.in_progress_jobs[0]
-        return None
+        if not self.cache.synced:
+            await self.refresh_cache()
+        return self.cache.next_in_progress()
 
-    def get_next_queued_job(self) -> JobExecutionSummary | None:
+    async def get_next_queued_job(self) -> JobExecutionSummary | None:
         """Get next job execution."""
-        jobs = self.get_pending_jobs()
-        if len(jobs.queued_jobs) != 0:
-            return jobs.queued_jobs[0]
-        return None
+        if not self.cache.synced:
+            await self.refresh_cache()
+        return self.cache.next_queued()
+
+    async def get_job_execution(self, job_id: str) -> JobExecutionData:
+        """Get a job execution with its document, from the cache when possible."""
+        execution = self.cache.execution(job_id)
+        if execution is None:
+            execution = (await self.describe_job_execution(job_id)).execution
+            self.cache.put_execution(execution)
+        return execution
 
     @staticmethod
-    def get_job_documents(
-        job_describe_response: DescribeJobExecutionResponse,
-    ) -> Job | None:
+    def get_job_documents(job_data: JobExecutionData) -> Job | None:
         """Get job documents."""
-        job_data: JobExecutionData = job_describe_response.execution
-
         try:
             job_document: Job = Job.model_validate(job_data.job_document)
             return job_document
@@ -85,24 +213,73 @@ class IoTJobsClient:
             logger.warning("Unknown job document, cannot validate..")
             return None
 
-    def describe_job_execution(self, job_id: str) -> DescribeJobExecutionResponse:
+    async def describe_job_execution(self, job_id: str) -> DescribeJobExecutionResponse:
         """Get details of a specific job execution."""
         req = iotjobs.DescribeJobExecutionRequest(
             thing_name=self.thing_name, job_id=job_id
         )
-        result: DescribeJobExecutionResponse = self.jobs_client.describe_job_execution(
-            req
-        ).result()
+        with self.metrics.timer("jobs.describe"):
+            result: DescribeJobExecutionResponse = await asyncio.wrap_future(
+                self.jobs_client.describe_job_execution(req)
+            )
         logger.debug(f"Job {job_id} details: {result}")
         return result
 
-    def update_job(self, job_id: str, status: JobStatus) -> None:
+    async def update_job(
+        self,
+        job_id: str,
+        status: JobStatus,
+        status_details: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Update a job execution status. Updates are spooled to disk while offline,
+        and after a reconnect until the older spooled updates are drained, so
+        the statuses of a job reach the service in order.
+        """
+        if self.spool and (
+            not self.connected or self.spool.pending(SpoolRecordType.JOB_UPDATE)
+        ):
+            self.spool.append(
+                SpoolRecordType.JOB_UPDATE,
+                f"{self.thing_name}/{job_id}",
+                json.dumps(
+                    {"status": status.value, "status_details": status_details}
+                ).encode(),
+            )
+            self.cache.set_status(job_id, status)
+            self.metrics.increment("jobs.update_spooled")
+            if self.connected:
+                self.spool.schedule_drain()
+                logger.info(
+                    f"Spooled status {status.value} for job {job_id} behind older updates"
+                )
+            else:
+                logger.info(f"Offline, spooled status {status.value} for job {job_id}")
+            return
+
+        with self.metrics.timer("jobs.update"):
+            result = await asyncio.wrap_future(
+                self._request_update(job_id, status, status_details)
+            )
+        self.cache.set_status(job_id, status)
+        logger.debug(f"Updated job {job_id}: {result}")
+
+    def _request_update(
+        self,
+        job_id: str,
+        status: JobStatus,
+        status_details: dict[str, str] | None = None,
+    ) -> Future:
         req = iotjobs.UpdateJobExecutionRequest(
-            thing_name=self.thing_name, job_id=job_id, status=status.value
+            thing_name=self.thing_name,
+            job_id=job_id,
+            status=status.value,
+            status_details=status_details,
         )
-        result = self.jobs_client.update_job_execution(req).result()
-        logger.debug(f"Updated job {job_id}: {result}")
+        return self.jobs_client.update_job_execution(req)
 
     def disconnect(self) -> None:
-        self.mqtt5_client.stop()
-        logger.info("Disconnected jobs client")
+        """Closes the job streams; the MQTT connection belongs to the base client."""
+        # Streaming operations are released together with their references.
+        self.streams.clear()
+        logger.info(f"Disconnected jobs client of {self.thing_name}")
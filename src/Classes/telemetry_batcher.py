@@ -0,0 +1,201 @@
+import struct
+import time
+import zlib
+from array import array
+
+from src.Classes.telemetry_codec import (
+    CODEC_VERSION,
+    FIELDS,
+    FLAG_BATCH,
+    HEADER,
+    build,
+    quantize,
+)
+from src.Classes.telemetry_record import TelemetryRecord
+from src.Models.telemetry_data import TelemetryData
+
+# frame count, timestamp of the first frame (unix seconds)
+BATCH_HEADER = struct.Struct("<Hd")
+
+# Column struct formats: millisecond offsets from the first frame, one column
+# per codec field, then the status byte. Columns are packed little-endian with
+# the standard sizes of these formats, whatever the platform's C types.
+COLUMN_TYPES: tuple[str, ...] = ("I",) + tuple(fmt for _, _, fmt, _ in FIELDS) + ("B",)
+
+
+def _typecode(fmt: str) -> str:
+    """An array typecode holding the values of a struct format, at least as wide."""
+    size: int = struct.calcsize("<" + fmt)
+    signed: bool = fmt.islower()
+    for code in ("bhilq" if signed else "BHILQ"):
+        if array(code).itemsize >= size:
+            return code
+    raise ValueError(f"No array type holds struct format {fmt}")
+
+
+class TelemetryRingBuffer:
+    """
+    Fixed-capacity columnar buffer of telemetry frames. All columns are
+    preallocated; once full, the oldest frame is overwritten.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity: int = capacity
+        self.timestamps: array = array("d", bytes(8 * capacity))
+        self.columns: list[array] = [
+            array(code, bytes(array(code).itemsize * capacity))
+            for code in map(_typecode, COLUMN_TYPES[1:])
+        ]
+        self.start: int = 0
+        self.count: int = 0
+        self.dropped: int = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, values: list[int], timestamp: float) -> None:
+        index = (self.start + self.count) % self.capacity
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.dropped += 1
+        else:
+            self.count += 1
+
+        self.timestamps[index] = timestamp
+        for column, value in zip(self.columns, values):
+            column[index] = value
+
+    def oldest_timestamp(self) -> float | None:
+        if self.count == 0:
+            return None
+        return self.timestamps[self.start]
+
+    def _ordered(self, column: array) -> array:
+        end = self.start + self.count
+        if end <= self.capacity:
+            return column[self.start : end]
+        return column[self.start :] + column[: end - self.capacity]
+
+    def drain(self) -> tuple[array, list[array]]:
+        """
+        Removes every buffered frame.
+        Returns:
+            tuple: The timestamps and the value columns, oldest first.
+        """
+        timestamps = self._ordered(self.timestamps)
+        columns = [self._ordered(column) for column in self.columns]
+        self.start = 0
+        self.count = 0
+        return timestamps, columns
+
+
+class TelemetryBatcher:
+    """
+    Accumulates telemetry frames and emits them as one compressed, columnar
+    batch once `max_frames` frames or `max_latency_ms` milliseconds are reached.
+    """
+
+    def __init__(
+        self,
+        max_frames: int = 50,
+        max_latency_ms: int = 5000,
+        capacity: int | None = None,
+        compression_level: int = 6,
+    ) -> None:
+        if max_frames < 1 or max_frames > 0xFFFF:
+            raise ValueError("max_frames must be between 1 and 65535")
+
+        self.max_frames: int = max_frames
+        self.max_latency_ms: int = max_latency_ms
+        self.compression_level: int = compression_level
+        self.buffer: TelemetryRingBuffer = TelemetryRingBuffer(
+            max(capacity or max_frames, max_frames)
+        )
+        self.sequence: int = 0
+
+    def append(
+        self,
+        telemetry: TelemetryData | TelemetryRecord,
+        timestamp: float | None = None,
+    ) -> None:
+        """
+        Adds a frame to the current batch, quantized right away so a record
+        can keep being updated.
+        Args:
+            telemetry (TelemetryData | TelemetryRecord): The telemetry sample.
+            timestamp (float | None): Sample time in unix seconds, defaults to now.
+        """
+        self.buffer.append(
+            quantize(telemetry), time.time() if timestamp is None else timestamp
+        )
+
+    def ready(self, now: float | None = None) -> bool:
+        """Whether the current batch reached its size or latency limit."""
+        oldest = self.buffer.oldest_timestamp()
+        if oldest is None:
+            return False
+        if len(self.buffer) >= self.max_frames:
+            return True
+        now = time.time() if now is None else now
+        return (now - oldest) * 1000 >= self.max_latency_ms
+
+    def flush(self) -> bytes | None:
+        """
+        Encodes and clears the current batch.
+        Returns:
+            bytes | None: The batch message, or None if there is nothing to send.
+        """
+        if len(self.buffer) == 0:
+            return None
+
+        timestamps, columns = self.buffer.drain()
+        base: float = timestamps[0]
+        offsets = [
+            min(0xFFFFFFFF, max(0, round((t - base) * 1000))) for t in timestamps
+        ]
+
+        count: int = len(timestamps)
+        body = b"".join(
+            struct.pack(f"<{count}{fmt}", *column)
+            for fmt, column in zip(COLUMN_TYPES, [offsets, *columns])
+        )
+        header = HEADER.pack(CODEC_VERSION, FLAG_BATCH, self.sequence)
+        self.sequence = (self.sequence + 1) & 0xFFFF
+
+        return (
+            header
+            + BATCH_HEADER.pack(count, base)
+            + zlib.compress(body, self.compression_level)
+        )
+
+
+def decode_batch(payload: bytes) -> list[tuple[float, TelemetryData]]:
+    """
+    Decodes a batch message produced by TelemetryBatcher.
+    Args:
+        payload (bytes): The batch message.
+    Returns:
+        list: (timestamp, TelemetryData) pairs, oldest first.
+    """
+    version, flags, _ = HEADER.unpack_from(payload)
+    if version != CODEC_VERSION or not flags & FLAG_BATCH:
+        raise ValueError("Payload is not a telemetry batch")
+
+    count, base = BATCH_HEADER.unpack_from(payload, HEADER.size)
+    body = zlib.decompress(payload[HEADER.size + BATCH_HEADER.size :])
+
+    columns: list[tuple[int, ...]] = []
+    offset: int = 0
+    for fmt in COLUMN_TYPES:
+        column = struct.Struct(f"<{count}{fmt}")
+        columns.append(column.unpack_from(body, offset))
+        offset += column.size
+
+    offsets, values = columns[0], columns[1:]
+    return [
+        (base + offsets[i] / 1000, build([column[i] for column in values]))
+        for i in range(count)
+    ]
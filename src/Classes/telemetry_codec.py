@@ -0,0 +1,388 @@
+import math
+import struct
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from src.Models.telemetry_data import (
+    Attitude as AttitudeModel,
+    Battery as BatteryModel,
+    DistanceSensor as DistanceSensorModel,
+    GpsInfo as GpsInfoModel,
+    Position as PositionModel,
+    Health as HealthModel,
+    RcStatus as RcStatusModel,
+    VelocityNed as VelocityNedModel,
+    Wind as WindModel,
+)
+from src.Models.telemetry_data import TelemetryData
+
+if TYPE_CHECKING:
+    from src.Classes.telemetry_record import TelemetryRecord
+
+CODEC_VERSION = 3
+# MQTT content type of frames and batches, which the header flags tell apart
+CONTENT_TYPE = "application/vnd.onboardagent.telemetry"
+
+FLAG_KEYFRAME = 0x01
+FLAG_BATCH = 0x02
+
+# version, flags, sequence number
+HEADER = struct.Struct("<BBH")
+# bitmask of the fields present in a frame
+FIELD_MASK = struct.Struct("<I")
+
+# (model, field, struct format, scale); an empty model is a top-level field.
+# Values outside a field's range are clamped, so each range covers what the
+# vehicles report: up to 655 V for 16S packs and beyond, 655 m for the
+# distance sensor.
+FIELDS: tuple[tuple[str, str, str, float], ...] = (
+    ("position", "latitude_deg", "i", 1e7),
+    ("position", "longitude_deg", "i", 1e7),
+    ("position", "absolute_altitude_m", "i", 1e3),
+    ("position", "relative_altitude_m", "i", 1e3),
+    ("battery", "temperature_degc", "h", 1e2),
+    ("battery", "voltage_v", "H", 1e2),
+    ("battery", "current_battery_a", "h", 1e2),
+    ("battery", "capacity_consumed_ah", "H", 1e3),
+    ("battery", "remaining_percent", "H", 1e2),
+    ("attitude", "roll_deg", "h", 1e2),
+    ("attitude", "pitch_deg", "h", 1e2),
+    ("attitude", "yaw_deg", "h", 1e2),
+    ("velocity_ned", "north_m_s", "h", 1e2),
+    ("velocity_ned", "east_m_s", "h", 1e2),
+    ("velocity_ned", "down_m_s", "h", 1e2),
+    ("gps_info", "num_satellites", "B", 1),
+    ("gps_info", "fix_type", "B", 1),
+    ("", "flight_mode", "B", 1),
+    ("rc_status", "is_available", "B", 1),
+    ("rc_status", "signal_strength_percent", "B", 1),
+    ("wind", "north_m_s", "h", 1e2),
+    ("wind", "east_m_s", "h", 1e2),
+    ("wind", "down_m_s", "h", 1e2),
+    ("distance_sensor", "current_distance_m", "H", 1e2),
+)
+
+# Models of the optional streams, None when all their fields are absent.
+OPTIONAL_MODELS: dict[str, type] = {
+    "attitude": AttitudeModel,
+    "velocity_ned": VelocityNedModel,
+    "gps_info": GpsInfoModel,
+    "rc_status": RcStatusModel,
+    "wind": WindModel,
+    "distance_sensor": DistanceSensorModel,
+}
+
+# Enum fields are sent as the index of their name. The names of MAVSDK's
+# FixType and FlightMode are listed here rather than taken from mavsdk, which
+# would pull its whole gRPC stack into the MQTT side, and so the codes stay
+# fixed; new names are only ever appended.
+CODES: dict[str, tuple[str, ...]] = {
+    "fix_type": (
+        "NO_GPS",
+        "NO_FIX",
+        "FIX_2D",
+        "FIX_3D",
+        "FIX_DGPS",
+        "RTK_FLOAT",
+        "RTK_FIXED",
+    ),
+    "flight_mode": (
+        "UNKNOWN",
+        "READY",
+        "TAKEOFF",
+        "HOLD",
+        "MISSION",
+        "RETURN_TO_LAUNCH",
+        "LAND",
+        "OFFBOARD",
+        "FOLLOW_ME",
+        "MANUAL",
+        "ALTCTL",
+        "POSCTL",
+        "ACRO",
+        "STABILIZED",
+        "RATTITUDE",
+    ),
+}
+
+# Bit order of the status byte: the seven health flags followed by in_air.
+STATUS_BITS: tuple[str, ...] = tuple(HealthModel.model_fields) + ("in_air",)
+STATUS_INDEX: int = len(FIELDS)
+
+_RANGES: dict[str, tuple[int, int]] = {
+    "i": (-(2**31), 2**31 - 1),
+    "h": (-(2**15), 2**15 - 1),
+    "H": (0, 2**16 - 1),
+    "B": (0, 2**8 - 1),
+}
+
+
+def _sentinel(fmt: str) -> int:
+    """The reserved value used for NaN, the minimum of signed and the maximum of unsigned types."""
+    low, high = _RANGES[fmt]
+    return low if low < 0 else high
+
+
+def _bounds(fmt: str) -> tuple[int, int]:
+    """The clamping range of a type, excluding its NaN sentinel."""
+    low, high = _RANGES[fmt]
+    return (low + 1, high) if low < 0 else (low, high - 1)
+
+
+def _quantizers(group: str) -> tuple:
+    return tuple(
+        (
+            attrgetter(field) if model else None,
+            scale,
+            *_bounds(fmt),
+            _sentinel(fmt),
+            {name: code for code, name in enumerate(CODES.get(field, ()))},
+        )
+        for model, field, fmt, scale in FIELDS
+        if (model or field) == group
+    )
+
+
+# Per-group (getter, sentinels, fields) with per-field (getter, scale, low,
+# high, sentinel, codes), precomputed for the encode hot path. A group is a
+# model, or a top-level field on its own; FIELDS lists each group contiguously.
+_QUANTIZERS = tuple(
+    (
+        attrgetter(group),
+        [fields[4] for fields in _quantizers(group)],
+        _quantizers(group),
+    )
+    for group in dict.fromkeys(model or field for model, field, _, _ in FIELDS)
+)
+# The same per-field (scale, low, high, sentinel, codes) in FIELDS order, for
+# TelemetryRecord whose values are already flat.
+_FIELD_QUANTIZERS = tuple(field[1:] for _, _, fields in _QUANTIZERS for field in fields)
+_SENTINELS: list[int] = [_sentinel(fmt) for _, _, fmt, _ in FIELDS]
+_HEALTH_GETTER = attrgetter(*(f"health.{name}" for name in STATUS_BITS[:-1]))
+
+
+def _dequantize(value: int, fmt: str, scale: float) -> float:
+    if value == _sentinel(fmt):
+        return math.nan
+    return value / scale
+
+
+def _status_byte(telemetry: TelemetryData) -> int:
+    status = int(telemetry.in_air) << (len(STATUS_BITS) - 1)
+    for bit, flag in enumerate(_HEALTH_GETTER(telemetry)):
+        if flag:
+            status |= 1 << bit
+    return status
+
+
+def _quantize_record(record: "TelemetryRecord") -> list[int]:
+    values: list[int] = []
+    for value, (scale, low, high, sentinel, codes) in zip(
+        record.values, _FIELD_QUANTIZERS
+    ):
+        if value is None or value != value:
+            values.append(sentinel)
+        elif codes:
+            values.append(codes.get(value, sentinel))
+        else:
+            values.append(max(low, min(high, round(value * scale))))
+    values.append(record.status)
+    return values
+
+
+def quantize(telemetry: "TelemetryData | TelemetryRecord") -> list[int]:
+    """
+    Converts a telemetry sample to the codec's scaled integer representation.
+    Args:
+        telemetry (TelemetryData | TelemetryRecord): The telemetry sample.
+    Returns:
+        list[int]: One value per entry of FIELDS, followed by the status byte.
+            Fields of disabled streams hold their NaN sentinel.
+    """
+    if not isinstance(telemetry, TelemetryData):
+        return _quantize_record(telemetry)
+
+    values: list[int] = []
+    for group_getter, sentinels, fields in _QUANTIZERS:
+        group = group_getter(telemetry)
+        if group is None:
+            values.extend(sentinels)
+            continue
+
+        for getter, scale, low, high, sentinel, codes in fields:
+            value = getter(group) if getter else group
+            if codes:
+                values.append(codes.get(value, sentinel))
+            elif value != value:
+                values.append(sentinel)
+            else:
+                values.append(max(low, min(high, round(value * scale))))
+    values.append(_status_byte(telemetry))
+    return values
+
+
+class TelemetryEncoder:
+    """
+    Encodes TelemetryData, or a TelemetryRecord, into compact binary frames.
+
+    A keyframe carries a bitmask followed by every field of the enabled
+    streams. Delta frames carry only the fields whose quantized value changed
+    since the previous frame.
+    A keyframe is emitted every `keyframe_interval` frames so a receiver can
+    resynchronise after loss.
+    """
+
+    def __init__(self, keyframe_interval: int = 50) -> None:
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+
+        self.keyframe_interval: int = keyframe_interval
+        self.sequence: int = 0
+        self._previous: list[int] | None = None
+        self._since_keyframe: int = 0
+        self._structs: dict[int, struct.Struct] = {}
+
+    def force_keyframe(self) -> None:
+        """Make the next encoded frame a keyframe."""
+        self._previous = None
+
+    def encode(self, telemetry: "TelemetryData | TelemetryRecord") -> bytes:
+        """
+        Encodes a telemetry sample.
+        Args:
+            telemetry (TelemetryData | TelemetryRecord): The telemetry sample to encode.
+        Returns:
+            bytes: The encoded frame.
+        """
+        return self._pack(quantize(telemetry))
+
+    def _pack(self, values: list[int]) -> bytes:
+        previous: list[int] | None = self._previous
+        if self._since_keyframe >= self.keyframe_interval:
+            previous = None
+        keyframe: bool = previous is None
+
+        if previous is None:
+            # Fields of disabled streams are left out of keyframes too.
+            mask = 1 << STATUS_INDEX
+            for index, (value, sentinel) in enumerate(zip(values, _SENTINELS)):
+                if value != sentinel:
+                    mask |= 1 << index
+            self._since_keyframe = 1
+        else:
+            mask = 0
+            for index, (value, last) in enumerate(zip(values, previous)):
+                if value != last:
+                    mask |= 1 << index
+            self._since_keyframe += 1
+
+        header = HEADER.pack(
+            CODEC_VERSION, FLAG_KEYFRAME if keyframe else 0, self.sequence
+        )
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        self._previous = values
+
+        body = self._struct(mask).pack(
+            *(value for index, value in enumerate(values) if mask >> index & 1)
+        )
+        return header + FIELD_MASK.pack(mask) + body
+
+    def _struct(self, mask: int) -> struct.Struct:
+        packer = self._structs.get(mask)
+        if packer is None:
+            packer = struct.Struct(_format(mask))
+            self._structs[mask] = packer
+        return packer
+
+
+def _format(mask: int) -> str:
+    formats = [fmt for _, _, fmt, _ in FIELDS] + ["B"]
+    return "<" + "".join(fmt for index, fmt in enumerate(formats) if mask >> index & 1)
+
+
+class TelemetryDecoder:
+    """
+    Decodes frames produced by TelemetryEncoder. Delta frames following a gap in
+    the sequence are dropped until the next keyframe.
+    """
+
+    def __init__(self) -> None:
+        self._values: list[int] | None = None
+        self._expected_sequence: int | None = None
+
+    def decode(self, payload: bytes) -> TelemetryData | None:
+        """
+        Decodes a single frame.
+        Args:
+            payload (bytes): The encoded frame.
+        Returns:
+            TelemetryData | None: The decoded telemetry, or None if the frame cannot be applied yet.
+        """
+        version, flags, sequence = HEADER.unpack_from(payload)
+        if version != CODEC_VERSION:
+            raise ValueError(f"Unsupported telemetry codec version {version}")
+
+        keyframe: bool = bool(flags & FLAG_KEYFRAME)
+        if not keyframe and (
+            self._values is None or sequence != self._expected_sequence
+        ):
+            logger.debug(f"Dropping delta frame {sequence}, waiting for keyframe")
+            self._values = None
+            return None
+
+        (mask,) = FIELD_MASK.unpack_from(payload, HEADER.size)
+        offset: int = HEADER.size + FIELD_MASK.size
+        if keyframe or self._values is None:
+            values = _SENTINELS + [0]
+        else:
+            values = list(self._values)
+        present = iter(struct.unpack_from(_format(mask), payload, offset))
+        for index in range(len(values)):
+            if mask >> index & 1:
+                values[index] = next(present)
+
+        self._values = values
+        self._expected_sequence = (sequence + 1) & 0xFFFF
+        return build(values)
+
+
+def _decode(field: str, value: int, fmt: str, scale: float) -> float | str | None:
+    codes = CODES.get(field)
+    if codes is None:
+        return _dequantize(value, fmt, scale)
+    return codes[value] if value < len(codes) else None
+
+
+def build(values: list[int]) -> TelemetryData:
+    """Converts the codec's scaled integer representation back to TelemetryData."""
+    fields: dict[str, dict] = {"position": {}, "battery": {}}
+    top_level: dict[str, float | str | None] = {}
+    present: set[str] = set()
+    for (model, field, fmt, scale), value in zip(FIELDS, values):
+        decoded = _decode(field, value, fmt, scale)
+        if not model:
+            top_level[field] = decoded
+            continue
+        fields.setdefault(model, {})[field] = decoded
+        if value != _sentinel(fmt):
+            present.add(model)
+
+    status: int = values[STATUS_INDEX]
+    flags = {name: bool(status >> bit & 1) for bit, name in enumerate(STATUS_BITS)}
+    in_air = flags.pop("in_air")
+
+    data: dict[str, Any] = {
+        "position": PositionModel(**fields["position"]),
+        "battery": BatteryModel(**fields["battery"]),
+        "health": HealthModel(**flags),
+        "in_air": in_air,
+        **{
+            name: model(**fields[name])
+            for name, model in OPTIONAL_MODELS.items()
+            if name in present
+        },
+        **top_level,
+    }
+    return TelemetryData.model_validate(data)
@@ -0,0 +1,332 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable
+
+from loguru import logger
+from mavsdk import System as MavSystem
+
+from src.Classes.telemetry_record import TelemetryRecord
+from src.Enums.telemetry_stream import TelemetryStream
+from src.Models.telemetry_data import (
+    Attitude as AttitudeModel,
+    Battery as BatteryModel,
+    DistanceSensor as DistanceSensorModel,
+    GpsInfo as GpsInfoModel,
+    Position as PositionModel,
+    Health as HealthModel,
+    RcStatus as RcStatusModel,
+    VelocityNed as VelocityNedModel,
+    Wind as WindModel,
+)
+from src.Models.telemetry_data import TelemetryData
+
+# Streams every frame needs; the others are only subscribed when enabled.
+CORE_STREAMS: tuple[TelemetryStream, ...] = (
+    TelemetryStream.POSITION,
+    TelemetryStream.BATTERY,
+    TelemetryStream.HEALTH,
+    TelemetryStream.IN_AIR,
+)
+
+# MAVSDK subscription and rate setter of each stream, None if PX4 has no
+# separate rate for it.
+STREAMS: dict[TelemetryStream, tuple[str, str | None]] = {
+    TelemetryStream.POSITION: ("position", "set_rate_position"),
+    TelemetryStream.BATTERY: ("battery", "set_rate_battery"),
+    TelemetryStream.HEALTH: ("health", "set_rate_health"),
+    TelemetryStream.IN_AIR: ("in_air", "set_rate_in_air"),
+    TelemetryStream.ATTITUDE: ("attitude_euler", "set_rate_attitude_euler"),
+    TelemetryStream.VELOCITY_NED: ("velocity_ned", "set_rate_velocity_ned"),
+    TelemetryStream.GPS_INFO: ("gps_info", "set_rate_gps_info"),
+    TelemetryStream.FLIGHT_MODE: ("flight_mode", None),
+    TelemetryStream.RC_STATUS: ("rc_status", "set_rate_rc_status"),
+    TelemetryStream.WIND: ("wind", None),
+    TelemetryStream.DISTANCE_SENSOR: ("distance_sensor", "set_rate_distance_sensor"),
+    # Not part of TelemetryData, followed by the mission monitor
+    TelemetryStream.LANDED_STATE: ("landed_state", "set_rate_landed_state"),
+}
+
+# Converters from the MAVSDK value of an optional stream to its TelemetryData field.
+CONVERTERS: dict[TelemetryStream, Callable[[Any], Any]] = {
+    TelemetryStream.ATTITUDE: lambda v: AttitudeModel(**v.__dict__),
+    TelemetryStream.VELOCITY_NED: lambda v: VelocityNedModel(**v.__dict__),
+    TelemetryStream.GPS_INFO: lambda v: GpsInfoModel(
+        num_satellites=v.num_satellites, fix_type=v.fix_type.name
+    ),
+    TelemetryStream.FLIGHT_MODE: lambda v: v.name,
+    TelemetryStream.RC_STATUS: lambda v: RcStatusModel(**v.__dict__),
+    TelemetryStream.WIND: lambda v: WindModel(
+        north_m_s=v.wind_x_ned_m_s, east_m_s=v.wind_y_ned_m_s, down_m_s=v.wind_z_ned_m_s
+    ),
+    TelemetryStream.DISTANCE_SENSOR: lambda v: DistanceSensorModel(**v.__dict__),
+}
+
+
+def fuse(snapshot: dict[str, Any]) -> TelemetryData:
+    """
+    Builds TelemetryData from the latest MAVSDK value of each stream.
+    Args:
+        snapshot (dict): Stream values by stream name, including every core stream.
+    Returns:
+        TelemetryData: The fused telemetry, with the optional streams present in the snapshot.
+    """
+    return TelemetryData(
+        position=PositionModel(**snapshot["position"].__dict__),
+        battery=BatteryModel(**snapshot["battery"].__dict__),
+        health=HealthModel(**snapshot["health"].__dict__),
+        in_air=snapshot["in_air"],
+        **{
+            stream.value: convert(snapshot[stream.value])
+            for stream, convert in CONVERTERS.items()
+            if stream.value in snapshot
+        },
+    )
+
+
+def parse_streams(spec: str | None) -> dict[TelemetryStream, float | None]:
+    """
+    Parses a stream list such as "attitude:50,velocity_ned:10,flight_mode".
+    Args:
+        spec (str | None): Comma-separated stream names, each with an optional rate in Hz.
+    Returns:
+        dict: The rate of each listed stream, None to keep the autopilot's default.
+    Raises:
+        ValueError: If a stream name or rate is invalid.
+    """
+    streams: dict[TelemetryStream, float | None] = {}
+    for entry in (spec or "").split(","):
+        name, _, rate = entry.strip().partition(":")
+        if name:
+            streams[TelemetryStream(name)] = float(rate) if rate else None
+    return streams
+
+
+class TelemetryEngine:
+    """
+    Keeps one long-lived subscription per MAVSDK telemetry stream and stores the
+    latest value of each one in a shared snapshot. The core streams are always
+    subscribed, optional ones only when enabled; a stream given a rate has it
+    requested from the autopilot every time it is subscribed.
+
+    Every sample is also stored in a TelemetryRecord, updated in place, which
+    the hot paths encode without building the pydantic models; latest() fuses
+    the snapshot into a validated TelemetryData for everything else.
+    """
+
+    def __init__(
+        self,
+        system: MavSystem,
+        retry_delay: float = 1.0,
+        streams: dict[TelemetryStream, float | None] | None = None,
+    ) -> None:
+        self.system: MavSystem = system
+        self.retry_delay: float = retry_delay
+        self.rates: dict[TelemetryStream, float | None] = {
+            **dict.fromkeys(CORE_STREAMS),
+            **(streams or {}),
+        }
+        self.snapshot: dict[str, Any] = {}
+        self.record: TelemetryRecord = TelemetryRecord()
+        self.timestamps: dict[str, float] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._updated: asyncio.Event = asyncio.Event()
+        self._listeners: list[Callable[[str, Any], None]] = []
+
+    def _streams(self) -> dict[str, Callable[[], AsyncIterator[Any]]]:
+        telemetry = self.system.telemetry
+        return {
+            stream.value: getattr(telemetry, STREAMS[stream][0])
+            for stream in self.rates
+        }
+
+    def add_listener(self, callback: Callable[[str, Any], None]) -> None:
+        """
+        Registers a callback invoked on the event loop with the stream name and
+        MAVSDK value of every sample. It must return quickly.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, Any], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def subscribe(self, *streams: TelemetryStream) -> None:
+        """
+        Adds streams to the subscriptions, e.g. those a component needs whether
+        or not they are published. They stay subscribed, and are started right
+        away if the engine is running.
+        """
+        for stream in streams:
+            if stream in self.rates:
+                continue
+            self.rates[stream] = None
+            if self._tasks:
+                self._tasks[stream.value] = asyncio.create_task(
+                    self._consume(stream.value), name=f"telemetry-{stream.value}"
+                )
+                logger.info(f"Telemetry engine subscribed to {stream.value}")
+
+    async def _set_rate(self, stream: TelemetryStream) -> None:
+        rate: float | None = self.rates.get(stream)
+        setter: str | None = STREAMS[stream][1]
+        if not rate or not setter:
+            return
+        try:
+            await getattr(self.system.telemetry, setter)(rate)
+        except Exception as e:
+            logger.warning(f"Failed to set {stream.value} rate to {rate} Hz: {e}")
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks.values())
+
+    @property
+    def ready(self) -> bool:
+        return all(stream.value in self.snapshot for stream in CORE_STREAMS)
+
+    def start(self) -> None:
+        """Subscribe to every telemetry stream, once."""
+        if self.running:
+            return
+
+        for name in self._streams():
+            self._tasks[name] = asyncio.create_task(
+                self._consume(name), name=f"telemetry-{name}"
+            )
+        logger.info(f"Telemetry engine subscribed to {', '.join(self._tasks)}")
+
+    async def stop(self) -> None:
+        """Cancel all stream subscriptions."""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        logger.info("Telemetry engine stopped")
+
+    async def _consume(self, name: str) -> None:
+        while True:
+            try:
+                # Looked up on every attempt, the plugins are replaced when
+                # mavsdk_server is restarted.
+                stream = self._streams()[name]
+                await self._set_rate(TelemetryStream(name))
+                async for value in stream():
+                    self.snapshot[name] = value
+                    self.record.update(name, value)
+                    self.timestamps[name] = time.monotonic()
+                    self._updated.set()
+                    for listener in self._listeners:
+                        listener(name, value)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Telemetry stream {name} failed: {e}")
+
+            await asyncio.sleep(self.retry_delay)
+
+    def age(self, name: str) -> float | None:
+        """
+        Seconds since the given stream last delivered a value.
+        Args:
+            name (str): The stream name, e.g. "position".
+        Returns:
+            float | None: The age in seconds, or None if nothing was received yet.
+        """
+        timestamp = self.timestamps.get(name)
+        if timestamp is None:
+            return None
+        return time.monotonic() - timestamp
+
+    def latest(self) -> TelemetryData | None:
+        """
+        Fuses the current snapshot into a TelemetryData object without waiting.
+        Returns:
+            TelemetryData | None: The latest telemetry, or None until every core stream has reported.
+        """
+        if not self._tasks or not self.ready:
+            return None
+
+        return fuse(self.snapshot)
+
+    def latest_record(self) -> TelemetryRecord | None:
+        """
+        The live telemetry record, updated in place on the event loop; encode it
+        or copy it there rather than keeping a reference.
+        Returns:
+            TelemetryRecord | None: The record, or None until every core stream has reported.
+        """
+        if not self._tasks or not self.record.ready:
+            return None
+
+        return self.record
+
+    async def wait_ready(self, timeout: float | None = None) -> TelemetryData:
+        """
+        Waits until every core stream has reported at least once.
+        Args:
+            timeout (float | None): Maximum seconds to wait, None to wait forever.
+        Returns:
+            TelemetryData: The first complete telemetry snapshot.
+        """
+
+        async def _wait() -> TelemetryData:
+            while (telemetry := self.latest()) is None:
+                self._updated.clear()
+                await self._updated.wait()
+            return telemetry
+
+        if not self._tasks:
+            raise RuntimeError("Telemetry engine is not started")
+
+        return await asyncio.wait_for(_wait(), timeout)
+
+    async def wait_for(
+        self, stream: TelemetryStream, timeout: float | None = None
+    ) -> Any:
+        """
+        Waits until a stream has reported, subscribing to it if needed.
+        Args:
+            stream (TelemetryStream): The stream.
+            timeout (float | None): Maximum seconds to wait, None to wait forever.
+        Returns:
+            Any: The latest MAVSDK value of the stream.
+        """
+
+        async def _wait() -> Any:
+            while stream.value not in self.snapshot:
+                self._updated.clear()
+                await self._updated.wait()
+            return self.snapshot[stream.value]
+
+        if not self._tasks:
+            raise RuntimeError("Telemetry engine is not started")
+
+        self.subscribe(stream)
+        return await asyncio.wait_for(_wait(), timeout)
+
+    async def frames(self, rate_hz: float) -> AsyncIterator[TelemetryData]:
+        """
+        Yields fused telemetry frames at a fixed rate. Missed ticks are skipped
+        instead of being emitted in a burst.
+        Args:
+            rate_hz (float): The frame rate in Hz.
+        """
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+
+        loop = asyncio.get_running_loop()
+        period: float = 1.0 / rate_hz
+        next_tick: float = loop.time()
+
+        while True:
+            telemetry = self.latest()
+            if telemetry is not None:
+                yield telemetry
+
+            next_tick += period
+            delay = next_tick - loop.time()
+            if delay < 0:
+                next_tick = loop.time()
+                delay = 0
+
+            await asyncio.sleep(delay)
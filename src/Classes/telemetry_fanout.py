@@ -0,0 +1,202 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import stat
+import struct
+
+from loguru import logger
+
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.telemetry_codec import TelemetryEncoder
+
+# Length of each frame on the Unix socket, which is a byte stream
+FRAME_LENGTH = struct.Struct("<H")
+
+
+def parse_group(spec: str | None) -> tuple[str, int] | None:
+    """
+    Parses a multicast group such as "239.255.76.1:14650".
+    Returns:
+        tuple | None: The group address and port, None if spec is empty.
+    Raises:
+        ValueError: If the group is not a multicast address and port.
+    """
+    if not spec:
+        return None
+    host, _, port = spec.rpartition(":")
+    try:
+        multicast = ipaddress.ip_address(host).is_multicast
+    except ValueError:
+        multicast = False
+    if not multicast or not port.isdigit():
+        raise ValueError(f"Invalid multicast group {spec}, expected address:port")
+    return host, int(port)
+
+
+class TelemetryFanout:
+    """
+    Serves the vehicle's telemetry to local consumers, onboard payload processes
+    or a tethered ground station, so they don't each open their own MAVSDK
+    stream against mavsdk_server.
+
+    The latest telemetry record is sampled at a fixed rate and encoded once per
+    frame with the compact codec, every frame a keyframe so any of them can be
+    decoded on its own. Frames are written, prefixed with their length, to
+    every client of a Unix domain socket, and sent as datagrams to a UDP
+    multicast group. Nothing waits on a subscriber: one whose unsent data
+    exceeds max_buffer_bytes skips frames until it catches up, as does the
+    multicast group while the socket's send buffer is full. Sequence numbers
+    let subscribers tell how many frames they missed.
+    """
+
+    def __init__(
+        self,
+        controller: MavsdkController,
+        socket_path: str | None = None,
+        multicast_group: tuple[str, int] | None = None,
+        rate_hz: float = 20.0,
+        max_buffer_bytes: int = 64 * 1024,
+        multicast_ttl: int = 1,
+        multicast_interface: str | None = None,
+        metrics: Metrics = metrics,
+    ) -> None:
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        if not socket_path and not multicast_group:
+            raise ValueError("A socket path or a multicast group is required")
+
+        self.controller: MavsdkController = controller
+        self.socket_path: str | None = socket_path
+        self.multicast_group: tuple[str, int] | None = multicast_group
+        self.rate_hz: float = rate_hz
+        self.max_buffer_bytes: int = max_buffer_bytes
+        self.multicast_ttl: int = multicast_ttl
+        # Address of the local interface to send from, the tether's for a
+        # ground station; None follows the routing table.
+        self.multicast_interface: str | None = multicast_interface
+
+        self.metrics: Metrics = metrics
+        self.sent: int = 0
+        self.dropped: int = 0
+
+        self._encoder = TelemetryEncoder(keyframe_interval=1)
+        self._subscribers: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.AbstractServer | None = None
+        self._multicast: socket.socket | None = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    async def run(self) -> None:
+        """Serves the subscribers until cancelled."""
+        try:
+            await self._open()
+            await self._broadcast()
+        finally:
+            await self._close()
+
+    async def _open(self) -> None:
+        if self.socket_path:
+            _remove_stale_socket(self.socket_path)
+            os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+            self._server = await asyncio.start_unix_server(
+                self._serve, path=self.socket_path
+            )
+            logger.info(f"Serving telemetry on {self.socket_path}")
+
+        if self.multicast_group:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(
+                socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.multicast_ttl
+            )
+            if self.multicast_interface:
+                sock.setsockopt(
+                    socket.IPPROTO_IP,
+                    socket.IP_MULTICAST_IF,
+                    socket.inet_aton(self.multicast_interface),
+                )
+            sock.setblocking(False)
+            self._multicast = sock
+            host, port = self.multicast_group
+            logger.info(f"Sending telemetry to multicast group {host}:{port}")
+
+    async def _close(self) -> None:
+        if self._server:
+            self._server.close()
+            self._server = None
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        if self.socket_path:
+            _remove_stale_socket(self.socket_path)
+        if self._multicast:
+            self._multicast.close()
+            self._multicast = None
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._subscribers.add(writer)
+        self.metrics.gauge("fanout.subscribers", len(self._subscribers))
+        logger.info(f"Telemetry subscriber connected, {len(self._subscribers)} total")
+        try:
+            # Subscribers only listen; reading is how their leaving is noticed.
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            self.metrics.gauge("fanout.subscribers", len(self._subscribers))
+            writer.close()
+            logger.info(
+                f"Telemetry subscriber disconnected, {len(self._subscribers)} left"
+            )
+
+    async def _broadcast(self) -> None:
+        while True:
+            if self._subscribers or self._multicast:
+                record = self.controller.telemetry_engine.latest_record()
+                if record is not None:
+                    self.publish(self._encoder.encode(record))
+            await asyncio.sleep(1.0 / self.rate_hz)
+
+    def publish(self, frame: bytes) -> None:
+        """Sends an encoded frame to every subscriber that keeps up."""
+        message: bytes = FRAME_LENGTH.pack(len(frame)) + frame
+        dropped: int = 0
+        for writer in self._subscribers:
+            transport = writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > self.max_buffer_bytes:
+                dropped += 1
+                continue
+            writer.write(message)
+
+        if self._multicast and self.multicast_group:
+            try:
+                self._multicast.sendto(frame, self.multicast_group)
+            except (BlockingIOError, InterruptedError):
+                dropped += 1
+            except OSError as e:
+                logger.debug(f"Failed to send telemetry to the multicast group: {e}")
+
+        self.sent += 1
+        if dropped:
+            self.dropped += dropped
+            self.metrics.increment("fanout.dropped", dropped)
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Removes a socket left by a previous run, refusing to delete anything else."""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.remove(path)
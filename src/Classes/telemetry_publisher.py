@@ -0,0 +1,162 @@
+import asyncio
+from typing import Callable
+
+from awscrt import mqtt5
+from loguru import logger
+
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.mqtt_base import IoTBaseClient
+from src.Classes.telemetry_batcher import TelemetryBatcher
+from src.Classes.telemetry_engine import CORE_STREAMS
+from src.Classes.telemetry_record import TelemetryRecord
+
+
+class TelemetryPublisher:
+    """
+    Samples the controller's telemetry record and publishes it at a target rate.
+
+    Sampling and sending run as separate tasks sharing a single pending slot, so
+    when the link is slower than the sample rate only the newest frame is sent.
+    The sample rate backs off while the MQTT outbound queue is congested and
+    recovers once it drains.
+
+    With a batcher, every sample is buffered instead and whole batches are
+    published once the batcher is ready.
+    """
+
+    def __init__(
+        self,
+        controller: MavsdkController,
+        client: IoTBaseClient,
+        topic: str,
+        rate_hz: float = 10.0,
+        min_rate_hz: float = 1.0,
+        max_queue_depth: int = 10,
+        encoder: Callable[[TelemetryRecord], str | bytes] | None = None,
+        batcher: TelemetryBatcher | None = None,
+        content_type: str | None = None,
+        metrics: Metrics = metrics,
+    ) -> None:
+        if rate_hz <= 0 or min_rate_hz <= 0 or min_rate_hz > rate_hz:
+            raise ValueError("Invalid telemetry publish rates")
+
+        self.controller: MavsdkController = controller
+        self.client: IoTBaseClient = client
+        self.topic: str = topic
+        self.target_rate_hz: float = rate_hz
+        self.min_rate_hz: float = min_rate_hz
+        self.rate_hz: float = rate_hz
+        self.max_queue_depth: int = max_queue_depth
+        self.encoder: Callable[[TelemetryRecord], str | bytes] = encoder or (
+            lambda record: record.to_model().model_dump_json(exclude_none=True)
+        )
+        self.batcher: TelemetryBatcher | None = batcher
+        self.content_type: str | None = content_type or (
+            None if encoder else "application/json"
+        )
+
+        self.metrics: Metrics = metrics
+        self.sent: int = 0
+        self.coalesced: int = 0
+
+        # The engine's live record, encoded when it is sent so the newest
+        # values go out.
+        self._pending: TelemetryRecord | None = None
+        self._frame_ready: asyncio.Event = asyncio.Event()
+
+    async def run(self) -> None:
+        """Run the sampling and sending tasks until cancelled."""
+        logger.info(f"Publishing telemetry to {self.topic} at {self.rate_hz} Hz")
+
+        tasks = [
+            asyncio.create_task(self._sample(), name="telemetry-sampler"),
+            asyncio.create_task(self._send(), name="telemetry-sender"),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _sample_age(self) -> float | None:
+        """Seconds since the stalest core stream reported, None until all have."""
+        ages: list[float] = []
+        for stream in CORE_STREAMS:
+            age: float | None = self.controller.telemetry_engine.age(stream.value)
+            if age is None:
+                return None
+            ages.append(age)
+        return max(ages)
+
+    async def _sample(self) -> None:
+        while True:
+            telemetry = self.controller.telemetry_engine.latest_record()
+            if telemetry is not None:
+                age: float | None = self._sample_age()
+                if age is not None:
+                    self.metrics.observe("telemetry.sample_age", age * 1000)
+            if telemetry is not None and self.batcher is not None:
+                self.batcher.append(telemetry)
+                if self.batcher.ready():
+                    self._frame_ready.set()
+            elif telemetry is not None:
+                if self._pending is not None:
+                    self.coalesced += 1
+                    self.metrics.increment("telemetry.coalesced")
+                self._pending = telemetry
+                self._frame_ready.set()
+
+            await asyncio.sleep(1.0 / self.rate_hz)
+
+    async def _send(self) -> None:
+        while True:
+            await self._frame_ready.wait()
+
+            # Hold back while the link is congested; the sampler keeps
+            # overwriting the pending frame so the newest one wins.
+            while (depth := self.client.outbound_queue_depth()) >= self.max_queue_depth:
+                self.metrics.gauge("mqtt.queue_depth", depth)
+                self._adapt_rate(congested=True)
+                await asyncio.sleep(1.0 / self.rate_hz)
+            self.metrics.gauge("mqtt.queue_depth", depth)
+
+            self._frame_ready.clear()
+            try:
+                if self.batcher is not None:
+                    if self.client.publish_batch(
+                        self.topic, self.batcher, content_type=self.content_type
+                    ):
+                        self.sent += 1
+                        self.metrics.increment("telemetry.sent")
+                else:
+                    telemetry, self._pending = self._pending, None
+                    if telemetry is None:
+                        continue
+
+                    self.client.publish(
+                        self.topic,
+                        self.encoder(telemetry),
+                        qos=mqtt5.QoS.AT_MOST_ONCE,
+                        content_type=self.content_type,
+                    )
+                    self.sent += 1
+                    self.metrics.increment("telemetry.sent")
+            except Exception as e:
+                logger.warning(f"Failed to publish telemetry: {e}")
+
+            self._adapt_rate(congested=False)
+
+    def _adapt_rate(self, congested: bool) -> None:
+        """Halve the sample rate on congestion, recover it additively otherwise."""
+        previous: float = self.rate_hz
+        if congested:
+            self.rate_hz = max(self.min_rate_hz, self.rate_hz / 2)
+        elif self.client.outbound_queue_depth() == 0:
+            self.rate_hz = min(
+                self.target_rate_hz, self.rate_hz + self.target_rate_hz * 0.1
+            )
+
+        if congested and self.rate_hz != previous:
+            logger.debug(f"Telemetry link congested, sampling at {self.rate_hz} Hz")
@@ -0,0 +1,120 @@
+from operator import attrgetter
+from typing import Any, Callable
+
+from src.Classes.telemetry_codec import CODES, FIELDS, STATUS_BITS
+from src.Enums.telemetry_stream import TelemetryStream
+from src.Models.telemetry_data import TelemetryData
+
+# MAVSDK attributes whose name differs from the TelemetryData field.
+SOURCE_ATTRIBUTES: dict[tuple[str, str], str] = {
+    ("wind", "north_m_s"): "wind_x_ned_m_s",
+    ("wind", "east_m_s"): "wind_y_ned_m_s",
+    ("wind", "down_m_s"): "wind_z_ned_m_s",
+}
+
+_STREAM_BITS: dict[str, int] = {
+    stream.value: 1 << index for index, stream in enumerate(TelemetryStream)
+}
+# Streams every frame needs, as in the telemetry engine.
+CORE_MASK: int = sum(
+    _STREAM_BITS[stream] for stream in ("position", "battery", "health", "in_air")
+)
+_IN_AIR_BIT: int = 1 << (len(STATUS_BITS) - 1)
+_HEALTH_GETTER = attrgetter(*STATUS_BITS[:-1])
+
+
+def _slots(stream: str) -> tuple[tuple[int, Callable[[Any], Any]], ...]:
+    """(record index, getter on the MAVSDK value) of each field of a stream."""
+    slots = []
+    for index, (model, field, _, _) in enumerate(FIELDS):
+        if (model or field) != stream:
+            continue
+        attribute: str = SOURCE_ATTRIBUTES.get((model, field), field)
+        if field in CODES:
+            # Enums are stored by name, the codec's code table is keyed by it.
+            attribute = f"{attribute}.name" if model else "name"
+        slots.append((index, attrgetter(attribute)))
+    return tuple(slots)
+
+
+_SLOTS: dict[str, tuple[tuple[int, Callable[[Any], Any]], ...]] = {
+    stream.value: _slots(stream.value)
+    for stream in TelemetryStream
+    if stream not in (TelemetryStream.HEALTH, TelemetryStream.IN_AIR)
+}
+
+
+class TelemetryRecord:
+    """
+    The latest telemetry as a flat, reused record: one slot per codec field,
+    None while its stream has not reported, and the health flags and in_air
+    as the codec's status bits. Updating it from a MAVSDK sample only stores
+    attributes, and the codec quantizes it directly, so the per-sample path
+    builds no pydantic models. to_model() gives the validated TelemetryData.
+    """
+
+    __slots__ = ("values", "status", "streams")
+
+    def __init__(self) -> None:
+        self.values: list[Any | None] = [None] * len(FIELDS)
+        self.status: int = 0
+        # Bitmask of the streams that have reported
+        self.streams: int = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether every core stream has reported."""
+        return self.streams & CORE_MASK == CORE_MASK
+
+    def update(self, stream: str, value: Any) -> None:
+        """
+        Stores a MAVSDK sample.
+        Args:
+            stream (str): The stream name, e.g. "position".
+            value (Any): The MAVSDK value of the stream.
+        """
+        self.streams |= _STREAM_BITS[stream]
+        if stream == "health":
+            status = self.status & _IN_AIR_BIT
+            for bit, flag in enumerate(_HEALTH_GETTER(value)):
+                if flag:
+                    status |= 1 << bit
+            self.status = status
+        elif stream == "in_air":
+            if value:
+                self.status |= _IN_AIR_BIT
+            else:
+                self.status &= ~_IN_AIR_BIT
+        else:
+            values = self.values
+            for index, getter in _SLOTS[stream]:
+                values[index] = getter(value)
+
+    def copy(self) -> "TelemetryRecord":
+        record = TelemetryRecord()
+        record.values = self.values.copy()
+        record.status, record.streams = self.status, self.streams
+        return record
+
+    def to_model(self) -> TelemetryData:
+        """
+        Builds the validated TelemetryData of the record, which must be ready.
+        Raises:
+            pydantic.ValidationError: If a value is invalid.
+        """
+        data: dict[str, Any] = {
+            "health": {
+                name: bool(self.status >> bit & 1)
+                for bit, name in enumerate(STATUS_BITS[:-1])
+            },
+            "in_air": bool(self.status & _IN_AIR_BIT),
+        }
+        for (model, field, _, _), value in zip(FIELDS, self.values):
+            if value is None:
+                continue
+            if model:
+                data.setdefault(model, {})[field] = value
+            else:
+                data[field] = value
+
+        return TelemetryData.model_validate(data)
@@ -0,0 +1,151 @@
+import asyncio
+
+from awsiot.iotjobs import JobExecutionData
+from loguru import logger
+
+from src.Classes.command_channel import CommandChannel
+from src.Classes.flight_recorder import FlightRecorder
+from src.Classes.job_scheduler import JobScheduler
+from src.Classes.mavsdk_controller import MavsdkController
+from src.Classes.metrics import Metrics, metrics
+from src.Classes.mqtt_jobs import IoTJobsClient
+from src.Classes.telemetry_fanout import TelemetryFanout
+from src.Classes.telemetry_publisher import TelemetryPublisher
+from src.Enums.job_status import JobStatus
+
+
+class VehicleAgent:
+    """
+    Everything the agent runs for one vehicle: its MAVSDK link, job stream and
+    scheduler, telemetry publisher, command channel, flight recorder and local
+    telemetry fan-out, and the metrics registry they record into. Agents share
+    the MQTT connections and the event loop, and never wait on each other.
+    """
+
+    def __init__(
+        self,
+        thing_name: str,
+        controller: MavsdkController,
+        jobs_client: IoTJobsClient,
+        scheduler: JobScheduler,
+        telemetry_publisher: TelemetryPublisher,
+        command_channel: CommandChannel | None = None,
+        recorder: FlightRecorder | None = None,
+        fanout: TelemetryFanout | None = None,
+        metrics: Metrics = metrics,
+    ) -> None:
+        self.thing_name: str = thing_name
+        self.controller: MavsdkController = controller
+        self.jobs_client: IoTJobsClient = jobs_client
+        self.scheduler: JobScheduler = scheduler
+        self.telemetry_publisher: TelemetryPublisher = telemetry_publisher
+        self.command_channel: CommandChannel | None = command_channel
+        self.recorder: FlightRecorder | None = recorder
+        self.fanout: TelemetryFanout | None = fanout
+        self.metrics: Metrics = metrics
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Connects to the vehicle and starts taking jobs."""
+        self.loop = asyncio.get_running_loop()
+        if self.recorder:
+            self.recorder.start()
+            self.controller.telemetry_engine.add_listener(self.recorder.record)
+        self._tasks = [
+            asyncio.create_task(
+                self.controller.connect(), name=f"{self.thing_name}-connect"
+            ),
+            asyncio.create_task(
+                self.telemetry_publisher.run(), name=f"{self.thing_name}-telemetry"
+            ),
+        ]
+        if self.fanout:
+            self._tasks.append(
+                asyncio.create_task(self.fanout.run(), name=f"{self.thing_name}-fanout")
+            )
+
+        if self.command_channel:
+            await self.command_channel.start()
+        self.jobs_client.open_streams(
+            self._next_job_handler, self._jobs_changed_handler
+        )
+        await self.jobs_client.refresh_cache()
+        # Accepted jobs wait in the queue while an interrupted one is settled.
+        self._tasks.append(
+            asyncio.create_task(self._run_jobs(), name=f"{self.thing_name}-jobs")
+        )
+        logger.info(f"Vehicle {self.thing_name} started")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self.command_channel:
+            await self.command_channel.stop()
+
+        await self.controller.disconnect()
+        self.jobs_client.disconnect()
+        if self.recorder:
+            await asyncio.to_thread(self.recorder.stop)
+
+    def _next_job_handler(self, execution: JobExecutionData) -> None:
+        """Jobs stream callback; hands the job off to the event loop so the CRT thread never blocks."""
+        if execution.status != JobStatus.QUEUED.value or self.loop is None:
+            return
+
+        self.loop.call_soon_threadsafe(self.scheduler.submit, execution)
+
+    def _jobs_changed_handler(self) -> None:
+        # Jobs already queued before start() are admitted by _run_jobs.
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._try_admit_queued_jobs(), self.loop)
+
+    async def _try_admit_queued_jobs(self) -> None:
+        try:
+            await self.admit_queued_jobs()
+        except Exception as e:
+            logger.error(f"Failed to admit queued jobs: {e}")
+
+    async def admit_queued_jobs(self) -> None:
+        """Accepts queued jobs, which notify-next does not announce while another job is in progress."""
+        for job in self.jobs_client.cache.queued_jobs():
+            if self.scheduler.queued >= self.scheduler.max_queued:
+                # The rest stay queued until the jobs change again.
+                break
+            if (
+                job.job_id in self.scheduler.jobs
+                or job.job_id in self.scheduler.rejected
+            ):
+                continue
+            execution = await self.jobs_client.get_job_execution(job.job_id)
+            # The cache may still list a job that has since started or finished.
+            if execution.status == JobStatus.QUEUED.value:
+                self.scheduler.submit(execution)
+
+    async def _run_jobs(self) -> None:
+        """Settles an interrupted job and admits queued ones, then runs the job queue."""
+        try:
+            await self.resume_in_progress_job()
+        except Exception as e:
+            logger.error(f"Failed to resume the in-progress job: {e}")
+        # The job streams only announce later changes, not jobs already queued.
+        await self._try_admit_queued_jobs()
+        await self.scheduler.run()
+
+    async def resume_in_progress_job(self) -> None:
+        """
+        Settles a job that was interrupted by an agent restart, using the cached
+        document, according to what the vehicle is doing: see JobScheduler.resume.
+        """
+        in_progress_job = await self.jobs_client.get_next_in_progress_job()
+        if not in_progress_job:
+            return
+
+        logger.info(f"Resuming in-progress job {in_progress_job.job_id}")
+        execution = await self.jobs_client.get_job_execution(in_progress_job.job_id)
+        await self.scheduler.resume(execution)
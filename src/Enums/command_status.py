@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class CommandStatus(Enum):
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    PREEMPTED = "PREEMPTED"
+    REJECTED = "REJECTED"
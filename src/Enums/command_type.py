@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class CommandType(Enum):
+    CANCEL = "cancel"
+    RTL = "rtl"
+    PAUSE = "pause"
+    RESUME = "resume"
+    GOTO = "goto"
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class JobPhase(Enum):
+    QUEUED = "QUEUED"
+    DOWNLOADING = "DOWNLOADING"
+    PREPARED = "PREPARED"
+    UPLOADING = "UPLOADING"
+    ARMED = "ARMED"
+    IN_FLIGHT = "IN_FLIGHT"
+    LANDED = "LANDED"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
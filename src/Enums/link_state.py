@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class LinkState(Enum):
+    DISCONNECTED = "DISCONNECTED"
+    CONNECTING = "CONNECTING"
+    CONNECTED = "CONNECTED"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SpoolEvictionPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class SpoolRecordType(Enum):
+    """Spooled record types, in drain priority order."""
+
+    JOB_UPDATE = "job_update"
+    TELEMETRY = "telemetry"
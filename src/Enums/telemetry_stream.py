@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class TelemetryStream(Enum):
+    POSITION = "position"
+    BATTERY = "battery"
+    HEALTH = "health"
+    IN_AIR = "in_air"
+    ATTITUDE = "attitude"
+    VELOCITY_NED = "velocity_ned"
+    GPS_INFO = "gps_info"
+    FLIGHT_MODE = "flight_mode"
+    RC_STATUS = "rc_status"
+    WIND = "wind"
+    DISTANCE_SENSOR = "distance_sensor"
+    LANDED_STATE = "landed_state"
@@ -0,0 +1,27 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.Enums.command_status import CommandStatus
+from src.Enums.command_type import CommandType
+
+
+class Command(BaseModel):
+    """A command in its compact wire form, e.g. {"i": "42", "c": "goto", "t": 1700000000000, "p": [47.39, 8.54, 500]}."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field("", alias="i")
+    type: CommandType = Field(alias="c")
+    sent_at_ms: Optional[int] = Field(None, alias="t")
+    params: List[float] = Field([], alias="p")
+
+
+class CommandAck(BaseModel):
+    id: str
+    type: CommandType
+    status: CommandStatus
+    detail: Optional[str] = None
+    queued_ms: float
+    execution_ms: float
+    latency_ms: Optional[float] = None
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -6,6 +6,7 @@ class Input(BaseModel):
     handler: str
     args: List[str]
     path: str
+    sha256: Optional[str] = None
 
 
 class Action(BaseModel):
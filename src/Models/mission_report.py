@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class MissionReport(BaseModel):
+    waypoints: int
+    removed_waypoints: int = 0
+    path_length_m: float = 0.0
+    max_distance_m: float = 0.0
+    max_altitude_m: float = 0.0
+    estimated_flight_time_s: float = 0.0
+    estimated_energy_wh: float = 0.0
+    available_energy_wh: Optional[float] = None
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    @property
+    def feasible(self) -> bool:
+        return not self.errors
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
@@ -28,8 +28,48 @@ class Health(BaseModel):
     is_armable: bool
 
 
+class Attitude(BaseModel):
+    roll_deg: float
+    pitch_deg: float
+    yaw_deg: float
+
+
+class VelocityNed(BaseModel):
+    north_m_s: float
+    east_m_s: float
+    down_m_s: float
+
+
+class GpsInfo(BaseModel):
+    num_satellites: int
+    fix_type: str
+
+
+class RcStatus(BaseModel):
+    is_available: bool
+    signal_strength_percent: float
+
+
+class Wind(BaseModel):
+    north_m_s: float
+    east_m_s: float
+    down_m_s: float
+
+
+class DistanceSensor(BaseModel):
+    current_distance_m: float
+
+
 class TelemetryData(BaseModel):
     position: Position
     battery: Battery
     health: Health
     in_air: bool
+    # Optional streams, None unless enabled in the telemetry engine
+    attitude: Optional[Attitude] = None
+    velocity_ned: Optional[VelocityNed] = None
+    gps_info: Optional[GpsInfo] = None
+    flight_mode: Optional[str] = None
+    rc_status: Optional[RcStatus] = None
+    wind: Optional[Wind] = None
+    distance_sensor: Optional[DistanceSensor] = None
@@ -0,0 +1,14 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class VehicleConfig(BaseModel):
+    thing_name: str
+    address: str
+    port: int
+    connection_type: str = "udpin"
+    server_address: Optional[str] = None
+    server_port: Optional[int] = None
+    # Stream list as in TELEMETRY_STREAMS, overriding it for this vehicle
+    telemetry_streams: Optional[str] = None
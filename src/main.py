@@ -1,35 +1,33 @@
+from __future__ import annotations
+
 import asyncio
-import base64
+import json
+import os
 import time
-
-import cbor2
-from loguru import logger
 from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable
 
 import dotenv
+from loguru import logger
 
-from src.Classes.mavsdk_controller import MavsdkController
-from src.Models.telemetry_data import TelemetryData, Battery, Position, Health
-from src.utils.download_handler import handle_download
-
-from awsiot.iotjobs import JobExecutionSummary
-
+from src.Classes.disk_spool import DiskSpool
 from src.Classes.mqtt_base import IoTBaseClient
-from src.Classes.mqtt_jobs import IoTJobsClient
-from awscrt import io
-
-from rich.traceback import install
+from src.Enums.spool_eviction_policy import SpoolEvictionPolicy
+from src.Models.vehicle_config import VehicleConfig
 
-from src.Enums.job_status import JobStatus
-from src.Models.job_document import Job
-from src.utils.zip_manager import extract_mission
+# The vehicle side (mavsdk and its gRPC stack, numpy, awsiot, rich) is
+# imported where it is first used, once the MQTT connection is on its way.
+if TYPE_CHECKING:
+    from src.Classes.bundle_cache import BundleCache
+    from src.Classes.mission_validator import MissionValidator
+    from src.Classes.mqtt_jobs import IoTJobsClient
+    from src.Classes.vehicle_agent import VehicleAgent
 
 # DEBUG
+# from awscrt import io
 # io.init_logging(io.LogLevel.Trace, "stderr")
 # DEBUG
 
-install()
-
 config: dict[str, str | None] = dotenv.dotenv_values(".config.env")
 thing_name: str = config["IOT_THING_NAME"]
 
@@ -37,109 +35,266 @@ internal_topic = f"$aws/things/{thing_name}/jobs/notify"
 cancel_topic = f"groups/{thing_name}/cancel"
 telemetry_topic = f"devices/{thing_name}/telemetry"
 
-in_execution = False
-
-system: MavsdkController = MavsdkController(
-    config["DRONE_ADDRESS"], int(config["DRONE_PORT"]), config["DRONE_CONNECTION_TYPE"]
-)
-
-loop = None
-
-
-def job_handler(topic, payload, **_):
-    async def drone_executor():
-        await system.connect()
-        await system.upload_mission(mission_plan_file, return_to_launch=True)
-
-        await system.arm()
-        await system.start_mission()
-
-        await system.subscribe_mission_finished(handle_mission_end)
 
-    def handle_mission_end():
-        jobs_client.update_job(next_job_id, JobStatus.SUCCEEDED)
-
-        global in_execution
-        in_execution = False
-
-    next_queued_job: JobExecutionSummary = jobs_client.get_next_queued_job()
-    if not next_queued_job:
-        logger.debug("No next queued job")
-        return
-
-    next_job_id: str = next_queued_job.job_id
-
-    global in_execution
-    if in_execution:
-        logger.warning(
-            f"Job already in action, rejecting next job with ID {next_job_id}"
+def load_vehicles() -> list[VehicleConfig]:
+    """
+    Reads the vehicles from the JSON list in VEHICLES_FILE, or falls back to the
+    single vehicle described by IOT_THING_NAME and the DRONE_* settings.
+    """
+    vehicles_file = config.get("VEHICLES_FILE")
+    if vehicles_file:
+        with open(vehicles_file) as file:
+            return [VehicleConfig.model_validate(v) for v in json.load(file)]
+
+    return [
+        VehicleConfig(
+            thing_name=thing_name,
+            address=config["DRONE_ADDRESS"],
+            port=int(config["DRONE_PORT"]),
+            connection_type=config["DRONE_CONNECTION_TYPE"],
+            server_address=config.get("MAVSDK_SERVER_ADDRESS") or None,
+            server_port=int(config.get("MAVSDK_SERVER_PORT") or 50051),
         )
-        jobs_client.update_job(next_job_id, JobStatus.REJECTED)
-        return
+    ]
+
+
+def build_agent(
+    vehicle: VehicleConfig,
+    index: int,
+    jobs_client: IoTJobsClient,
+    basic_client: IoTBaseClient,
+    bundle_cache: BundleCache | None,
+    validator: MissionValidator,
+    recorder_dir: str | None = None,
+    log_dir: str | None = None,
+) -> VehicleAgent:
+    """Creates the controller, scheduler and telemetry services of one vehicle."""
+    from src.Classes.command_channel import CommandChannel
+    from src.Classes.flight_recorder import FlightRecorder
+    from src.Classes.job_scheduler import JobScheduler
+    from src.Classes.log_retriever import LogRetriever
+    from src.Classes.mavsdk_controller import MavsdkController
+    from src.Classes.metrics import Metrics
+    from src.Classes.telemetry_batcher import TelemetryBatcher
+    from src.Classes.telemetry_codec import (
+        CONTENT_TYPE as TELEMETRY_CONTENT_TYPE,
+        TelemetryEncoder,
+    )
+    from src.Classes.telemetry_engine import parse_streams
+    from src.Classes.telemetry_fanout import TelemetryFanout, parse_group
+    from src.Classes.telemetry_publisher import TelemetryPublisher
+    from src.Classes.vehicle_agent import VehicleAgent
+
+    # Each vehicle's figures are kept and published apart.
+    metrics = Metrics()
+    controller = MavsdkController(
+        vehicle.address,
+        vehicle.port,
+        vehicle.connection_type,
+        server_address=vehicle.server_address,
+        # Each vehicle needs its own mavsdk_server port.
+        server_port=vehicle.server_port or 50051 + index,
+        telemetry_streams=parse_streams(
+            vehicle.telemetry_streams or config.get("TELEMETRY_STREAMS")
+        ),
+        metrics=metrics,
+    )
+    if vehicle.thing_name != jobs_client.thing_name:
+        jobs_client = jobs_client.for_thing(vehicle.thing_name, metrics)
     else:
-        in_execution = True
+        jobs_client.metrics = metrics
 
-    job_description = jobs_client.describe_job_execution(next_job_id)
-    document: Job | None = jobs_client.get_job_documents(job_description)
+    batch_frames = int(config.get("TELEMETRY_BATCH_FRAMES") or 0)
+    telemetry_batcher: TelemetryBatcher | None = (
+        TelemetryBatcher(
+            max_frames=batch_frames,
+            max_latency_ms=int(config.get("TELEMETRY_BATCH_MS") or 5000),
+        )
+        if batch_frames > 0
+        else None
+    )
+    telemetry_publisher = TelemetryPublisher(
+        controller,
+        basic_client,
+        f"devices/{vehicle.thing_name}/telemetry",
+        rate_hz=float(config.get("TELEMETRY_RATE_HZ") or 10),
+        encoder=TelemetryEncoder(
+            keyframe_interval=int(config.get("TELEMETRY_KEYFRAME_INTERVAL") or 50)
+        ).encode,
+        batcher=telemetry_batcher,
+        content_type=TELEMETRY_CONTENT_TYPE,
+        metrics=metrics,
+    )
 
-    if document and document.steps[0].action.name == "Download-File":
+    download_kbps = int(config.get("DOWNLOAD_MAX_KBPS") or 0)
+    scheduler = JobScheduler(
+        jobs_client,
+        controller,
+        vehicle.thing_name,
+        max_queued=int(config.get("JOB_QUEUE_SIZE") or 1),
+        download_bytes_per_second=download_kbps * 1024 if download_kbps else None,
+        bundle_cache=bundle_cache,
+        validator=validator,
+        progress_interval=float(config.get("MISSION_PROGRESS_INTERVAL_S") or 5),
+        stall_timeout=float(config.get("MISSION_STALL_TIMEOUT_S") or 120),
+        metrics=metrics,
+    )
+    command_channel = CommandChannel(
+        controller, basic_client, scheduler, vehicle.thing_name
+    )
 
-        status: int
-        path: str
-        status, path = handle_download(
-            document.steps[0].action.input.args[0],
-            document.steps[0].action.input.args[1],
+    recorder: FlightRecorder | None = None
+    recorder_mb = int(config.get("FDR_MAX_MB") or 1024)
+    if recorder_dir and recorder_mb > 0:
+        recorder = FlightRecorder(
+            os.path.join(recorder_dir, vehicle.thing_name),
+            max_file_bytes=int(config.get("FDR_FILE_MB") or 64) * 1024 * 1024,
+            max_bytes=recorder_mb * 1024 * 1024,
         )
+        scheduler.register_action("Upload-Flight-Data", recorder.upload_job)
+    if log_dir:
+        log_retriever = LogRetriever(
+            controller,
+            os.path.join(log_dir, vehicle.thing_name),
+            workers=int(config.get("LOG_UPLOAD_WORKERS") or 4),
+        )
+        scheduler.register_action("Upload-Log", log_retriever.upload_job)
+
+    # Local telemetry for onboard processes and a tethered ground station; with
+    # several vehicles each gets its own socket and multicast port.
+    fanout: TelemetryFanout | None = None
+    fanout_dir = config.get("FANOUT_SOCKET_DIR")
+    multicast_group = parse_group(config.get("FANOUT_MULTICAST_GROUP"))
+    if fanout_dir or multicast_group:
+        fanout = TelemetryFanout(
+            controller,
+            socket_path=(
+                os.path.join(fanout_dir, f"{vehicle.thing_name}.sock")
+                if fanout_dir
+                else None
+            ),
+            multicast_group=(
+                (multicast_group[0], multicast_group[1] + index)
+                if multicast_group
+                else None
+            ),
+            rate_hz=float(config.get("FANOUT_RATE_HZ") or 20),
+            multicast_ttl=int(config.get("FANOUT_MULTICAST_TTL") or 1),
+            multicast_interface=config.get("FANOUT_MULTICAST_INTERFACE") or None,
+            metrics=metrics,
+        )
+    return VehicleAgent(
+        vehicle.thing_name,
+        controller,
+        jobs_client,
+        scheduler,
+        telemetry_publisher,
+        command_channel,
+        recorder,
+        fanout,
+        metrics,
+    )
 
-        if status == 0:
-            logger.info("Download succeeded..")
 
-            mission_plan_file: str = extract_mission(
-                path, thing_name, document.steps[0].action.input.args[1]
+async def timed(name: str, operation: Awaitable, timings: dict[str, float]):
+    """Awaits an operation and records how long it took."""
+    started: float = time.perf_counter()
+    try:
+        return await operation
+    finally:
+        timings[name] = time.perf_counter() - started
+
+
+async def start_agents(
+    agents: list[VehicleAgent],
+    basic_client: IoTBaseClient,
+    timings: dict[str, float],
+    link_timeout: float,
+) -> None:
+    """
+    Starts the agents as soon as the MQTT connection is up, while the vehicle
+    links come up alongside. Returns once both are done; a vehicle whose link
+    is not up within link_timeout keeps connecting in the background.
+    """
+
+    async def start() -> None:
+        await timed(
+            "mqtt_connect", asyncio.to_thread(basic_client.wait_connected, 30), timings
+        )
+        # Vehicles start concurrently; one that fails to start doesn't stop the others.
+        results = await timed(
+            "agents_start",
+            asyncio.gather(
+                *(agent.start() for agent in agents), return_exceptions=True
+            ),
+            timings,
+        )
+        for agent, result in zip(agents, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to start vehicle {agent.thing_name}: {result}")
+
+    await asyncio.gather(
+        start(),
+        *(
+            timed(
+                f"link_{agent.thing_name}",
+                agent.controller.connect(timeout=link_timeout),
+                timings,
             )
+            for agent in agents
+        ),
+    )
 
-            asyncio.run_coroutine_threadsafe(drone_executor(), loop)
-            return
-        else:
-            logger.warning("Download failed, cancelling execution..")
-            jobs_client.update_job(next_job_id, JobStatus.FAILED)
-            in_execution = False
-
-            return
-
-    else:
-        logger.warning(
-            f"Unknown or invalid job document in job {next_job_id}, rejecting..."
-        )
-        jobs_client.update_job(next_job_id, JobStatus.REJECTED)
-        in_execution = False
 
-        return
+def process_age() -> float | None:
+    """Seconds since this process was started, None where /proc is not available."""
+    try:
+        with open("/proc/self/stat") as stat, open("/proc/uptime") as uptime:
+            # The fields after the command name, which may contain spaces
+            started_ticks = int(stat.read().rpartition(")")[2].split()[19])
+            return float(uptime.read().split()[0]) - started_ticks / os.sysconf(
+                "SC_CLK_TCK"
+            )
+    except (OSError, ValueError, IndexError):
+        return None
 
 
 if __name__ == "__main__":
+    timings: dict[str, float] = {}
+    boot: float | None = process_age()
+    if boot is not None:
+        timings["boot"] = boot
+    started: float = time.perf_counter()
+
     base_dir = Path(__file__).resolve().parent
     certs = base_dir.parent / "certs"
 
-    jobs_client = IoTJobsClient(
-        cert_filepath=str(certs / "test1.cert.pem"),
-        pri_key_filepath=str(certs / "test1.private.key"),
-        thing_name=thing_name,
+    spool = DiskSpool(
+        config.get("SPOOL_DIR") or str(base_dir.parent / "spool"),
+        max_bytes=int(config.get("SPOOL_MAX_MB") or 64) * 1024 * 1024,
+        eviction=SpoolEvictionPolicy(config.get("SPOOL_EVICTION") or "drop_oldest"),
     )
 
+    vehicles: list[VehicleConfig] = load_vehicles()
+
+    # Jobs and telemetry share a single MQTT5 connection.
     basic_client = IoTBaseClient(
         cert_filepath=str(certs / "test1.cert.pem"),
         pri_key_filepath=str(certs / "test1.private.key"),
         ca_filepath=str(certs / "root-CA.crt"),
+        spool=spool,
     )
+    # The TLS handshake runs on CRT threads while the vehicle side is imported
+    # and built.
+    basic_client.start()
+    build_started: float = time.perf_counter()
 
-    jobs_client.connect()
-    basic_client.connect()
-
-    # basic_client.subscribe(internal_topic, job_handler)
+    from src.Classes.bundle_cache import BundleCache
+    from src.Classes.metrics import MetricsReporter
+    from src.Classes.mission_validator import MissionValidator
+    from src.Classes.mqtt_jobs import IoTJobsClient
 
-    # TODO: Implement cancel job logic
-    # basic_client.subscribe(cancel_topic)
+    jobs_client = IoTJobsClient(basic_client, thing_name, max_things=len(vehicles))
 
     # basic_client.subscribe(
     #     f"devices/{thing_name}/messages",
@@ -148,6 +303,86 @@ if __name__ == "__main__":
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
+    bundle_cache_mb = int(config.get("BUNDLE_CACHE_MAX_MB") or 512)
+    bundle_cache = (
+        BundleCache(
+            config.get("BUNDLE_CACHE_DIR") or str(base_dir.parent / "bundle_cache"),
+            max_bytes=bundle_cache_mb * 1024 * 1024,
+        )
+        if bundle_cache_mb > 0
+        else None
+    )
+    max_distance_m = float(config.get("MISSION_MAX_DISTANCE_M") or 0)
+    battery_capacity_wh = float(config.get("BATTERY_CAPACITY_WH") or 0)
+    validator = MissionValidator(
+        max_altitude_m=float(config.get("MISSION_MAX_ALTITUDE_M") or 120),
+        max_distance_m=max_distance_m or None,
+        cruise_speed_mps=float(config.get("MISSION_CRUISE_SPEED_MPS") or 10),
+        cruise_power_w=float(config.get("MISSION_CRUISE_POWER_W") or 300),
+        battery_capacity_wh=battery_capacity_wh or None,
+        reserve_percent=float(config.get("BATTERY_RESERVE_PERCENT") or 20),
+    )
+
+    agents: list[VehicleAgent] = [
+        build_agent(
+            vehicle,
+            index,
+            jobs_client,
+            basic_client,
+            bundle_cache,
+            validator,
+            recorder_dir=config.get("FDR_DIR") or str(base_dir.parent / "flight_data"),
+            log_dir=config.get("LOG_DIR") or str(base_dir.parent / "flight_logs"),
+        )
+        for index, vehicle in enumerate(vehicles)
+    ]
+    timings["build"] = time.perf_counter() - build_started
+
+    loop.run_until_complete(
+        start_agents(
+            agents,
+            basic_client,
+            timings,
+            link_timeout=float(config.get("VEHICLE_LINK_TIMEOUT_S") or 10),
+        )
+    )
+    timings["ready"] = time.perf_counter() - started + timings.get("boot", 0)
+    logger.info(
+        "Startup: "
+        + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in timings.items())
+    )
+    # Process-wide timings go to every vehicle, link times to their own.
+    for agent in agents:
+        for name, seconds in timings.items():
+            if name == f"link_{agent.thing_name}":
+                name = "link"
+            elif name.startswith("link_"):
+                continue
+            agent.metrics.gauge(f"startup.{name}", seconds * 1000)
+
+    # Rich tracebacks only matter once something fails, so they are installed
+    # off the startup path.
+    from rich.traceback import install
+
+    install()
+
+    metrics_interval = float(config.get("METRICS_INTERVAL_S") or 60)
+    metrics_tasks: list[asyncio.Task] = (
+        [
+            loop.create_task(
+                MetricsReporter(
+                    basic_client,
+                    f"devices/{agent.thing_name}/metrics",
+                    metrics_interval,
+                    agent.metrics,
+                ).run()
+            )
+            for agent in agents
+        ]
+        if metrics_interval > 0
+        else []
+    )
+
     try:
         while True:
             loop.run_until_complete(asyncio.sleep(1))
@@ -157,6 +392,12 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(e)
     finally:
+        loop.run_until_complete(
+            asyncio.gather(*(agent.stop() for agent in agents), return_exceptions=True)
+        )
+        for task in metrics_tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*metrics_tasks, return_exceptions=True))
         loop.close()
-        jobs_client.disconnect()
         basic_client.disconnect()
+        spool.close()
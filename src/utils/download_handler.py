@@ -1,25 +1,119 @@
+import asyncio
+import hashlib
+import http.client
 import os
+import time
+import urllib.error
 import urllib.request
+from typing import Callable
+
 from loguru import logger
 
+from src.Classes.metrics import Metrics, metrics
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
 
-def download_file(url: str, path: str) -> None:
+def _hash_file(path: str):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher
+
+
+def download_file(
+    url: str,
+    path: str,
+    max_bytes_per_second: int | None = None,
+    progress: Callable[[int, int | None], None] | None = None,
+    timeout: float = 30,
+) -> str:
     """
-    Download file from url to path.
+    Stream a file from url into path + ".part", resuming a previous partial download
+    with an HTTP Range request.
     Args:
         url (str): The url to download the file from.
         path (str): The path to save the file to.
+        max_bytes_per_second (int | None): Bandwidth limit, None for unlimited.
+        progress (Callable | None): Called with (bytes downloaded, total bytes or None).
+        timeout (float): Socket timeout in seconds.
+    Returns:
+        str: The SHA-256 hex digest of the complete file.
     """
-    if path.endswith("/"):
-        path = path + "mission.bundle.zip"
-    else:
-        path = path + "/mission.bundle.zip"
+    part_path: str = path + ".part"
+    offset: int = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset:
+            # The partial file already holds the whole object.
+            os.replace(part_path, path)
+            return _hash_file(path).hexdigest()
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            logger.warning("Server ignored the range request, restarting download")
+            offset = 0
+
+        hasher = _hash_file(part_path) if offset else hashlib.sha256()
+        length = response.headers.get("Content-Length")
+        total: int | None = offset + int(length) if length else None
+        if offset:
+            logger.info(f"Resuming download of {url} at byte {offset}")
+
+        done: int = offset
+        started: float = time.monotonic()
+        with open(part_path, "ab" if offset else "wb") as file:
+            while chunk := response.read(CHUNK_SIZE):
+                file.write(chunk)
+                hasher.update(chunk)
+                done += len(chunk)
+
+                if progress:
+                    progress(done, total)
 
+                if max_bytes_per_second:
+                    ahead = (done - offset) / max_bytes_per_second - (
+                        time.monotonic() - started
+                    )
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+    if total is not None and done != total:
+        raise DownloadError(f"Download ended at byte {done} of {total}")
+
+    os.replace(part_path, path)
+    return hasher.hexdigest()
+
+
+def fetch_etag(url: str, timeout: float = 10) -> str | None:
+    """
+    Fetch the ETag of a remote file without downloading it. A single-byte range
+    GET is used instead of HEAD because presigned URLs are only valid for GET.
+    Args:
+        url (str): The url of the file.
+        timeout (float): Socket timeout in seconds.
+    Returns:
+        str | None: The ETag, or None if the server did not provide one.
+    """
+    request = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
     try:
-        urllib.request.urlretrieve(url, path)
-        logger.info(f"Downloading to path {path}")
-    except Exception as e:
-        logger.error(f"Couldn't download file: {e}")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.headers.get("ETag")
+    except (OSError, http.client.HTTPException) as e:
+        logger.warning(f"Couldn't fetch ETag of {url}: {e}")
+        return None
 
 
 def ensure_dir(path: str) -> None:
@@ -34,30 +128,84 @@ def ensure_dir(path: str) -> None:
         os.makedirs(directory)
 
 
-def handle_download(url: str, path: str) -> tuple[int, str]:
+async def handle_download(
+    url: str,
+    path: str,
+    sha256: str | None = None,
+    max_bytes_per_second: int | None = None,
+    progress: Callable[[int, int | None], None] | None = None,
+    attempts: int = 5,
+    metrics: Metrics = metrics,
+) -> tuple[int, str]:
     """
-    Handle the file download process.
+    Handle the file download process, retrying interrupted transfers from where they stopped.
     Args:
         url (str): The url to download the file from.
         path (str): The path to save the file to.
+        sha256 (str | None): Expected SHA-256 hex digest of the file.
+        max_bytes_per_second (int | None): Bandwidth limit, None for unlimited.
+        progress (Callable | None): Called from a worker thread with (bytes downloaded, total bytes or None).
+        attempts (int): Maximum number of attempts.
+        metrics (Metrics): The registry the download is recorded in.
     Returns:
         tuple: 0 if the process is successful, 1 otherwise, and the path to the saved file.
     """
+    with metrics.timer("download"):
+        status, saved = await _download_with_retries(
+            url, path, sha256, max_bytes_per_second, progress, attempts, metrics
+        )
+    if status == 0:
+        metrics.increment("download.bytes", os.path.getsize(saved))
+    else:
+        metrics.increment("download.errors")
+    return status, saved
+
+
+async def _download_with_retries(
+    url: str,
+    path: str,
+    sha256: str | None,
+    max_bytes_per_second: int | None,
+    progress: Callable[[int, int | None], None] | None,
+    attempts: int,
+    metrics: Metrics,
+) -> tuple[int, str]:
     if path.startswith("/tmp"):
         ensure_dir(path)
     else:
         logger.error("Cannot download to a directory other than /tmp")
         return 1, ""
 
-    try:
-        download_file(url, path)
+    if path.endswith("/"):
+        path = path + "mission.bundle.zip"
+    else:
+        path = path + "/mission.bundle.zip"
+
+    for attempt in range(1, attempts + 1):
+        try:
+            logger.info(f"Downloading to path {path}")
+            digest: str = await asyncio.to_thread(
+                download_file, url, path, max_bytes_per_second, progress
+            )
+        except (OSError, http.client.HTTPException, DownloadError) as e:
+            if isinstance(e, urllib.error.HTTPError) and e.code in range(400, 500):
+                if e.code not in (408, 429):
+                    logger.error(f"Couldn't download file: {e}")
+                    return 1, ""
+            logger.warning(f"Download attempt {attempt}/{attempts} failed: {e}")
+            metrics.increment("download.retries")
+            if attempt < attempts:
+                await asyncio.sleep(min(2**attempt, 30))
+            continue
 
-        if path.endswith("/"):
-            path = path + "mission.bundle.zip"
-        else:
-            path = path + "/mission.bundle.zip"
+        if sha256 and digest != sha256.lower():
+            logger.error(
+                f"Checksum mismatch for {path}: expected {sha256}, got {digest}"
+            )
+            os.remove(path)
+            return 1, ""
 
         return 0, path
-    except Exception as e:
-        logger.error(f"Couldn't download file: {e}")
-        return 1, ""
+
+    logger.error(f"Couldn't download file after {attempts} attempts")
+    return 1, ""
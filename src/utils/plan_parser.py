@@ -0,0 +1,221 @@
+import json
+import math
+from typing import Iterator, TextIO
+
+from mavsdk.mission_raw import MissionItem
+
+CHUNK_SIZE = 64 * 1024
+
+# MAV_FRAME values of the global frames and their integer-coordinate variants.
+GLOBAL_INT_FRAMES: dict[int, int] = {
+    0: 5,  # GLOBAL -> GLOBAL_INT
+    3: 6,  # GLOBAL_RELATIVE_ALT -> GLOBAL_RELATIVE_ALT_INT
+    10: 11,  # GLOBAL_TERRAIN_ALT -> GLOBAL_TERRAIN_ALT_INT
+    5: 5,
+    6: 6,
+    11: 11,
+}
+MISSION_TYPE_MISSION = 0
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class PlanParseError(Exception):
+    pass
+
+
+class _PlanReader:
+    """
+    Pulls JSON values out of a text stream one at a time, keeping only the
+    value being decoded in memory.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream: TextIO = stream
+        self.buffer: str = ""
+        self.pos: int = 0
+        self.eof: bool = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+
+        # Read at least as much as is buffered so a large value is decoded in
+        # a logarithmic number of attempts.
+        chunk: str = self.stream.read(max(CHUNK_SIZE, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, '' at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found: str = self.peek()
+        if found != char:
+            raise PlanParseError(f"Expected {char!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise PlanParseError(f"Invalid plan: {e}") from e
+
+            # A number cut off at the end of the buffer decodes successfully.
+            if end == len(self.buffer) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Iterates over the keys of an object, leaving each value to the caller."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise PlanParseError("Expected an object key")
+            self.expect(":")
+            yield key
+
+            separator: str = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise PlanParseError(f"Expected ',' or '}}', found {separator!r}")
+
+    def elements(self) -> Iterator:
+        """Iterates over the decoded elements of an array."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+
+            separator: str = self.peek()
+            self.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise PlanParseError(f"Expected ',' or ']', found {separator!r}")
+
+
+def _param(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _simple_items(item: dict) -> Iterator[dict]:
+    item_type = item.get("type")
+    if item_type == "SimpleItem":
+        yield item
+    elif item_type == "ComplexItem":
+        transect = item.get("TransectStyleComplexItem")
+        if not transect or "Items" not in transect:
+            raise PlanParseError(
+                f"Unsupported complex item {item.get('complexItemType')!r}"
+            )
+        for child in transect["Items"]:
+            yield from _simple_items(child)
+    else:
+        raise PlanParseError(f"Unknown mission item type {item_type!r}")
+
+
+def to_mission_item(item: dict, seq: int) -> MissionItem:
+    """
+    Converts a QGroundControl SimpleItem into a raw MAVLink mission item.
+    Global frames are converted to their integer variants with the latitude
+    and longitude in degrees * 1e7, like the MAVSDK importer does.
+    """
+    try:
+        params: list = item["params"]
+        frame: int = int(item["frame"])
+        command: int = int(item["command"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise PlanParseError(f"Invalid mission item {seq}: {e}") from e
+    if len(params) != 7:
+        raise PlanParseError(f"Mission item {seq} has {len(params)} params, not 7")
+
+    x, y = _param(params[4]), _param(params[5])
+    if frame in GLOBAL_INT_FRAMES:
+        frame = GLOBAL_INT_FRAMES[frame]
+        x, y = x * 1e7, y * 1e7
+
+    return MissionItem(
+        seq,
+        frame,
+        command,
+        1 if seq == 0 else 0,
+        1 if item.get("autoContinue", True) else 0,
+        _param(params[0]),
+        _param(params[1]),
+        _param(params[2]),
+        _param(params[3]),
+        0 if math.isnan(x) else round(x),
+        0 if math.isnan(y) else round(y),
+        _param(params[6]),
+        MISSION_TYPE_MISSION,
+    )
+
+
+def iter_plan_items(stream: TextIO) -> Iterator[MissionItem]:
+    """
+    Incrementally parses a QGroundControl .plan file, yielding its mission
+    items as they are read. Only one top-level mission item is held in memory
+    at a time, so plans with thousands of waypoints can be validated as they
+    stream in.
+    Args:
+        stream (TextIO): The plan file.
+    Raises:
+        PlanParseError: If the file is not a valid plan.
+    """
+    reader = _PlanReader(stream)
+    seq: int = 0
+    for key in reader.members():
+        if key == "fileType":
+            file_type = reader.value()
+            if file_type != "Plan":
+                raise PlanParseError(f"Not a plan file: {file_type!r}")
+        elif key == "mission":
+            for mission_key in reader.members():
+                if mission_key != "items":
+                    reader.value()
+                    continue
+                for item in reader.elements():
+                    for simple_item in _simple_items(item):
+                        yield to_mission_item(simple_item, seq)
+                        seq += 1
+        else:
+            reader.value()
+
+    if reader.peek():
+        raise PlanParseError("Unexpected data after the plan")
+
+
+def parse_plan(stream: TextIO) -> list[MissionItem]:
+    """Parses all mission items of a QGroundControl .plan file."""
+    return list(iter_plan_items(stream))
@@ -0,0 +1,193 @@
+import http.client
+import json
+import math
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+from loguru import logger
+
+
+class UploadError(Exception):
+    pass
+
+
+def upload_file(
+    url: str, path: str, content_type: str | None = None, timeout: float = 60
+) -> int:
+    """
+    Upload a file with a single HTTP PUT, e.g. to a presigned S3 URL. The file
+    is streamed from disk instead of being read into memory.
+    Args:
+        url (str): The url to upload the file to.
+        path (str): The path of the file.
+        content_type (str | None): The Content-Type header, if any.
+        timeout (float): Socket timeout in seconds.
+    Returns:
+        int: The number of bytes uploaded.
+    Raises:
+        UploadError: If the server did not accept the upload.
+    """
+    size: int = os.path.getsize(path)
+    headers: dict[str, str] = {"Content-Length": str(size)}
+    if content_type:
+        headers["Content-Type"] = content_type
+
+    with open(path, "rb") as file:
+        request = urllib.request.Request(url, data=file, headers=headers, method="PUT")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status: int = response.status
+        except OSError as e:
+            raise UploadError(f"Upload of {path} failed: {e}") from e
+
+    if not 200 <= status < 300:
+        raise UploadError(f"Upload of {path} failed with HTTP {status}")
+
+    logger.info(f"Uploaded {size} bytes from {path}")
+    return size
+
+
+def _put_part(url: str, path: str, offset: int, length: int, timeout: float) -> str:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        data: bytes = file.read(length)
+
+    request = urllib.request.Request(url, data=data, method="PUT")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        etag: str | None = response.headers.get("ETag")
+    if not etag:
+        raise UploadError(f"No ETag returned for the part at byte {offset}")
+    return etag
+
+
+def _put_part_with_retries(
+    url: str, path: str, offset: int, length: int, timeout: float, attempts: int
+) -> str:
+    for attempt in range(1, attempts + 1):
+        try:
+            return _put_part(url, path, offset, length, timeout)
+        except (OSError, http.client.HTTPException, UploadError) as e:
+            if attempt == attempts:
+                raise UploadError(f"Part at byte {offset} failed: {e}") from e
+            logger.warning(f"Part at byte {offset} failed ({e}), retrying")
+            time.sleep(2**attempt)
+    raise UploadError(f"No attempts left for the part at byte {offset}")
+
+
+def _load_state(state_path: str, size: int, part_size: int) -> dict[str, str]:
+    try:
+        with open(state_path) as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if state.get("size") != size or state.get("part_size") != part_size:
+        return {}
+    return state.get("etags", {})
+
+
+def _save_state(state_path: str, size: int, part_size: int, etags: dict[str, str]):
+    with open(state_path + ".tmp", "w") as file:
+        json.dump({"size": size, "part_size": part_size, "etags": etags}, file)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def multipart_upload(
+    path: str,
+    part_urls: list[str],
+    complete_url: str,
+    part_size: int,
+    state_path: str,
+    workers: int = 4,
+    attempts: int = 3,
+    progress: Callable[[int, int], None] | None = None,
+    timeout: float = 60,
+) -> int:
+    """
+    Upload a file as an S3 multipart upload through presigned URLs, several
+    parts at a time. Finished parts are recorded in a state file, so a failed
+    or interrupted upload resumes with the missing parts only.
+    Args:
+        path (str): The path of the file.
+        part_urls (list[str]): Presigned URLs of parts 1, 2, ... in order.
+        complete_url (str): Presigned URL completing the multipart upload.
+        part_size (int): Bytes per part, except for the last one.
+        state_path (str): Where to record the finished parts.
+        workers (int): Parts uploaded in parallel.
+        attempts (int): Attempts per part before the upload fails.
+        progress (Callable | None): Called with (bytes uploaded, total bytes) from the calling thread.
+        timeout (float): Socket timeout in seconds.
+    Returns:
+        int: The number of bytes uploaded.
+    Raises:
+        UploadError: If a part or the completion failed.
+    """
+    size: int = os.path.getsize(path)
+    parts: int = max(1, math.ceil(size / part_size))
+    if parts > len(part_urls):
+        raise UploadError(
+            f"{path} needs {parts} parts of {part_size} bytes but only {len(part_urls)} part URLs were given"
+        )
+
+    etags: dict[str, str] = _load_state(state_path, size, part_size)
+    if etags:
+        logger.info(f"Resuming upload of {path}, {len(etags)} of {parts} parts done")
+
+    def part_length(number: int) -> int:
+        return min(part_size, size - (number - 1) * part_size)
+
+    done: int = sum(part_length(int(number)) for number in etags)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                _put_part_with_retries,
+                part_urls[number - 1],
+                path,
+                (number - 1) * part_size,
+                part_length(number),
+                timeout,
+                attempts,
+            ): number
+            for number in range(1, parts + 1)
+            if str(number) not in etags
+        }
+        # Parts still in flight when one fails are recorded too, so a retry
+        # only sends what is actually missing.
+        error: UploadError | None = None
+        for future in as_completed(futures):
+            number: int = futures[future]
+            try:
+                etags[str(number)] = future.result()
+            except UploadError as e:
+                error = error or e
+                continue
+            _save_state(state_path, size, part_size, etags)
+            done += part_length(number)
+            if progress:
+                progress(done, size)
+    if error:
+        raise error
+
+    body: str = "".join(
+        f"<Part><PartNumber>{number}</PartNumber><ETag>{etags[str(number)]}</ETag></Part>"
+        for number in range(1, parts + 1)
+    )
+    request = urllib.request.Request(
+        complete_url,
+        data=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode(),
+        headers={"Content-Type": "application/xml"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            # S3 can report a failed completion in the body of a 200 response.
+            if b"<Error>" in response.read():
+                raise UploadError(f"Completing the upload of {path} failed")
+    except OSError as e:
+        raise UploadError(f"Completing the upload of {path} failed: {e}") from e
+
+    os.remove(state_path)
+    logger.info(f"Uploaded {size} bytes from {path} in {parts} parts")
+    return size
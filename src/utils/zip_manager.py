@@ -1,25 +1,38 @@
-import os
+import io
+import mmap
+from typing import BinaryIO, cast
 from zipfile import ZipFile
 from loguru import logger
+from mavsdk.mission_raw import MissionItem
 
+from src.Classes.metrics import Metrics, metrics
+from src.utils.plan_parser import PlanParseError, parse_plan
 
-def extract_mission(zip_path: str, member_name: str, output_path: str) -> str | None:
+
+def read_mission(
+    zip_path: str, member_name: str, metrics: Metrics = metrics
+) -> list[MissionItem] | None:
     """
-    Extracts a specific member from a zip file to a new path.
-    This is a minimal and corrected version of the previous function.
+    Parses a mission plan straight out of a zip file, without extracting it.
+    The archive is memory-mapped and the member is decompressed and parsed
+    as a stream.
+    Args:
+        zip_path (str): The path of the mission bundle.
+        member_name (str): The plan to read from the bundle.
+        metrics (Metrics): The registry the read is recorded in.
+    Returns:
+        list[MissionItem] | None: The mission items, or None on failure.
     """
-    extracted_file_path = os.path.join(output_path, member_name)
-
     try:
-        with ZipFile(zip_path, "r") as archive:
-            archive.extract(member=member_name, path=output_path)
+        with metrics.timer("mission.read"), open(zip_path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                # ZipFile only seeks and reads, which the mapping supports.
+                with ZipFile(cast(BinaryIO, mapped), "r") as archive:
+                    with archive.open(member_name) as member:
+                        items = parse_plan(io.TextIOWrapper(member, encoding="utf-8"))
 
-            logger.info(f"Extracted mission {member_name} to {output_path}")
-            return extracted_file_path
-    except Exception as e:
-        logger.error(e)
+        logger.info(f"Read {len(items)} mission items from {member_name}")
+        return items
+    except (OSError, ValueError, KeyError, PlanParseError) as e:
+        logger.error(f"Couldn't read mission {member_name}: {e}")
         return None
-
-
-# if __name__ == "__main__":
-#     extract_mission("/tmp/missions/mission.bundle.zip", "test1", "/tmp/missions/")